@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Ad-hoc activity aggregates for `/api/aggregate`.
+
+Any combination of a calendar period (day/week/month/year) and sport can be
+grouped, with any of the METRICS, over an optional date range:
+
+    /api/aggregate?group_by=month,sport&metrics=distance,duration&since=2025-01-01
+    /api/aggregate?group_by=week&metrics=tss,hr&limit=8&compare=1    # week-over-week deltas
+
+Answers come from `activity_rollups`: one row per (period, bucket, sport)
+holding sums for every metric, refreshed after each sync from the earliest
+changed day onwards (`update_rollups`). A query is then a range scan over
+the rollup key. Queries the rollup cannot answer - a Garmin `type` filter,
+or a database whose rollups were never built - run the same aggregation
+directly on `activities` (SQL fallback); `source` in the response says which
+one was used.
+
+    python aggregate.py rebuild    # rebuild every rollup
+"""
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+import metrics
+from charts import PERIODS as CHART_PERIODS, SPORT_CASE, SPORTS, MAX_POINTS, period_starts
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+PERIODS = dict(CHART_PERIODS, day='date')
+
+# Metric -> expression over the rollup sums; units: km, hours, TSS, bpm
+METRICS = {
+    'distance': 'ROUND(SUM(distance) / 1000, 2)',
+    'duration': 'ROUND(SUM(duration) / 3600.0, 2)',
+    'tss': 'ROUND(SUM(tss), 1)',
+    # Duration-weighted average HR of activities that have one
+    'hr': 'ROUND(SUM(hr_weighted) / NULLIF(SUM(hr_seconds), 0), 1)',
+}
+
+# Per-activity values summed into the rollup, in activity_rollups column order
+ROLLUP_SUMS = '''
+    COUNT(*) AS activities,
+    SUM(COALESCE(distance, 0)) AS distance,
+    SUM(COALESCE(duration, 0)) AS duration,
+    SUM(COALESCE(tss, 0)) AS tss,
+    SUM(CASE WHEN avg_hr > 0 THEN avg_hr * COALESCE(duration, 0) ELSE 0 END) AS hr_weighted,
+    SUM(CASE WHEN avg_hr > 0 THEN COALESCE(duration, 0) ELSE 0 END) AS hr_seconds
+'''
+
+STATE_KEY = 'rollups'
+
+DEFAULT_LIMIT = 12
+
+
+def _as_date(value):
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def bucket_start(period, value):
+    """First day of the period bucket containing a date"""
+    day = _as_date(value)
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    if period == 'year':
+        return day.replace(month=1, day=1)
+    return day
+
+
+def previous_bucket(period, bucket):
+    """Start of the bucket before `bucket`"""
+    return bucket_start(period, _as_date(bucket) - timedelta(days=1)).isoformat()
+
+
+def update_rollups(since=None, conn=None):
+    """Rebuild the rollup rows of every period from the bucket containing `since` (all if None)
+
+    Until one full build has completed, `since` is ignored: on a database that
+    already had activities, a partial build would hide everything before it.
+    """
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        if since is not None and not rollups_built(conn):
+            since = None
+        with metrics.timer('sync_stage', stage='activity_rollups'):
+            for period, bucket in PERIODS.items():
+                first = bucket_start(period, since).isoformat() if since else '0000-01-01'
+                conn.execute('DELETE FROM activity_rollups WHERE period = ? AND bucket >= ?', (period, first))
+                conn.execute(f'''
+                    INSERT INTO activity_rollups
+                    (period, bucket, sport, activities, distance, duration, tss, hr_weighted, hr_seconds)
+                    SELECT ?, {bucket} AS bucket, {SPORT_CASE} AS sport, {ROLLUP_SUMS}
+                    FROM activities
+                    WHERE date >= ?
+                    GROUP BY bucket, sport
+                ''', (period, first))
+            if since is None:
+                # Only a full build marks the rollups as complete
+                conn.execute('''
+                    INSERT INTO sync_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+                ''', (STATE_KEY, json.dumps({'built_at': datetime.now().isoformat(timespec='seconds')})))
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    logger.info(f"Activity rollups updated from {since or 'the beginning'}", extra={'since': str(since) if since else None})
+
+
+def rollups_built(conn=None):
+    """True once a full update_rollups() has run"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (STATE_KEY,)).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return bool(row and row[0] and json.loads(row[0]).get('built_at'))
+
+
+def parse_request(group_by=None, metric_names=None):
+    """Validate group_by / metrics lists; return (period or None, by_sport, metrics)"""
+    group_by = [g for g in (group_by or []) if g]
+    metric_names = [m for m in (metric_names or METRICS) if m]
+    unknown = [g for g in group_by if g not in PERIODS and g != 'sport']
+    if unknown:
+        raise ValueError(f"Unknown group_by: {', '.join(unknown)} (use {', '.join(PERIODS)} or sport)")
+    periods = [g for g in group_by if g in PERIODS]
+    if len(periods) > 1:
+        raise ValueError("group_by takes at most one period")
+    unknown = [m for m in metric_names if m not in METRICS]
+    if unknown:
+        raise ValueError(f"Unknown metrics: {', '.join(unknown)} (use {', '.join(METRICS)})")
+    return (periods[0] if periods else None), 'sport' in group_by, metric_names
+
+
+def aggregate(group_by=None, metric_names=None, since=None, until=None, sport=None,
+              activity_type=None, limit=None, compare=False):
+    """Grouped totals as {'rows': [...], 'source': 'rollup' | 'activities', ...}
+
+    With a period and no `since`, the last `limit` (default 12) periods up to
+    today are returned. `since`/`until` are widened to whole periods. With
+    `compare`, every row also gets `<metric>_delta` against the previous
+    period of the same group (None when that period is outside the range).
+    """
+    period, by_sport, metric_names = parse_request(group_by, metric_names)
+    if sport and sport not in SPORTS:
+        raise ValueError(f"Unknown sport: {sport} (use {', '.join(SPORTS)})")
+    grain = period or 'day'
+    if period and not since:
+        limit = max(1, min(limit or DEFAULT_LIMIT, MAX_POINTS))
+        if period == 'day':
+            since = date.today() - timedelta(days=limit - 1)
+        else:
+            since = period_starts(period, limit)[0]
+    first = bucket_start(grain, since).isoformat() if since else '0000-01-01'
+    last = bucket_start(grain, until).isoformat() if until else '9999-12-31'
+
+    select = [f'{METRICS[m]} AS {m}' for m in metric_names]
+    keys = (['bucket'] if period else []) + (['sport'] if by_sport else [])
+
+    conn = get_db()
+    try:
+        if activity_type or not rollups_built(conn):
+            source = 'activities'
+            bucket = PERIODS[grain]
+            conditions = ['date >= ?', f'{bucket} <= ?']
+            params = [first, last]
+            if sport:
+                conditions.append(f'{SPORT_CASE} = ?')
+                params.append(sport)
+            if activity_type:
+                conditions.append('type LIKE ?')
+                params.append(f'%{activity_type}%')
+            query = f'''
+                SELECT {", ".join(keys + ["SUM(activities) AS activities"] + select)}
+                FROM (
+                    SELECT {bucket} AS bucket, {SPORT_CASE} AS sport, {ROLLUP_SUMS}
+                    FROM activities
+                    WHERE {" AND ".join(conditions)}
+                    GROUP BY bucket, sport
+                )
+            '''
+        else:
+            source = 'rollup'
+            query = f'''
+                SELECT {", ".join(keys + ["SUM(activities) AS activities"] + select)}
+                FROM activity_rollups
+                WHERE period = ? AND bucket >= ? AND bucket <= ?
+            '''
+            params = [grain, first, last]
+            if sport:
+                query += ' AND sport = ?'
+                params.append(sport)
+        if keys:
+            query += f' GROUP BY {", ".join(keys)} ORDER BY {", ".join(keys)}'
+        cursor = conn.execute(query, params)
+        columns = [d[0] for d in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+    # A range without activities still yields one all-NULL row when ungrouped
+    rows = [row for row in rows if row['activities']]
+    if compare and period:
+        index = {(row.get('sport'), row['bucket']): row for row in rows}
+        for row in rows:
+            before = previous_bucket(period, row['bucket'])
+            previous = index.get((row.get('sport'), before))
+            for m in metric_names:
+                if previous is None and before < first:
+                    row[f'{m}_delta'] = None
+                else:
+                    prior = (previous or {}).get(m) or 0
+                    row[f'{m}_delta'] = round((row[m] or 0) - prior, 2)
+
+    return {
+        'group_by': keys,
+        'period': period,
+        'metrics': metric_names,
+        'since': first if since else None,
+        'until': until,
+        'source': source,
+        'rows': rows,
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='Activity rollups')
+    parser.add_argument('command', choices=['rebuild'])
+    args = parser.parse_args()
+
+    configure_logging()
+    update_rollups()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Power/HR analytics computed from stored activity streams (see streams.py).
+
+For every activity with streams: normalized power, intensity factor, TSS,
+hrTSS and mean-maximal power / speed curves. Streams are resampled to 1 Hz
+and all rolling windows use cumulative sums, so each metric is a handful of
+vectorized NumPy passes over the activity. Results go to `activity_metrics`,
+and `activities.normalized_power` / `activities.tss` are filled where Garmin
+did not provide them.
+
+    FTP=250 LTHR=165 python analytics.py [--since 2025-01-01]
+
+Without FTP there is no IF/TSS and without LTHR no hrTSS (logged once).
+
+NumPy is imported on first use, so importing this module stays cheap.
+"""
+import os
+import json
+import math
+import logging
+
+import metrics
+import streams
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+# Mean-maximal curve durations, seconds
+CURVE_DURATIONS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200)
+
+NP_WINDOW = 30
+
+# What goes missing without each threshold
+THRESHOLD_METRICS = {'FTP': 'IF/TSS', 'LTHR': 'hrTSS'}
+
+_missing_warned = set()
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def thresholds():
+    """FTP (W) and LTHR (bpm) from the environment; None when not configured"""
+    ftp = os.getenv('FTP')
+    lthr = os.getenv('LTHR')
+    return (float(ftp) if ftp else None), (float(lthr) if lthr else None)
+
+
+def warn_missing_thresholds(ftp, lthr):
+    """Log once per process which threshold-based metrics are skipped"""
+    for name, value in (('FTP', ftp), ('LTHR', lthr)):
+        if not value and name not in _missing_warned:
+            _missing_warned.add(name)
+            logger.warning(f"{name} is not set: {THRESHOLD_METRICS[name]} are not computed from streams",
+                           extra={'threshold': name})
+
+
+def resample_1hz(time_s, values):
+    """Interpolate a channel onto a 1 s grid, skipping NaN samples; None if nothing valid"""
+    np = _np()
+    values = np.frombuffer(values, dtype=np.float32)
+    if time_s is None:
+        grid_values = values.astype(np.float64)
+        valid = ~np.isnan(grid_values)
+        if not valid.any():
+            return None
+        grid_values[~valid] = 0.0
+        return grid_values
+    t = np.frombuffer(time_s, dtype=np.float32).astype(np.float64)
+    valid = ~np.isnan(t) & ~np.isnan(values)
+    if valid.sum() < 2:
+        return None
+    t, v = t[valid], values[valid].astype(np.float64)
+    grid = np.arange(t[0], t[-1] + 1.0)
+    return np.interp(grid, t, v)
+
+
+def rolling_mean(values, window):
+    """Mean of every `window`-long run of samples (length n - window + 1)"""
+    np = _np()
+    if len(values) < window:
+        return np.empty(0)
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def normalized_power(power):
+    """4th-power mean of the 30 s rolling average power"""
+    np = _np()
+    rolled = rolling_mean(power, NP_WINDOW)
+    if not len(rolled):
+        return None
+    return float(np.mean(rolled ** 4) ** 0.25)
+
+
+def mean_max_curve(values, durations=CURVE_DURATIONS):
+    """Best average over each duration: {seconds: value}"""
+    curve = {}
+    for duration in durations:
+        rolled = rolling_mean(values, duration)
+        if not len(rolled):
+            break
+        curve[duration] = round(float(rolled.max()), 2)
+    return curve
+
+
+def hr_tss(heart_rate, lthr):
+    """Heart-rate TSS: hours at LTHR score 100, intensity squared per second"""
+    np = _np()
+    ratio = heart_rate[heart_rate > 0] / lthr
+    if not len(ratio):
+        return None
+    return float(np.sum(ratio ** 2) / 3600 * 100)
+
+
+def compute_activity_metrics(views, ftp=None, lthr=None):
+    """Metrics for one activity from its stream views (channel -> float32 buffer)"""
+    time_s = views.get('time')
+    result = {'duration_s': None}
+
+    power = resample_1hz(time_s, views['power']) if 'power' in views else None
+    if power is not None and power.any():
+        np_value = normalized_power(power)
+        result['duration_s'] = len(power)
+        result['avg_power'] = round(float(power.mean()), 1)
+        result['normalized_power'] = round(np_value, 1) if np_value else None
+        result['power_curve'] = mean_max_curve(power)
+        if ftp and np_value:
+            intensity = np_value / ftp
+            result['intensity_factor'] = round(intensity, 3)
+            result['tss'] = round(len(power) * np_value * intensity / (ftp * 3600) * 100, 1)
+
+    heart_rate = resample_1hz(time_s, views['heart_rate']) if 'heart_rate' in views else None
+    if heart_rate is not None:
+        result['duration_s'] = result['duration_s'] or len(heart_rate)
+        if lthr:
+            value = hr_tss(heart_rate, lthr)
+            result['hr_tss'] = round(value, 1) if value is not None else None
+
+    speed = resample_1hz(time_s, views['speed']) if 'speed' in views else None
+    if speed is not None and speed.any():
+        result['speed_curve'] = mean_max_curve(speed)
+
+    return result
+
+
+def _save_metrics(conn, activity_id, result, ftp, lthr):
+    conn.execute('''
+        INSERT OR REPLACE INTO activity_metrics
+        (activity_id, duration_s, avg_power, normalized_power, intensity_factor, tss, hr_tss,
+         power_curve, speed_curve, ftp, lthr, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (
+        str(activity_id),
+        result.get('duration_s'),
+        result.get('avg_power'),
+        result.get('normalized_power'),
+        result.get('intensity_factor'),
+        result.get('tss'),
+        result.get('hr_tss'),
+        json.dumps(result['power_curve']) if result.get('power_curve') else None,
+        json.dumps(result['speed_curve']) if result.get('speed_curve') else None,
+        ftp,
+        lthr,
+    ))
+
+
+def _fill_activities(conn):
+    """Copy computed NP/TSS into activities rows where Garmin left them empty"""
+    cursor = conn.execute('''
+        UPDATE activities SET
+            normalized_power = COALESCE(normalized_power, (
+                SELECT ROUND(m.normalized_power) FROM activity_metrics m WHERE m.activity_id = activities.id)),
+            tss = COALESCE(tss, (
+                SELECT ROUND(COALESCE(m.tss, m.hr_tss)) FROM activity_metrics m WHERE m.activity_id = activities.id))
+        WHERE (normalized_power IS NULL OR tss IS NULL)
+          AND id IN (SELECT activity_id FROM activity_metrics)
+    ''')
+    return cursor.rowcount
+
+
+def analyze_activities(activity_ids=None, since=None, ftp=None, lthr=None):
+    """Compute and store metrics for the given activities (or all with streams); return the count"""
+    env_ftp, env_lthr = thresholds()
+    ftp, lthr = ftp or env_ftp, lthr or env_lthr
+    warn_missing_thresholds(ftp, lthr)
+    conn = get_db()
+    analyzed = 0
+    try:
+        with metrics.timer('sync_stage', stage='analytics'):
+            if activity_ids is None:
+                items = ((aid, views) for aid, _, _, views in streams.iter_streams(since=since, conn=conn))
+            else:
+                items = ((aid, streams.load_streams(aid, conn=conn)) for aid in activity_ids)
+            for activity_id, views in items:
+                if not views:
+                    continue
+                _save_metrics(conn, activity_id, compute_activity_metrics(views, ftp, lthr), ftp, lthr)
+                analyzed += 1
+            filled = _fill_activities(conn)
+            conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"Analytics: {analyzed} activities analyzed, {filled} filled", extra={
+        'analyzed': analyzed, 'filled': filled,
+    })
+    return analyzed
+
+
+def get_activity_metrics(activity_id, conn=None):
+    """Stored metrics for one activity, or None"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        cursor = conn.execute('SELECT * FROM activity_metrics WHERE activity_id = ?', (str(activity_id),))
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        result = dict(zip([d[0] for d in cursor.description], row))
+    finally:
+        if own_conn:
+            conn.close()
+    for key in ('power_curve', 'speed_curve'):
+        if result[key]:
+            result[key] = {int(k): v for k, v in json.loads(result[key]).items()}
+    return result
+
+
+def season_curve(kind='power', since=None, activity_type=None):
+    """Best mean-maximal value per duration across all analyzed activities"""
+    column = 'power_curve' if kind == 'power' else 'speed_curve'
+    query = f'''
+        SELECT m.{column} FROM activity_metrics m JOIN activities a ON a.id = m.activity_id
+        WHERE m.{column} IS NOT NULL
+    '''
+    params = []
+    if since:
+        query += ' AND a.date >= ?'
+        params.append(str(since))
+    if activity_type:
+        query += ' AND a.type LIKE ?'
+        params.append(f'%{activity_type}%')
+    conn = get_db()
+    try:
+        rows = conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+    best = {}
+    for (curve,) in rows:
+        for duration, value in json.loads(curve).items():
+            duration = int(duration)
+            best[duration] = max(best.get(duration, -math.inf), value)
+    return dict(sorted(best.items()))
+
+
+if __name__ == '__main__':
+    import argparse
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='Recompute stream analytics for stored activities')
+    parser.add_argument('--since', help='only activities on or after this date (YYYY-MM-DD)')
+    parser.add_argument('--ftp', type=float, help='functional threshold power, W (default: $FTP)')
+    parser.add_argument('--lthr', type=float, help='lactate threshold heart rate, bpm (default: $LTHR)')
+    args = parser.parse_args()
+
+    configure_logging()
+    analyze_activities(since=args.since, ftp=args.ftp, lthr=args.lthr)
+    print(json.dumps({'power_curve': season_curve('power', args.since)}, indent=2))
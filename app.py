@@ -4,144 +4,47 @@ Road to SUB5 Web UI - Flask application for visualizing training data
 """
 import os
 import json
-from datetime import datetime, timedelta
-from flask import Flask, render_template, jsonify, request, session
+from flask import Flask, render_template, jsonify, request, Response, url_for, abort
 from flask_cors import CORS
-import sqlite3
 from dotenv import load_dotenv
-from garminconnect import Garmin
-import gspread
-from google.oauth2.service_account import Credentials
 import threading
 import logging
-from collections import defaultdict
-
-# Import functions from main.py
-from main import (
-    connect_to_garmin,
-    connect_to_google_sheets,
-    get_activities_for_date,
-    parse_date,
-    format_time,
-    format_pace,
-    process_cycling_data,
-    process_running_data,
-    get_training_blocks
-)
+import metrics
+from logging_config import configure_logging
+import db
+from db import get_db, init_db, ACTIVITY_COLUMNS
+from payloads import load_payloads
+
+# Sync pipeline; Garmin/Google client libraries are imported only when a sync runs
+import sync
+from sync import perform_sync, run_backfill
+import training_load
+import charts
+import search
+import events
+import dashboard_data
+import snapshots
+import compression
+import assets
+import maintenance
+import zones
+import records
+import aggregate
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-here')
 CORS(app)
+compression.init_app(app)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
-
-# Database setup
-DB_PATH = 'training_data.db'
-
-def init_db():
-    """Initialize SQLite database for storing training data"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Create activities table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activities (
-            id TEXT PRIMARY KEY,
-            date DATE,
-            type TEXT,
-            name TEXT,
-            duration INTEGER,
-            distance REAL,
-            avg_speed REAL,
-            avg_hr INTEGER,
-            avg_power INTEGER,
-            normalized_power INTEGER,
-            avg_cadence INTEGER,
-            tss INTEGER,
-            calories INTEGER,
-            data JSON,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create sync_logs table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sync_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sync_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status TEXT,
-            activities_synced INTEGER,
-            error_message TEXT,
-            details JSON
-        )
-    ''')
-    
-    # Create weekly_stats table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weekly_stats (
-            week_start DATE PRIMARY KEY,
-            week_end DATE,
-            total_cycling_km REAL,
-            total_cycling_time INTEGER,
-            total_running_km REAL,
-            total_running_time INTEGER,
-            avg_hrv REAL,
-            total_activities INTEGER,
-            data JSON,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-
-def save_activity_to_db(activity_data):
-    """Save activity data to database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT OR REPLACE INTO activities 
-        (id, date, type, name, duration, distance, avg_speed, avg_hr, 
-         avg_power, normalized_power, avg_cadence, tss, calories, data, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-    ''', (
-        activity_data.get('activityId'),
-        activity_data.get('startTimeLocal', '')[:10],
-        activity_data.get('activityType', {}).get('typeKey', ''),
-        activity_data.get('activityName', ''),
-        activity_data.get('duration'),
-        activity_data.get('distance'),
-        activity_data.get('averageSpeed'),
-        activity_data.get('averageHR'),
-        activity_data.get('avgPower'),
-        activity_data.get('normalizedPower'),
-        activity_data.get('averageBikingCadenceInRevPerMinute'),
-        activity_data.get('trainingStressScore'),
-        activity_data.get('calories'),
-        json.dumps(activity_data)
-    ))
-    
-    conn.commit()
-    conn.close()
+@app.context_processor
+def inject_asset_url():
+    return {'asset_url': assets.asset_url}
 
-def log_sync(status, activities_synced=0, error_message=None, details=None):
-    """Log synchronization attempt"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        INSERT INTO sync_logs (status, activities_synced, error_message, details)
-        VALUES (?, ?, ?, ?)
-    ''', (status, activities_synced, error_message, json.dumps(details) if details else None))
-    
-    conn.commit()
-    conn.close()
+# Configure logging (LOG_LEVEL / LOG_FORMAT, see logging_config.py)
+configure_logging()
+logger = logging.getLogger(__name__)
 
 @app.route('/')
 def index():
@@ -151,72 +54,48 @@ def index():
 @app.route('/api/activities')
 def get_activities():
     """Get activities from database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Get query parameters
-    start_date = request.args.get('start_date')
-    end_date = request.args.get('end_date')
-    activity_type = request.args.get('type')
-    limit = request.args.get('limit', 100)
-    
-    query = 'SELECT * FROM activities WHERE 1=1'
-    params = []
-    
-    if start_date:
-        query += ' AND date >= ?'
-        params.append(start_date)
-    
-    if end_date:
-        query += ' AND date <= ?'
-        params.append(end_date)
-    
-    if activity_type:
-        query += ' AND type LIKE ?'
-        params.append(f'%{activity_type}%')
-    
-    query += ' ORDER BY date DESC LIMIT ?'
-    params.append(limit)
-    
-    cursor.execute(query, params)
-    columns = [description[0] for description in cursor.description]
-    activities = []
-    for row in cursor.fetchall():
-        activity = dict(zip(columns, row))
-        if activity['data']:
-            activity['data'] = json.loads(activity['data'])
-        activities.append(activity)
-    
-    conn.close()
-    return jsonify(activities)
+    return jsonify(dashboard_data.list_activities(
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+        activity_type=request.args.get('type'),
+        limit=request.args.get('limit', 100, type=int),
+        include_raw=request.args.get('include_raw') == '1',
+    ))
+
+@app.route('/api/activities/search')
+def search_activities():
+    """Ranked full-text search over activity name, type and notes"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query parameter q'}), 400
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    return jsonify(search.search_activities(
+        query, limit, offset,
+        activity_type=request.args.get('type'),
+        start_date=request.args.get('start_date'),
+        end_date=request.args.get('end_date'),
+    ))
+
+@app.route('/api/activities/<activity_id>/notes', methods=['PUT'])
+def update_activity_notes(activity_id):
+    """Set free-text notes for an activity (indexed for search)"""
+    payload = request.get_json(silent=True) or {}
+    if not search.set_notes(activity_id, payload.get('notes') or None):
+        return jsonify({'error': 'Activity not found'}), 404
+    snapshots.refresh_snapshots()
+    events.bump_generation(['activities'])
+    return jsonify({'status': 'ok'})
 
 @app.route('/api/weekly-stats')
 def get_weekly_stats():
     """Get weekly statistics"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM weekly_stats 
-        ORDER BY week_start DESC 
-        LIMIT 12
-    ''')
-    
-    columns = [description[0] for description in cursor.description]
-    stats = []
-    for row in cursor.fetchall():
-        stat = dict(zip(columns, row))
-        if stat['data']:
-            stat['data'] = json.loads(stat['data'])
-        stats.append(stat)
-    
-    conn.close()
-    return jsonify(stats)
+    return jsonify(dashboard_data.weekly_stats())
 
 @app.route('/api/sync-logs')
 def get_sync_logs():
     """Get synchronization logs"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_db()
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -240,7 +119,13 @@ def get_sync_logs():
 def sync_data():
     """Trigger data synchronization from Garmin"""
     try:
-        # Run sync in background thread
+        job = sync.active_job()
+        if job and not sync.interrupted_job():
+            return jsonify({'status': 'running', 'message': 'Синхронизация уже выполняется', 'job': {
+                'stage': job['stage'], 'processed': len(job['done']), 'total': job['total'],
+            }})
+        
+        # Run sync in background thread (an interrupted run is resumed)
         thread = threading.Thread(target=perform_sync)
         thread.start()
         
@@ -248,160 +133,150 @@ def sync_data():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-def perform_sync():
-    """Perform the actual synchronization"""
-    try:
-        logger.info("Starting synchronization...")
-        
-        # Connect to Garmin
-        garmin = connect_to_garmin()
-        
-        # Get activities
-        days = int(os.getenv('DAYS_TO_SYNC', '14'))
-        activities = garmin.get_activities(0, days * 2)
-        
-        activities_saved = 0
-        for activity in activities:
-            try:
-                # Get detailed activity data
-                activity_id = activity['activityId']
-                details = garmin.get_activity(activity_id)
-                summary = details.get('summaryDTO', {})
-                
-                # Merge data
-                activity_full = {**activity, **summary}
-                
-                # Save to database
-                save_activity_to_db(activity_full)
-                activities_saved += 1
-            except Exception as e:
-                logger.error(f"Error saving activity {activity.get('activityName')}: {e}")
-        
-        # Calculate weekly stats
-        calculate_and_save_weekly_stats()
-        
-        # Log successful sync
-        log_sync('success', activities_saved, details={'days_synced': days})
-        logger.info(f"Synchronization complete. Saved {activities_saved} activities.")
-        
-    except Exception as e:
-        logger.error(f"Sync failed: {e}")
-        log_sync('error', 0, str(e))
+@app.route('/api/backfill', methods=['POST'])
+def backfill_data():
+    """Start (or resume) the full-history backfill from Garmin"""
+    backfill = sync.active_backfill()
+    if backfill:
+        return jsonify({'status': 'running', 'message': 'Загрузка всей истории уже выполняется',
+                        'backfill': {'saved': backfill['saved'], 'next_start': backfill['next_start']}})
+    restart = request.args.get('restart') == '1'
+    thread = threading.Thread(target=run_backfill, kwargs={'restart': restart})
+    thread.start()
+    return jsonify({'status': 'started', 'message': 'Загрузка всей истории запущена в фоновом режиме'})
 
-def calculate_and_save_weekly_stats():
-    """Calculate and save weekly statistics"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    # Get all activities grouped by week
-    cursor.execute('''
-        SELECT 
-            strftime('%Y-%W', date) as week,
-            type,
-            SUM(distance) as total_distance,
-            SUM(duration) as total_duration,
-            AVG(avg_hr) as avg_hr,
-            COUNT(*) as count
-        FROM activities
-        WHERE date >= date('now', '-84 days')
-        GROUP BY week, type
-    ''')
-    
-    # Organize data by week
-    weeks_data = defaultdict(lambda: {
-        'cycling_km': 0,
-        'cycling_time': 0,
-        'running_km': 0,
-        'running_time': 0,
-        'total_activities': 0
+@app.route('/api/snapshot')
+def get_snapshot_manifest():
+    """Manifest of the static dashboard snapshot (revalidated via ETag; 404 before the first sync)"""
+    manifest = snapshots.current_manifest()
+    if manifest is None:
+        return jsonify({'error': 'No snapshot yet'}), 404
+    files = {name: url_for('get_snapshot_file', filename=filename) for name, filename in manifest['files'].items()}
+    response = jsonify({**manifest, 'files': files})
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+@app.route('/snapshots/<filename>')
+def get_snapshot_file(filename):
+    """Content-hashed snapshot file: never changes, cached by the browser for a year"""
+    if filename == snapshots.MANIFEST:
+        abort(404)
+    response = compression.send_precompressed(
+        os.path.abspath(snapshots.SNAPSHOT_DIR), filename, mimetype='application/json'
+    )
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/assets/<filename>')
+def get_asset(filename):
+    """Hashed build of a static asset (see assets.py), precompressed and cached for a year"""
+    if filename == assets.MANIFEST:
+        abort(404)
+    response = compression.send_precompressed(assets.DIST_DIR, filename, mimetype=assets.mimetype(filename))
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@app.route('/api/events')
+def stream_events():
+    """Server-Sent Events: sync progress and data-change notifications"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return Response(events.stream(last_event_id), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # Keep reverse proxies from buffering the stream
+        'X-Accel-Buffering': 'no',
     })
-    
-    for row in cursor.fetchall():
-        week, activity_type, distance, duration, avg_hr, count = row
-        week_data = weeks_data[week]
-        
-        if 'cycling' in (activity_type or '').lower():
-            week_data['cycling_km'] += (distance or 0) / 1000
-            week_data['cycling_time'] += (duration or 0)
-        elif 'running' in (activity_type or '').lower():
-            week_data['running_km'] += (distance or 0) / 1000
-            week_data['running_time'] += (duration or 0)
-        
-        week_data['total_activities'] += count
-    
-    # Save weekly stats
-    for week, data in weeks_data.items():
-        # Convert week format to dates
-        year, week_num = week.split('-')
-        week_start = datetime.strptime(f'{year}-W{week_num}-1', '%Y-W%W-%w').date()
-        week_end = week_start + timedelta(days=6)
-        
-        cursor.execute('''
-            INSERT OR REPLACE INTO weekly_stats
-            (week_start, week_end, total_cycling_km, total_cycling_time,
-             total_running_km, total_running_time, total_activities, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-        ''', (
-            week_start,
-            week_end,
-            data['cycling_km'],
-            data['cycling_time'],
-            data['running_km'],
-            data['running_time'],
-            data['total_activities']
-        ))
-    
-    conn.commit()
-    conn.close()
+
+@app.route('/api/maintenance')
+def get_maintenance():
+    """Database size/fragmentation report and the result of the last maintenance run"""
+    return jsonify({'last_run': maintenance.last_run(), 'report': maintenance.report()})
+
+@app.route('/api/maintenance', methods=['POST'])
+def run_maintenance():
+    """Run database maintenance now (retention, indexes, vacuum, statistics)"""
+    thread = threading.Thread(target=maintenance.run_maintenance)
+    thread.start()
+    return jsonify({'status': 'started', 'message': 'Обслуживание базы запущено в фоновом режиме'})
 
 @app.route('/api/summary')
 def get_summary():
     """Get overall summary statistics"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    return jsonify(dashboard_data.summary())
 
-    # Get totals for current week (last 7 days)
-    cursor.execute('''
-        SELECT
-            COUNT(*) as total_activities,
-            SUM(CASE WHEN type LIKE '%cycling%' THEN distance ELSE 0 END) / 1000 as total_cycling_km,
-            SUM(CASE WHEN type LIKE '%running%' THEN distance ELSE 0 END) / 1000 as total_running_km,
-            SUM(duration) as total_duration,
-            AVG(avg_hr) as avg_hr,
-            SUM(calories) as total_calories
-        FROM activities
-        WHERE date >= date('now', '-7 days')
-    ''')
+@app.route('/api/load')
+def get_training_load():
+    """Daily TSS with CTL (fitness), ATL (fatigue) and TSB (form)"""
+    days = request.args.get('days', 180, type=int)
+    return jsonify(training_load.get_load(days or None))
 
-    week_stats = dict(zip(
-        ['total_activities', 'total_cycling_km', 'total_running_km', 'total_duration', 'avg_hr', 'total_calories'],
-        cursor.fetchone()
+@app.route('/api/zones')
+def get_zones():
+    """Time per HR/power zone over a date range, from the weekly zone rollup"""
+    kind = request.args.get('kind', 'hr')
+    if kind not in zones.KINDS:
+        return jsonify({'error': 'Invalid kind'}), 400
+    return jsonify(zones.season_zones(
+        kind,
+        request.args.get('since'),
+        request.args.get('until'),
+        weekly=request.args.get('weekly') == '1',
     ))
-    
-    # Get last sync info
-    cursor.execute('''
-        SELECT sync_date, status, activities_synced
-        FROM sync_logs
-        ORDER BY sync_date DESC
-        LIMIT 1
-    ''')
-    
-    last_sync = cursor.fetchone()
-    if last_sync:
-        last_sync_info = {
-            'date': last_sync[0],
-            'status': last_sync[1],
-            'activities_synced': last_sync[2]
-        }
-    else:
-        last_sync_info = None
-    
-    conn.close()
 
-    return jsonify({
-        'week_stats': week_stats,
-        'last_sync': last_sync_info
-    })
+@app.route('/api/activities/<activity_id>/zones')
+def get_activity_zones(activity_id):
+    """Per-zone seconds of one activity"""
+    return jsonify(zones.get_activity_zones(activity_id))
+
+@app.route('/api/records')
+def get_records():
+    """Best power over 5/20/60 min and fastest 5k/10k/half marathon, per sport"""
+    return jsonify(records.get_records(request.args.get('sport')))
+
+@app.route('/api/aggregate')
+def get_aggregate():
+    """Totals grouped by period (day/week/month/year) and/or sport for chosen metrics"""
+    def as_list(name):
+        return [v.strip() for v in request.args.get(name, '').split(',') if v.strip()]
+    try:
+        return jsonify(aggregate.aggregate(
+            as_list('group_by'),
+            as_list('metrics') or None,
+            since=request.args.get('since'),
+            until=request.args.get('until'),
+            sport=request.args.get('sport'),
+            activity_type=request.args.get('type'),
+            limit=request.args.get('limit', type=int),
+            compare=request.args.get('compare') == '1',
+        ))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/charts/volume')
+def get_chart_volume():
+    """Distance and time per sport, bucketed by week/month/year"""
+    period = request.args.get('period', 'week')
+    if period not in charts.PERIODS:
+        return jsonify({'error': 'Invalid period'}), 400
+    return jsonify(charts.volume(period, request.args.get('limit', 12, type=int)))
+
+@app.route('/api/charts/types')
+def get_chart_types():
+    """Activity type distribution over the last N days"""
+    return jsonify(charts.types(request.args.get('days', 90, type=int)))
+
+@app.route('/api/charts/load')
+def get_chart_load():
+    """CTL/ATL/TSB series downsampled to at most max_points buckets"""
+    return jsonify(charts.load(
+        request.args.get('days', 365, type=int),
+        request.args.get('max_points', 200, type=int),
+    ))
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus-style counters and timers for this worker process"""
+    return Response(metrics.REGISTRY.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/api/export/<format>')
 def export_data(format):
@@ -409,20 +284,22 @@ def export_data(format):
     if format not in ['json', 'csv']:
         return jsonify({'error': 'Invalid format'}), 400
     
-    conn = sqlite3.connect(DB_PATH)
+    include_raw = request.args.get('include_raw') == '1'
+    
+    conn = get_db()
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM activities ORDER BY date DESC')
-    columns = [description[0] for description in cursor.description]
+    cursor.execute(f'SELECT {", ".join(ACTIVITY_COLUMNS)} FROM activities ORDER BY date DESC')
+    columns = list(ACTIVITY_COLUMNS)
     activities = cursor.fetchall()
     
     if format == 'json':
-        data = []
-        for row in activities:
-            activity = dict(zip(columns, row))
-            if activity['data']:
-                activity['data'] = json.loads(activity['data'])
-            data.append(activity)
+        data = [dict(zip(columns, row)) for row in activities]
+        if include_raw:
+            raw = load_payloads(conn, [a['id'] for a in data])
+            for activity in data:
+                activity['data'] = raw.get(activity['id'])
+        conn.close()
         return jsonify(data)
     
     elif format == 'csv':
@@ -434,6 +311,7 @@ def export_data(format):
         cw = csv.writer(si)
         cw.writerow(columns)
         cw.writerows(activities)
+        conn.close()
         
         output = make_response(si.getvalue())
         output.headers["Content-Disposition"] = "attachment; filename=training_data.csv"
@@ -442,15 +320,18 @@ def export_data(format):
     
     conn.close()
 
-# Initialize database on import (for gunicorn)
-if not os.path.exists(DB_PATH):
+# Initialize database on import (for gunicorn); CREATE IF NOT EXISTS also
+# brings existing databases up to date with newly added tables
+if not os.path.exists(db.DB_PATH):
     logger.info("Database not found, initializing...")
-    init_db()
+init_db()
+
+# A sync cut off by a worker restart continues from its last checkpoint
+if sync.interrupted_job():
+    logger.info("Found an interrupted sync, resuming in the background")
+    threading.Thread(target=perform_sync, daemon=True).start()
 
 if __name__ == '__main__':
-    # Initialize database if it doesn't exist
-    if not os.path.exists(DB_PATH):
-        init_db()
 
     port = int(os.getenv('PORT', 5000))
     debug = os.getenv('FLASK_ENV', 'production') == 'development'
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Fingerprinted static assets for the dashboard.
+
+The build step copies each file in ASSETS to static/dist/ under a name with
+its content hash, writes .gz/.br variants next to it and records the mapping
+in static/dist/manifest.json:
+
+    python assets.py        # run at deploy (render.yaml buildCommand)
+
+Templates call `asset_url('js/app.js')`, which points at the hashed copy
+(served with immutable cache headers from /assets/) when the build has run,
+and at the plain /static/ file otherwise, e.g. during development.
+"""
+import os
+import json
+import shutil
+import hashlib
+
+from flask import url_for
+
+from compression import write_precompressed
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = 'manifest.json'
+
+ASSETS = ('js/app.js', 'css/style.css')
+
+MIMETYPES = {'.js': 'text/javascript', '.css': 'text/css'}
+
+_manifest = None
+
+
+def build_assets(dist_dir=DIST_DIR):
+    """Write hashed and precompressed copies of ASSETS plus the manifest"""
+    tmp_dir = f'{dist_dir}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {}
+    for path in ASSETS:
+        with open(os.path.join(STATIC_DIR, path), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(os.path.basename(path))
+        filename = f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+        target = os.path.join(tmp_dir, filename)
+        with open(target, 'wb') as f:
+            f.write(data)
+        write_precompressed(target, data)
+        manifest[path] = filename
+
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    # Swap the whole directory so a running app never sees a half-written build
+    old_dir = f'{dist_dir}.old'
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(dist_dir):
+        os.replace(dist_dir, old_dir)
+    os.replace(tmp_dir, dist_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def load_manifest():
+    """Build manifest (read once per process); empty if assets were not built"""
+    global _manifest
+    if _manifest is None:
+        try:
+            with open(os.path.join(DIST_DIR, MANIFEST)) as f:
+                _manifest = json.load(f)
+        except (OSError, ValueError):
+            _manifest = {}
+    return _manifest
+
+
+def asset_url(path):
+    """URL of a static asset: the hashed build if present, else the source file"""
+    filename = load_manifest().get(path)
+    if filename:
+        return url_for('get_asset', filename=filename)
+    return url_for('static', filename=path)
+
+
+def mimetype(filename):
+    return MIMETYPES.get(os.path.splitext(filename)[1], 'application/octet-stream')
+
+
+if __name__ == '__main__':
+    print(json.dumps(build_assets(), indent=2))
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Offline stand-in backends for Garmin Connect and Google Sheets.
+
+The fakes replay recorded Garmin JSON and emulate a worksheet grid so the
+sync pipeline can be benchmarked and load-tested without live accounts.
+They are selected by `connect_to_garmin` / `connect_to_google_sheets` via:
+
+    GARMIN_BACKEND=fake         GARMIN_FIXTURES_DIR=fixtures/garmin
+    SHEETS_BACKEND=fake         SHEETS_FIXTURE_PATH=fixtures/sheet.json
+    FAKE_API_LATENCY_MS=50      # per-call latency
+    FAKE_API_RATE_LIMIT=60      # max calls per minute, then 429
+
+Garmin fixtures directory layout:
+
+    activities.json             # list as returned by get_activities, newest first
+    activity/<activityId>.json  # get_activity(activityId) response
+    details/<activityId>.json   # get_activity_details(activityId) response (synthesized if absent)
+    hrv/<YYYY-MM-DD>.json       # get_hrv_data(date) response
+    sleep/<YYYY-MM-DD>.json     # get_sleep_data(date) response
+
+Sheet fixture: {"<worksheet title>": [[row 1 values], [row 2 values], ...]}
+"""
+import os
+import re
+import json
+import math
+import time
+import random
+import threading
+from collections import Counter, deque
+
+
+def use_fake_garmin():
+    """True when GARMIN_BACKEND selects the offline Garmin stand-in"""
+    return os.getenv('GARMIN_BACKEND', 'live').lower() == 'fake'
+
+
+def use_fake_sheets():
+    """True when SHEETS_BACKEND selects the offline Sheets stand-in"""
+    return os.getenv('SHEETS_BACKEND', 'live').lower() == 'fake'
+
+
+class FaultInjector:
+    """Adds latency and a sliding-window rate limit to every fake API call"""
+
+    def __init__(self, latency_ms=0, rate_limit=0, window_seconds=60):
+        self.latency = latency_ms / 1000.0
+        self.rate_limit = rate_limit
+        self.window_seconds = window_seconds
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            latency_ms=float(os.getenv('FAKE_API_LATENCY_MS', '0')),
+            rate_limit=int(os.getenv('FAKE_API_RATE_LIMIT', '0')),
+        )
+
+    def check(self):
+        """Return False if this call exceeds the rate limit; otherwise sleep for latency"""
+        if self.rate_limit:
+            now = time.monotonic()
+            with self._lock:
+                while self._calls and now - self._calls[0] >= self.window_seconds:
+                    self._calls.popleft()
+                if len(self._calls) >= self.rate_limit:
+                    return False
+                self._calls.append(now)
+        if self.latency:
+            time.sleep(self.latency)
+        return True
+
+
+def _load_json(path, default=None):
+    if not os.path.exists(path):
+        return default
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+class FakeGarmin:
+    """Replays recorded Garmin Connect responses from a fixtures directory"""
+
+    def __init__(self, fixtures_dir=None, activities=None, details=None, hrv=None, sleep=None, faults=None):
+        self.fixtures_dir = fixtures_dir
+        self.faults = faults or FaultInjector()
+        self.calls = Counter()
+        if fixtures_dir:
+            activities = _load_json(os.path.join(fixtures_dir, 'activities.json'), activities)
+        self.activities = activities or []
+        self.details = details or {}
+        self.hrv = hrv or {}
+        self.sleep = sleep or {}
+        self.streams = {}
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if not self.faults.check():
+            from garminconnect import GarminConnectTooManyRequestsError
+            raise GarminConnectTooManyRequestsError(f"Fake Garmin rate limit exceeded on {name}")
+
+    def _fixture(self, cache, subdir, key):
+        if key not in cache and self.fixtures_dir:
+            cache[key] = _load_json(os.path.join(self.fixtures_dir, subdir, f'{key}.json'))
+        return cache.get(key)
+
+    def login(self, tokenstore=None):
+        self._call('login')
+        return None, None
+
+    def get_user_summary(self, cdate):
+        self._call('get_user_summary')
+        return {'calendarDate': cdate}
+
+    def get_activities(self, start=0, limit=20, activitytype=None):
+        self._call('get_activities')
+        activities = self.activities
+        if activitytype:
+            activities = [a for a in activities if a.get('activityType', {}).get('typeKey') == activitytype]
+        return activities[start:start + limit]
+
+    def get_activities_by_date(self, startdate, enddate=None, activitytype=None, sortorder=None):
+        self._call('get_activities_by_date')
+        enddate = enddate or startdate
+        result = [
+            a for a in self.activities
+            if startdate <= a.get('startTimeLocal', '')[:10] <= enddate
+            and (not activitytype or a.get('activityType', {}).get('typeKey') == activitytype)
+        ]
+        if sortorder == 'asc':
+            result.reverse()
+        return result
+
+    def get_activity(self, activity_id):
+        self._call('get_activity')
+        details = self._fixture(self.details, 'activity', str(activity_id))
+        if details is None:
+            # No recorded detail: derive a summaryDTO from the list entry
+            summary = next((a for a in self.activities if str(a.get('activityId')) == str(activity_id)), {})
+            details = {'activityId': activity_id, 'summaryDTO': dict(summary)}
+        return details
+
+    def _details(self, activity_id, maxchart=2000):
+        details = self._fixture(self.streams, 'details', str(activity_id))
+        if details is None:
+            summary = next((a for a in self.activities if str(a.get('activityId')) == str(activity_id)), {})
+            details = synthesize_details(summary, maxchart)
+        return details
+
+    def get_activity_details(self, activity_id, maxchart=2000, maxpoly=4000):
+        self._call('get_activity_details')
+        return self._details(activity_id, maxchart)
+
+    def get_activity_hr_in_timezones(self, activity_id):
+        self._call('get_activity_hr_in_timezones')
+        # Not through get_activity_details: one zones request is one call
+        details = self._details(activity_id)
+        hr_index = next((d['metricsIndex'] for d in details.get('metricDescriptors', [])
+                         if d['key'] == 'directHeartRate'), None)
+        if hr_index is None:
+            return []
+        lows = (0, 114, 133, 152, 171)
+        seconds = Counter(
+            sum(1 for low in lows[1:] if row['metrics'][hr_index] >= low)
+            for row in details.get('activityDetailMetrics', [])
+        )
+        return [
+            {'zoneNumber': i + 1, 'secsInZone': float(seconds[i]), 'zoneLowBoundary': low}
+            for i, low in enumerate(lows)
+        ]
+
+    def get_hrv_data(self, cdate):
+        self._call('get_hrv_data')
+        return self._fixture(self.hrv, 'hrv', cdate)
+
+    def get_sleep_data(self, cdate):
+        self._call('get_sleep_data')
+        return self._fixture(self.sleep, 'sleep', cdate)
+
+
+def synthesize_details(activity, maxchart=2000):
+    """Deterministic 1 Hz get_activity_details payload around an activity's averages"""
+    rng = random.Random(str(activity.get('activityId')))
+    samples = min(int(activity.get('duration') or 0), maxchart)
+    power = activity.get('avgPower')
+    hr = activity.get('averageHR') or 140
+    speed = activity.get('averageSpeed') or 3.0
+    cadence = activity.get('averageBikingCadenceInRevPerMinute') or activity.get('averageRunningCadenceInStepsPerMinute') or 85
+    keys = ['sumDuration', 'directHeartRate', 'directSpeed', 'directElevation', 'directBikeCadence']
+    if power:
+        keys.append('directPower')
+    rows = []
+    altitude = 150.0
+    for t in range(samples):
+        surge = 1.0 + 0.25 * math.sin(t / 240.0) + rng.uniform(-0.1, 0.1)
+        altitude += rng.uniform(-0.5, 0.5)
+        values = [float(t), round(hr * (0.92 + 0.08 * surge)), speed * surge, altitude, round(cadence * surge)]
+        if power:
+            values.append(round(power * surge))
+        rows.append({'metrics': values})
+    return {
+        'activityId': activity.get('activityId'),
+        'measurementCount': len(keys),
+        'metricsCount': samples,
+        'metricDescriptors': [{'metricsIndex': i, 'key': key} for i, key in enumerate(keys)],
+        'activityDetailMetrics': rows,
+    }
+
+
+_A1_RE = re.compile(r'^([A-Z]+)(\d+)$')
+
+
+def a1_to_rowcol(label):
+    """Convert an A1 cell label ('E7') to a 1-based (row, col) tuple"""
+    match = _A1_RE.match(label.upper())
+    if not match:
+        raise ValueError(f"Unsupported A1 label: {label}")
+    letters, row = match.groups()
+    col = 0
+    for ch in letters:
+        col = col * 26 + (ord(ch) - ord('A') + 1)
+    return int(row), col
+
+
+class FakeWorksheet:
+    """In-memory worksheet grid with the subset of the gspread API we use"""
+
+    def __init__(self, spreadsheet, title, grid=None, rows=1000, cols=26):
+        self.spreadsheet = spreadsheet
+        self.spreadsheet_id = spreadsheet.id
+        self.title = title
+        self.grid = [list(r) for r in (grid or [])]
+        self.row_count = max(rows, len(self.grid))
+        self.col_count = max([cols] + [len(r) for r in self.grid])
+
+    def _call(self, name):
+        self.spreadsheet._call(name)
+
+    def _set(self, row, col, value):
+        if row > self.row_count or col > self.col_count:
+            self._raise_api_error(400, f"Range exceeds grid limits ({self.row_count}x{self.col_count})")
+        while len(self.grid) < row:
+            self.grid.append([])
+        line = self.grid[row - 1]
+        while len(line) < col:
+            line.append('')
+        line[col - 1] = '' if value is None else str(value)
+
+    def _raise_api_error(self, code, message):
+        self.spreadsheet._raise_api_error(code, message)
+
+    @staticmethod
+    def _trim(values):
+        while values and values[-1] == '':
+            values.pop()
+        return values
+
+    def row_values(self, row, **kwargs):
+        self._call('row_values')
+        if row > len(self.grid):
+            return []
+        return self._trim(list(self.grid[row - 1]))
+
+    def col_values(self, col, **kwargs):
+        self._call('col_values')
+        return self._trim([r[col - 1] if col <= len(r) else '' for r in self.grid])
+
+    def get_all_values(self, **kwargs):
+        self._call('get_all_values')
+        return [list(r) for r in self.grid]
+
+    def _write_block(self, label, values):
+        start = label.split(':')[0]
+        row, col = a1_to_rowcol(start)
+        for r_off, line in enumerate(values):
+            for c_off, value in enumerate(line):
+                self._set(row + r_off, col + c_off, value)
+
+    def update(self, values=None, range_name=None, **kwargs):
+        self._call('update')
+        if isinstance(values, str):
+            # gspread < 6 argument order: update(range_name, values)
+            values, range_name = range_name, values
+        self._write_block(range_name or 'A1', values or [[]])
+        self.spreadsheet.save()
+
+    def batch_update(self, data, **kwargs):
+        self._call('batch_update')
+        for item in data:
+            self._write_block(item['range'], item['values'])
+        self.spreadsheet.save()
+
+    def append_rows(self, values, **kwargs):
+        self._call('append_rows')
+        start = len(self.grid) + 1
+        if start + len(values) - 1 > self.row_count:
+            self.row_count = start + len(values) - 1
+        for offset, line in enumerate(values):
+            for col, value in enumerate(line, 1):
+                self._set(start + offset, col, value)
+        self.spreadsheet.save()
+
+    def add_rows(self, rows):
+        self._call('add_rows')
+        self.row_count += rows
+
+    def resize(self, rows=None, cols=None):
+        self._call('resize')
+        if rows is not None:
+            self.row_count = rows
+            del self.grid[rows:]
+        if cols is not None:
+            self.col_count = cols
+            self.grid = [r[:cols] for r in self.grid]
+
+    def clear(self):
+        self._call('clear')
+        self.grid = []
+        self.spreadsheet.save()
+
+
+class FakeSpreadsheet:
+    """A set of FakeWorksheets, optionally persisted to a JSON fixture file"""
+
+    def __init__(self, path=None, worksheets=None, faults=None, persist=False):
+        self.path = path
+        self.persist = persist
+        self.faults = faults or FaultInjector()
+        self.calls = Counter()
+        self.id = path or f'fake-{id(self):x}'
+        data = _load_json(path, {}) if path else {}
+        data.update(worksheets or {})
+        self._worksheets = {title: FakeWorksheet(self, title, grid) for title, grid in data.items()}
+
+    def _call(self, name):
+        self.calls[name] += 1
+        if not self.faults.check():
+            self._raise_api_error(429, f"Fake Sheets quota exceeded on {name}")
+
+    def _raise_api_error(self, code, message):
+        from gspread.exceptions import APIError
+        from requests import Response
+
+        response = Response()
+        response.status_code = code
+        response._content = json.dumps({'error': {'code': code, 'message': message, 'status': 'FAKE'}}).encode()
+        raise APIError(response)
+
+    def worksheet(self, title):
+        self._call('worksheet')
+        if title not in self._worksheets:
+            from gspread.exceptions import WorksheetNotFound
+            raise WorksheetNotFound(title)
+        return self._worksheets[title]
+
+    def worksheets(self):
+        return list(self._worksheets.values())
+
+    def add_worksheet(self, title, rows, cols, **kwargs):
+        self._call('add_worksheet')
+        worksheet = FakeWorksheet(self, title, rows=rows, cols=cols)
+        self._worksheets[title] = worksheet
+        self.save()
+        return worksheet
+
+    def save(self):
+        """Write the grids back to the fixture file when persistence is enabled"""
+        if not (self.persist and self.path):
+            return
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({title: ws.grid for title, ws in self._worksheets.items()}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def fake_garmin_from_env():
+    """Build a FakeGarmin from GARMIN_FIXTURES_DIR and the fault-injection env vars"""
+    fixtures_dir = os.getenv('GARMIN_FIXTURES_DIR', 'fixtures/garmin')
+    if not os.path.isdir(fixtures_dir):
+        raise ValueError(f"GARMIN_FIXTURES_DIR not found: {fixtures_dir}")
+    return FakeGarmin(fixtures_dir, faults=FaultInjector.from_env())
+
+
+def fake_sheets_from_env():
+    """Build a FakeSpreadsheet from SHEETS_FIXTURE_PATH and the fault-injection env vars"""
+    path = os.getenv('SHEETS_FIXTURE_PATH', 'fixtures/sheet.json')
+    if not os.path.exists(path):
+        raise ValueError(f"SHEETS_FIXTURE_PATH not found: {path}")
+    persist = os.getenv('SHEETS_FIXTURE_PERSIST', 'false').lower() == 'true'
+    return FakeSpreadsheet(path, faults=FaultInjector.from_env(), persist=persist)
+
+
+def record_garmin_fixtures(garmin_client, out_dir, limit=100):
+    """Record live Garmin responses into a fixtures directory for FakeGarmin"""
+    os.makedirs(os.path.join(out_dir, 'activity'), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, 'details'), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, 'hrv'), exist_ok=True)
+    os.makedirs(os.path.join(out_dir, 'sleep'), exist_ok=True)
+
+    activities = garmin_client.get_activities(0, limit)
+    with open(os.path.join(out_dir, 'activities.json'), 'w', encoding='utf-8') as f:
+        json.dump(activities, f, ensure_ascii=False)
+
+    dates = set()
+    for activity in activities:
+        activity_id = activity['activityId']
+        details = garmin_client.get_activity(activity_id)
+        with open(os.path.join(out_dir, 'activity', f'{activity_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(details, f, ensure_ascii=False)
+        stream = garmin_client.get_activity_details(activity_id, maxchart=100000)
+        with open(os.path.join(out_dir, 'details', f'{activity_id}.json'), 'w', encoding='utf-8') as f:
+            json.dump(stream, f, ensure_ascii=False)
+        dates.add(activity.get('startTimeLocal', '')[:10])
+
+    for cdate in sorted(d for d in dates if d):
+        hrv = garmin_client.get_hrv_data(cdate)
+        if hrv:
+            with open(os.path.join(out_dir, 'hrv', f'{cdate}.json'), 'w', encoding='utf-8') as f:
+                json.dump(hrv, f, ensure_ascii=False)
+        sleep = garmin_client.get_sleep_data(cdate)
+        if sleep:
+            with open(os.path.join(out_dir, 'sleep', f'{cdate}.json'), 'w', encoding='utf-8') as f:
+                json.dump(sleep, f, ensure_ascii=False)
+
+    return len(activities)
+
+
+def record_sheet_fixture(sheet, out_path, titles=None):
+    """Record worksheet grids from a live spreadsheet into a FakeSpreadsheet fixture"""
+    data = {}
+    for worksheet in sheet.worksheets():
+        if titles and worksheet.title not in titles:
+            continue
+        data[worksheet.title] = worksheet.get_all_values()
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    return list(data)
+
+
+if __name__ == '__main__':
+    import sys
+    from db import init_db
+    from main import connect_to_garmin, connect_to_google_sheets
+
+    # python backends.py record [fixtures_dir] [limit]
+    if len(sys.argv) >= 2 and sys.argv[1] == 'record':
+        out_dir = sys.argv[2] if len(sys.argv) > 2 else 'fixtures'
+        limit = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+        # Sheets calls take tokens from the api_quota table
+        init_db()
+        count = record_garmin_fixtures(connect_to_garmin(), os.path.join(out_dir, 'garmin'), limit)
+        print(f"✓ Recorded {count} activities to {out_dir}/garmin")
+        titles = record_sheet_fixture(connect_to_google_sheets(), os.path.join(out_dir, 'sheet.json'))
+        print(f"✓ Recorded worksheets {titles} to {out_dir}/sheet.json")
+    else:
+        print("Usage: python backends.py record [fixtures_dir] [limit]")
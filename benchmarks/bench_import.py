@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Import-time benchmark for the web worker.
+
+Imports `app` in fresh interpreters (as a gunicorn worker does on boot) and
+reports import wall time, peak RSS and whether the Garmin/Google client
+libraries were loaded. They should only load once a sync or export runs.
+
+    python -m benchmarks.bench_import --runs 5 --output import.json
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ('garminconnect', 'garth', 'gspread', 'google.oauth2', 'google.auth')
+
+PROBE = r'''
+import sys, time, json, resource
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = {m: m in sys.modules for m in %(heavy)r}
+print(json.dumps({'import_s': elapsed, 'max_rss_kb': rss_kb, 'heavy_loaded': heavy}))
+'''
+
+
+def probe_once(env):
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE % {'heavy': HEAVY_MODULES}],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='sub5-import-') as tmp:
+        env = dict(os.environ, DB_PATH=os.path.join(tmp, 'training_data.db'), LOG_LEVEL='WARNING')
+        samples = [probe_once(env) for _ in range(args.runs)]
+
+    import_times = [s['import_s'] for s in samples]
+    report = {
+        'python': sys.version.split()[0],
+        'runs': args.runs,
+        'import_s_median': round(statistics.median(import_times), 4),
+        'import_s_min': round(min(import_times), 4),
+        'max_rss_kb_median': statistics.median(s['max_rss_kb'] for s in samples),
+        'heavy_loaded': samples[-1]['heavy_loaded'],
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sync pipeline against offline fixtures with API-call accounting.
+
+Runs `main.main()` (sheet sync) and `sync.perform_sync()` (dashboard sync)
+end to end on FakeGarmin / FakeSpreadsheet and reports, per scenario, wall
+time, peak Python memory and the number of Garmin list/detail calls and
+Sheets read/write calls as JSON:
+
+    python -m benchmarks.bench_sync                       # full matrix
+    python -m benchmarks.bench_sync --weeks 10 --activities 200 --output bench.json
+"""
+import os
+import io
+import sys
+import json
+import math
+import time
+import argparse
+import tempfile
+import tracemalloc
+import contextlib
+from datetime import datetime, timezone
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import FakeGarmin, FakeSpreadsheet, FaultInjector
+from benchmarks.fixtures import write_fixtures
+
+WEEK_SCENARIOS = [1, 10, 52]
+ACTIVITY_SCENARIOS = [20, 200, 2000]
+
+GARMIN_LIST_CALLS = ('get_activities', 'get_activities_by_date')
+GARMIN_DETAIL_CALLS = ('get_activity',)
+GARMIN_STREAM_CALLS = ('get_activity_details',)
+GARMIN_WELLNESS_CALLS = ('get_hrv_data', 'get_sleep_data')
+SHEETS_READ_CALLS = ('worksheet', 'row_values', 'col_values', 'get_all_values')
+SHEETS_WRITE_CALLS = ('batch_update', 'update', 'append_rows', 'clear', 'add_worksheet', 'add_rows', 'resize')
+
+
+def count_calls(counter, names):
+    return sum(counter.get(name, 0) for name in names)
+
+
+def call_report(garmin, sheet=None):
+    report = {
+        'garmin_list_calls': count_calls(garmin.calls, GARMIN_LIST_CALLS),
+        'garmin_detail_calls': count_calls(garmin.calls, GARMIN_DETAIL_CALLS),
+        'garmin_stream_calls': count_calls(garmin.calls, GARMIN_STREAM_CALLS),
+        'garmin_wellness_calls': count_calls(garmin.calls, GARMIN_WELLNESS_CALLS),
+    }
+    if sheet is not None:
+        report['sheets_read_calls'] = count_calls(sheet.calls, SHEETS_READ_CALLS)
+        report['sheets_write_calls'] = count_calls(sheet.calls, SHEETS_WRITE_CALLS)
+    return report
+
+
+def measure(run, trace_memory):
+    """Run `run()` with stdout silenced; return (wall seconds, peak bytes or None)"""
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run()
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_sheet_sync(fixtures_dir, weeks, activities, latency_ms):
+    """One main.main() run against fresh fakes and an empty local database"""
+    import db
+    import main
+    import quota
+
+    garmin_dir, sheet_path = write_fixtures(fixtures_dir, weeks, activities)
+    results = {}
+    for trace_memory in (False, True):
+        db_path = os.path.join(fixtures_dir, f'sheet_{int(trace_memory)}.db')
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        garmin = FakeGarmin(garmin_dir, faults=FaultInjector(latency_ms=latency_ms))
+        sheet = FakeSpreadsheet(sheet_path, faults=FaultInjector(latency_ms=latency_ms))
+        env = {'DAYS_TO_SYNC': str(math.ceil(activities / 2))}
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(db, 'DB_PATH', db_path), \
+                mock.patch.object(main, 'connect_to_garmin', return_value=garmin), \
+                mock.patch.object(main, 'connect_to_google_sheets', return_value=quota.guard_sheet(sheet)):
+            elapsed, peak = measure(main.main, trace_memory)
+        if trace_memory:
+            results['peak_memory_bytes'] = peak
+        else:
+            results['wall_time_s'] = round(elapsed, 4)
+            results.update(call_report(garmin, sheet))
+    return results
+
+
+def bench_dashboard_sync(fixtures_dir, activities, latency_ms):
+    """One sync.perform_sync() run into a scratch SQLite database"""
+    import db
+    import sync
+
+    garmin_dir, _ = write_fixtures(fixtures_dir, max(1, math.ceil(activities / 9)), activities)
+    results = {}
+    for trace_memory in (False, True):
+        db_path = os.path.join(fixtures_dir, f'bench_{int(trace_memory)}.db')
+        if os.path.exists(db_path):
+            os.remove(db_path)
+        garmin = FakeGarmin(garmin_dir, faults=FaultInjector(latency_ms=latency_ms))
+        env = {'DAYS_TO_SYNC': str(math.ceil(activities / 2))}
+        with mock.patch.dict(os.environ, env), \
+                mock.patch.object(db, 'DB_PATH', db_path), \
+                mock.patch.object(sync, 'connect_to_garmin', return_value=garmin):
+            db.init_db()
+            elapsed, peak = measure(sync.perform_sync, trace_memory)
+        if trace_memory:
+            results['peak_memory_bytes'] = peak
+        else:
+            results['wall_time_s'] = round(elapsed, 4)
+            results.update(call_report(garmin))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--weeks', type=int, nargs='*', default=WEEK_SCENARIOS)
+    parser.add_argument('--activities', type=int, nargs='*', default=ACTIVITY_SCENARIOS)
+    parser.add_argument('--latency-ms', type=float, default=0, help='simulated latency per API call')
+    parser.add_argument('--skip-sheet', action='store_true', help='skip main.main() scenarios')
+    parser.add_argument('--skip-dashboard', action='store_true', help='skip sync.perform_sync() scenarios')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    os.environ.setdefault('DB_PATH', os.path.join(tempfile.gettempdir(), 'sub5-bench.db'))
+    report = {
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': sys.version.split()[0],
+        'latency_ms': args.latency_ms,
+        'scenarios': [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix='sub5-bench-') as tmp:
+        for activities in args.activities:
+            if not args.skip_sheet:
+                for weeks in args.weeks:
+                    scenario_dir = os.path.join(tmp, f'sheet-{weeks}w-{activities}a')
+                    result = bench_sheet_sync(scenario_dir, weeks, activities, args.latency_ms)
+                    report['scenarios'].append({'target': 'main.main', 'weeks': weeks, 'activities': activities, **result})
+                    print(f"main.main {weeks}w/{activities}a: {result['wall_time_s']}s", file=sys.stderr)
+            if not args.skip_dashboard:
+                scenario_dir = os.path.join(tmp, f'dashboard-{activities}a')
+                result = bench_dashboard_sync(scenario_dir, activities, args.latency_ms)
+                report['scenarios'].append({'target': 'sync.perform_sync', 'activities': activities, **result})
+                print(f"sync.perform_sync {activities}a: {result['wall_time_s']}s", file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
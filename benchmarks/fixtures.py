@@ -0,0 +1,157 @@
+"""
+Synthetic fixtures shaped like recorded Garmin responses and the "ВЕЛ БЕГ" sheet
+"""
+import os
+import json
+import random
+from datetime import date, datetime, timedelta
+
+SHEET_TITLE = 'ВЕЛ БЕГ'
+
+# Column B layout of the training sheet: {row: label}. Rows with a block name
+# carry the block date in every week column; the other rows are metric labels.
+SHEET_LAYOUT = {
+    3: 'FTP BIKE (пт)',
+    4: 'Средние ваты',
+    5: 'Normalized power',
+    6: 'ВЕЛ длинная + БЕГ брик (сб)',
+    7: 'Средние ваты',
+    8: 'Normalized power',
+    9: 'Сред.скорость',
+    10: 'Частота вращения',
+    11: 'Средняя ЧСС',
+    13: 'Бег брик км',
+    14: 'Бег брик темп',
+    15: 'Бег брик ЧСС',
+    18: 'TVD dist (Bike)',
+    19: 'TVT time (Bike)',
+    20: 'Лонг RUN (вс)',
+    25: 'ИНТЕРВАЛ RUN (ср)',
+    29: 'TVD dist RUN',
+    30: 'TVT time RUN',
+    31: 'вариабельность СР',
+    38: 'ВЕЛ (вт)',
+    39: 'Время',
+    40: 'Расстояние',
+    41: 'Средний темп',
+    42: 'Средняя ЧП',
+    43: 'TSS',
+    44: 'Normalized power',
+    48: 'средний каденс',
+    50: 'Становая + плаванье (пн)',
+    51: 'Длительность первой тренировки',
+    52: 'Длительность второй тренировки',
+    60: 'ДЛИН ВЕЛ (чт)',
+    61: 'Время',
+    62: 'Расстояние',
+    63: 'Средние ваты',
+    64: 'Средняя ЧП',
+}
+
+# Offset of each block's day from the week's Sunday
+BLOCK_DAY_OFFSETS = {3: -2, 6: -1, 20: 0, 25: -4, 38: -5, 50: -6, 60: -3}
+
+# Weekly plan as (weekday offset from Sunday, activity type)
+WEEK_PLAN = [
+    (-6, 'strength_training'), (-6, 'lap_swimming'), (-5, 'cycling'), (-4, 'running'),
+    (-3, 'cycling'), (-2, 'cycling'), (-1, 'cycling'), (-1, 'running'), (0, 'running'),
+]
+
+
+def week_sundays(weeks, last_sunday=None):
+    """Sundays of the last `weeks` weeks, oldest first"""
+    if last_sunday is None:
+        today = date.today()
+        last_sunday = today - timedelta(days=(today.weekday() + 1) % 7)
+    return [last_sunday - timedelta(weeks=i) for i in reversed(range(weeks))]
+
+
+def build_sheet(sundays):
+    """Grid for the training worksheet with one week column per Sunday (from column C)"""
+    rows = max(SHEET_LAYOUT) + 5
+    grid = [[''] * (2 + len(sundays)) for _ in range(rows)]
+    for row, label in SHEET_LAYOUT.items():
+        grid[row - 1][1] = label
+    for col, sunday in enumerate(sundays, 2):
+        for row, offset in BLOCK_DAY_OFFSETS.items():
+            grid[row - 1][col] = (sunday + timedelta(days=offset)).strftime('%d.%m.%y')
+    return grid
+
+
+def build_activities(count, sundays, seed=0):
+    """`count` activities following WEEK_PLAN across the given weeks, newest first"""
+    rng = random.Random(seed)
+    slots = [(sunday + timedelta(days=offset), kind) for sunday in sundays for offset, kind in WEEK_PLAN]
+    activities = []
+    for i in range(count):
+        day, kind = slots[i % len(slots)]
+        start = datetime.combine(day, datetime.min.time()) + timedelta(hours=6 + (i // len(slots)) % 12)
+        duration = rng.uniform(1800, 10800)
+        if kind == 'cycling':
+            distance, speed = duration * 8.5, 8.5
+            extra = {'avgPower': rng.randint(150, 260), 'normalizedPower': rng.randint(170, 280),
+                     'trainingStressScore': rng.uniform(40, 180), 'averageBikingCadenceInRevPerMinute': rng.randint(80, 95)}
+        elif kind == 'running':
+            distance, speed = duration * 3.0, 3.0
+            extra = {'averageRunningCadenceInStepsPerMinute': rng.randint(165, 185)}
+        else:
+            distance, speed, extra = 0.0, 0.0, {}
+        activities.append({
+            'activityId': 10_000_000 + i,
+            'activityName': f'{kind} {day:%d.%m}',
+            'startTimeLocal': start.strftime('%Y-%m-%d %H:%M:%S'),
+            'activityType': {'typeKey': kind},
+            'duration': duration,
+            'distance': distance,
+            'averageSpeed': speed,
+            'averageHR': rng.randint(120, 165),
+            'calories': rng.randint(300, 1500),
+            **extra,
+        })
+    activities.sort(key=lambda a: a['startTimeLocal'], reverse=True)
+    return activities
+
+
+def activity_details(activity):
+    """get_activity() response for a list entry"""
+    summary = {
+        'duration': activity['duration'],
+        'distance': activity['distance'],
+        'averageSpeed': activity['averageSpeed'],
+        'averageHR': activity['averageHR'],
+        'calories': activity['calories'],
+        'averagePower': activity.get('avgPower'),
+        'normalizedPower': activity.get('normalizedPower'),
+        'trainingStressScore': activity.get('trainingStressScore'),
+        'averageBikeCadence': activity.get('averageBikingCadenceInRevPerMinute'),
+    }
+    return {'activityId': activity['activityId'], 'summaryDTO': {k: v for k, v in summary.items() if v is not None}}
+
+
+def write_fixtures(out_dir, weeks, activity_count, seed=0):
+    """Write a Garmin fixtures directory and a sheet fixture; return their paths"""
+    sundays = week_sundays(weeks)
+    activities = build_activities(activity_count, sundays, seed)
+
+    garmin_dir = os.path.join(out_dir, 'garmin')
+    os.makedirs(os.path.join(garmin_dir, 'activity'), exist_ok=True)
+    os.makedirs(os.path.join(garmin_dir, 'hrv'), exist_ok=True)
+    os.makedirs(os.path.join(garmin_dir, 'sleep'), exist_ok=True)
+    with open(os.path.join(garmin_dir, 'activities.json'), 'w', encoding='utf-8') as f:
+        json.dump(activities, f, ensure_ascii=False)
+    for activity in activities:
+        with open(os.path.join(garmin_dir, 'activity', f"{activity['activityId']}.json"), 'w', encoding='utf-8') as f:
+            json.dump(activity_details(activity), f)
+    for i, sunday in enumerate(sundays):
+        with open(os.path.join(garmin_dir, 'hrv', f'{sunday:%Y-%m-%d}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'hrvSummary': {'calendarDate': f'{sunday:%Y-%m-%d}', 'lastNightAvg': 60 + i % 15}}, f)
+        with open(os.path.join(garmin_dir, 'sleep', f'{sunday:%Y-%m-%d}.json'), 'w', encoding='utf-8') as f:
+            json.dump({'restingHeartRate': 45 + i % 5, 'dailySleepDTO': {
+                'calendarDate': f'{sunday:%Y-%m-%d}', 'sleepTimeSeconds': 27000 + 600 * (i % 6),
+                'sleepScores': {'overall': {'value': 70 + i % 20}}}}, f)
+
+    sheet_path = os.path.join(out_dir, 'sheet.json')
+    with open(sheet_path, 'w', encoding='utf-8') as f:
+        json.dump({SHEET_TITLE: build_sheet(sundays)}, f, ensure_ascii=False)
+
+    return garmin_dir, sheet_path
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Load test for the dashboard API against a seeded SQLite database.
+
+Seeds a scratch `training_data.db` with synthetic activities, then drives the
+read endpoints concurrently through the WSGI app (Flask test clients, one per
+worker thread) and reports p50/p95/p99 latency and throughput per endpoint.
+With --with-writer a background `sync.perform_sync` loop (offline fakes) writes to
+the same database during the run.
+
+    python -m benchmarks.load_test --rows 10000 --concurrency 8 --requests 200
+    python -m benchmarks.load_test --rows 1000000 --with-writer --output load.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+import contextlib
+from datetime import date, datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# p95 latency budget per endpoint, milliseconds
+LATENCY_BUDGET_MS = {
+    '/api/summary': 50,
+    '/api/activities?limit=50': 100,
+    '/api/activities?limit=100&type=cycling': 150,
+    '/api/weekly-stats': 50,
+    '/api/sync-logs': 50,
+    '/api/export/csv': 2000,
+    '/api/export/json': 5000,
+}
+
+ACTIVITY_TYPES = ['cycling', 'running', 'lap_swimming', 'strength_training', 'road_biking', 'trail_running']
+
+
+def seed_database(db_path, rows, seed=0, batch_size=10000):
+    """Create the schema and insert `rows` synthetic activities plus sync history"""
+    import db
+    import sync
+    import payloads
+
+    rng = random.Random(seed)
+    db.init_db()
+    conn = sqlite3.connect(db_path)
+    span_days = max(365, rows // 3)
+    today = date.today()
+
+    def generate():
+        for i in range(rows):
+            day = today - timedelta(days=rng.randrange(span_days))
+            kind = rng.choice(ACTIVITY_TYPES)
+            duration = rng.uniform(1200, 14400)
+            distance = duration * (8.0 if 'biking' in kind or kind == 'cycling' else 3.0)
+            payload = {
+                'activityId': i,
+                'activityName': f'{kind} {day:%d.%m}',
+                'startTimeLocal': f'{day} 07:00:00',
+                'activityType': {'typeKey': kind},
+                'duration': duration,
+                'distance': distance,
+                'summary': {f'metric_{k}': rng.random() for k in range(40)},
+            }
+            yield (
+                str(9_000_000 + i), day.isoformat(), kind, payload['activityName'], int(duration), distance,
+                distance / duration, rng.randint(110, 170), rng.randint(120, 280), rng.randint(130, 300),
+                rng.randint(75, 95), rng.randint(20, 250), rng.randint(200, 2000), payload,
+            )
+
+    insert = '''
+        INSERT OR REPLACE INTO activities
+        (id, date, type, name, duration, distance, avg_speed, avg_hr,
+         avg_power, normalized_power, avg_cadence, tss, calories)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    '''
+
+    def flush(batch):
+        conn.executemany(insert, [row[:-1] for row in batch])
+        payloads.save_payloads(conn, [(row[0], row[-1]) for row in batch])
+        conn.commit()
+
+    batch = []
+    for row in generate():
+        batch.append(row)
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    conn.executemany(
+        'INSERT INTO sync_logs (sync_date, status, activities_synced, details) VALUES (?, ?, ?, ?)',
+        [((datetime.now() - timedelta(hours=6 * i)).strftime('%Y-%m-%d %H:%M:%S'), 'success', 28,
+          json.dumps({'days_synced': 14})) for i in range(min(rows, 5000))]
+    )
+    conn.commit()
+    conn.close()
+    sync.calculate_and_save_weekly_stats()
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def drive_endpoint(flask_app, path, total_requests, concurrency):
+    """Issue `total_requests` GETs to `path` from `concurrency` threads"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    per_worker = [total_requests // concurrency + (1 if i < total_requests % concurrency else 0)
+                  for i in range(concurrency)]
+
+    def worker(count):
+        nonlocal errors
+        client = flask_app.test_client()
+        local, local_errors = [], 0
+        for _ in range(count):
+            start = time.perf_counter()
+            response = client.get(path)
+            response.get_data()
+            local.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                local_errors += 1
+        with lock:
+            latencies.extend(local)
+            errors += local_errors
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(worker, per_worker))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p95 = percentile(latencies, 95)
+    budget = LATENCY_BUDGET_MS.get(path)
+    return {
+        'endpoint': path,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(p95, 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'max_ms': round(latencies[-1], 2),
+        'budget_p95_ms': budget,
+        'within_budget': None if budget is None else p95 <= budget,
+    }
+
+
+@contextlib.contextmanager
+def background_writer(fixtures_dir, activities=200):
+    """Run sync.perform_sync() in a loop against offline fakes until the block exits"""
+    import sync
+    from backends import FakeGarmin
+    from benchmarks.fixtures import write_fixtures
+
+    garmin_dir, _ = write_fixtures(fixtures_dir, max(1, activities // 9), activities)
+    stop = threading.Event()
+    stats = {'syncs': 0}
+
+    def loop():
+        with mock.patch.object(sync, 'connect_to_garmin', side_effect=lambda: FakeGarmin(garmin_dir)), \
+                mock.patch.dict(os.environ, {'DAYS_TO_SYNC': str(activities // 2)}):
+            while not stop.is_set():
+                sync.perform_sync()
+                stats['syncs'] += 1
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    try:
+        yield stats
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run(endpoints, requests, concurrency, with_writer, fixtures_dir):
+    import app
+
+    results = []
+    for path in endpoints:
+        if with_writer:
+            with background_writer(os.path.join(fixtures_dir, 'writer')) as stats:
+                result = drive_endpoint(app.app, path, requests, concurrency)
+            result['concurrent_syncs'] = stats['syncs']
+        else:
+            result = drive_endpoint(app.app, path, requests, concurrency)
+        results.append(result)
+        print(f"{'writer ' if with_writer else ''}{path}: p95={result['p95_ms']}ms "
+              f"rps={result['throughput_rps']}", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=10000, help='synthetic activities to seed (10k-1M)')
+    parser.add_argument('--db', help='database path (default: scratch file in a temp dir)')
+    parser.add_argument('--reuse-db', action='store_true', help='skip seeding if --db already exists')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--endpoints', nargs='*', default=list(LATENCY_BUDGET_MS))
+    parser.add_argument('--with-writer', action='store_true', help='only run with a concurrent perform_sync writer')
+    parser.add_argument('--without-writer', action='store_true', help='only run without a writer')
+    parser.add_argument('--enforce-budget', action='store_true', help='exit 1 if any p95 exceeds its budget')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args()
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    with tempfile.TemporaryDirectory(prefix='sub5-load-') as tmp:
+        db_path = args.db or os.path.join(tmp, 'training_data.db')
+        os.environ['DB_PATH'] = db_path
+        import db
+        db.DB_PATH = db_path
+
+        if not (args.reuse_db and os.path.exists(db_path)):
+            start = time.perf_counter()
+            seed_database(db_path, args.rows)
+            print(f"Seeded {args.rows} activities in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+        modes = []
+        if not args.with_writer:
+            modes.append(False)
+        if not args.without_writer:
+            modes.append(True)
+
+        report = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'rows': args.rows,
+            'concurrency': args.concurrency,
+            'requests_per_endpoint': args.requests,
+            'db_size_bytes': os.path.getsize(db_path),
+            'runs': [
+                {'with_writer': mode, 'endpoints': run(args.endpoints, args.requests, args.concurrency, mode, tmp)}
+                for mode in modes
+            ],
+        }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.enforce_budget:
+        over = [e for r in report['runs'] for e in r['endpoints'] if e['within_budget'] is False]
+        sys.exit(1 if over else 0)
+
+
+if __name__ == '__main__':
+    main()
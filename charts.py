@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Pre-aggregated chart series for the dashboard (`/api/charts/*`).
+
+Bucketing by week/month/year and by sport happens in SQL, and every series
+is capped to a fixed number of points, so a chart response stays a few KB
+no matter how long the history is.
+"""
+from datetime import date, timedelta
+
+from db import get_db
+
+PERIODS = {
+    # Monday of the ISO week
+    'week': "date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days')",
+    'month': "strftime('%Y-%m-01', date)",
+    'year': "strftime('%Y-01-01', date)",
+}
+
+SPORT_CASE = '''
+    CASE
+        WHEN type LIKE '%cycling%' OR type LIKE '%biking%' THEN 'cycling'
+        WHEN type LIKE '%running%' THEN 'running'
+        WHEN type LIKE '%swim%' THEN 'swimming'
+        ELSE 'other'
+    END
+'''
+
+SPORTS = ('cycling', 'running', 'swimming', 'other')
+
+MAX_POINTS = 400
+
+
+def _rows(query, params=()):
+    conn = get_db()
+    try:
+        return conn.execute(query, params).fetchall()
+    finally:
+        conn.close()
+
+
+def period_starts(period, limit, today=None):
+    """Start dates of the last `limit` calendar periods, oldest first"""
+    today = today or date.today()
+    if period == 'week':
+        current = today - timedelta(days=today.weekday())
+        return [current - timedelta(weeks=i) for i in range(limit - 1, -1, -1)]
+    starts = []
+    year, month = today.year, today.month
+    for _ in range(limit):
+        starts.append(date(year, month, 1) if period == 'month' else date(year, 1, 1))
+        if period == 'month':
+            year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+        else:
+            year -= 1
+    return starts[::-1]
+
+
+def volume(period='week', limit=12):
+    """Distance (km) and time (h) per sport for the last `limit` calendar periods"""
+    bucket = PERIODS[period]
+    limit = max(1, min(limit, MAX_POINTS))
+    labels = [d.isoformat() for d in period_starts(period, limit)]
+    rows = _rows(f'''
+        SELECT {bucket} AS bucket, {SPORT_CASE} AS sport,
+               ROUND(SUM(COALESCE(distance, 0)) / 1000, 2), ROUND(SUM(COALESCE(duration, 0)) / 3600.0, 2)
+        FROM activities
+        WHERE date >= ?
+        GROUP BY bucket, sport
+    ''', (labels[0],))
+
+    index = {label: i for i, label in enumerate(labels)}
+    distance = {sport: [0.0] * len(labels) for sport in SPORTS}
+    hours = {sport: [0.0] * len(labels) for sport in SPORTS}
+    for bucket, sport, km, h in rows:
+        if bucket in index:
+            distance[sport][index[bucket]] = km
+            hours[sport][index[bucket]] = h
+    return {'period': period, 'labels': labels, 'distance_km': distance, 'hours': hours}
+
+
+def types(days=90):
+    """Activity count, distance and time per Garmin activity type over the last `days` days"""
+    query = '''
+        SELECT COALESCE(NULLIF(type, ''), 'unknown') AS activity_type, COUNT(*),
+               ROUND(SUM(COALESCE(distance, 0)) / 1000, 2), ROUND(SUM(COALESCE(duration, 0)) / 3600.0, 2)
+        FROM activities
+    '''
+    params = ()
+    if days:
+        query += ' WHERE date >= ?'
+        params = ((date.today() - timedelta(days=days)).isoformat(),)
+    rows = _rows(query + ' GROUP BY activity_type ORDER BY COUNT(*) DESC', params)
+    return {
+        'labels': [row[0] for row in rows],
+        'counts': [row[1] for row in rows],
+        'distance_km': [row[2] for row in rows],
+        'hours': [row[3] for row in rows],
+    }
+
+
+def load(days=365, max_points=200):
+    """CTL/ATL/TSB series averaged into at most `max_points` buckets"""
+    max_points = max(1, min(max_points, MAX_POINTS))
+    start = (date.today() - timedelta(days=days)).isoformat() if days else '0000-01-01'
+    first, count = _rows(
+        'SELECT MIN(date), COUNT(*) FROM training_load WHERE date > ?', (start,)
+    )[0]
+    if not count:
+        return {'labels': [], 'tss': [], 'ctl': [], 'atl': [], 'tsb': [], 'bucket_days': 1}
+    step = -(-count // max_points)
+    rows = _rows('''
+        SELECT MIN(date), ROUND(SUM(tss), 1), ROUND(AVG(ctl), 1), ROUND(AVG(atl), 1), ROUND(AVG(tsb), 1)
+        FROM training_load
+        WHERE date > ?
+        GROUP BY CAST(julianday(date) - julianday(?) AS INTEGER) / ?
+        ORDER BY MIN(date)
+    ''', (start, first, step))
+    return {
+        'labels': [row[0] for row in rows],
+        'tss': [row[1] for row in rows],
+        'ctl': [row[2] for row in rows],
+        'atl': [row[3] for row in rows],
+        'tsb': [row[4] for row in rows],
+        'bucket_days': step,
+    }
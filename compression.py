@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+HTTP response compression: gzip, or brotli when the `brotli` package is installed.
+
+`init_app(app)` compresses text responses (JSON, CSV, HTML, ...) larger than
+COMPRESS_MIN_BYTES on the fly. Files that never change (hashed static assets,
+dashboard snapshots) are compressed once when written, by
+`write_precompressed`, and served by `send_precompressed` without any work
+per request.
+"""
+import os
+import gzip
+import tempfile
+
+from flask import request, send_from_directory
+
+MIN_SIZE = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+
+COMPRESSIBLE = {
+    'application/json', 'application/javascript', 'text/javascript',
+    'text/css', 'text/csv', 'text/html', 'text/plain',
+}
+
+# On-the-fly: fast settings; precompressed files: smallest output
+DYNAMIC_LEVEL = {'br': 4, 'gzip': 6}
+STATIC_LEVEL = {'br': 11, 'gzip': 9}
+
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+def available_encodings():
+    return ('br', 'gzip') if _brotli() else ('gzip',)
+
+
+def choose_encoding(accept_encoding):
+    """Best encoding from an Accept-Encoding header that we can produce, or None"""
+    accepted = {}
+    for part in (accept_encoding or '').lower().split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name] = quality
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(data, encoding, level=None):
+    if encoding == 'br':
+        return _brotli().compress(data, quality=level if level is not None else DYNAMIC_LEVEL['br'])
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level if level is not None else DYNAMIC_LEVEL['gzip'], mtime=0)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+
+def write_precompressed(path, data):
+    """Write path.gz (and path.br) next to an immutable file"""
+    for encoding in available_encodings():
+        variant = path + SUFFIXES[encoding]
+        # Unique temp name: concurrent writers of the same file must not share one
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(variant) or '.', prefix='.', suffix='.tmp',
+                                         delete=False) as f:
+            f.write(compress(data, encoding, STATIC_LEVEL[encoding]))
+        os.replace(f.name, variant)
+
+
+def send_precompressed(directory, filename, mimetype):
+    """send_from_directory, picking a precompressed variant the client accepts"""
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if encoding and os.path.exists(os.path.join(directory, filename + SUFFIXES[encoding])):
+        response = send_from_directory(directory, filename + SUFFIXES[encoding], mimetype=mimetype)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype)
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def compress_response(response):
+    """after_request hook: compress large text bodies the client accepts"""
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < MIN_SIZE:
+        return response
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return response
+
+    response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    # The ETag was computed for the uncompressed body
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Dashboard payloads shared by the live API (app.py) and the static snapshots
+(snapshots.py): activity lists, weekly stats and the summary cards.
+"""
+import json
+
+import events
+from db import get_db, ACTIVITY_COLUMNS
+from payloads import load_payloads
+
+
+def list_activities(start_date=None, end_date=None, activity_type=None, limit=100, include_raw=False):
+    """Newest activities first, optionally filtered by date range and type"""
+    query = f'SELECT {", ".join(ACTIVITY_COLUMNS)} FROM activities WHERE 1=1'
+    params = []
+
+    if start_date:
+        query += ' AND date >= ?'
+        params.append(start_date)
+
+    if end_date:
+        query += ' AND date <= ?'
+        params.append(end_date)
+
+    if activity_type:
+        query += ' AND type LIKE ?'
+        params.append(f'%{activity_type}%')
+
+    query += ' ORDER BY date DESC LIMIT ?'
+    params.append(limit)
+
+    conn = get_db()
+    try:
+        activities = [dict(zip(ACTIVITY_COLUMNS, row)) for row in conn.execute(query, params).fetchall()]
+
+        # Raw Garmin payloads only on request
+        if include_raw:
+            raw = load_payloads(conn, [a['id'] for a in activities])
+            for activity in activities:
+                activity['data'] = raw.get(activity['id'])
+    finally:
+        conn.close()
+    return activities
+
+
+def weekly_stats(limit=12):
+    """Latest weekly_stats rows, newest week first"""
+    conn = get_db()
+    try:
+        cursor = conn.execute('''
+            SELECT * FROM weekly_stats
+            ORDER BY week_start DESC
+            LIMIT ?
+        ''', (limit,))
+
+        columns = [description[0] for description in cursor.description]
+        stats = []
+        for row in cursor.fetchall():
+            stat = dict(zip(columns, row))
+            if stat['data']:
+                stat['data'] = json.loads(stat['data'])
+            stats.append(stat)
+    finally:
+        conn.close()
+    return stats
+
+
+def summary():
+    """Totals for the last 7 days, the last sync and the current data generation"""
+    conn = get_db()
+    try:
+        cursor = conn.cursor()
+
+        # Get totals for current week (last 7 days)
+        cursor.execute('''
+            SELECT
+                COUNT(*) as total_activities,
+                SUM(CASE WHEN type LIKE '%cycling%' THEN distance ELSE 0 END) / 1000 as total_cycling_km,
+                SUM(CASE WHEN type LIKE '%running%' THEN distance ELSE 0 END) / 1000 as total_running_km,
+                SUM(duration) as total_duration,
+                AVG(avg_hr) as avg_hr,
+                SUM(calories) as total_calories
+            FROM activities
+            WHERE date >= date('now', '-7 days')
+        ''')
+
+        week_stats = dict(zip(
+            ['total_activities', 'total_cycling_km', 'total_running_km', 'total_duration', 'avg_hr', 'total_calories'],
+            cursor.fetchone()
+        ))
+
+        # Get last sync info
+        cursor.execute('''
+            SELECT sync_date, status, activities_synced
+            FROM sync_logs
+            ORDER BY sync_date DESC
+            LIMIT 1
+        ''')
+
+        last_sync = cursor.fetchone()
+        if last_sync:
+            last_sync_info = {
+                'date': last_sync[0],
+                'status': last_sync[1],
+                'activities_synced': last_sync[2]
+            }
+        else:
+            last_sync_info = None
+
+        generation = events.current_generation(conn)
+    finally:
+        conn.close()
+
+    return {
+        'week_stats': week_stats,
+        'last_sync': last_sync_info,
+        'generation': generation
+    }
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+SQLite storage for training data: connection factory and schema
+"""
+import os
+import sqlite3
+import metrics
+
+DB_PATH = os.getenv('DB_PATH', 'training_data.db')
+
+# Columns served by the API; the raw Garmin payload lives in activity_payloads
+ACTIVITY_COLUMNS = (
+    'id', 'date', 'type', 'name', 'duration', 'distance', 'avg_speed', 'avg_hr',
+    'avg_power', 'normalized_power', 'avg_cadence', 'tss', 'calories', 'notes', 'created_at', 'updated_at',
+)
+
+# Secondary indexes, created by init_db and re-checked by maintenance.py
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS idx_activities_date ON activities(date)',
+    # /api/sync-logs and the summary's last sync sort by date
+    'CREATE INDEX IF NOT EXISTS idx_sync_logs_date ON sync_logs(sync_date)',
+)
+
+def get_db():
+    """Open a database connection whose queries are timed in /metrics"""
+    conn = sqlite3.connect(DB_PATH, factory=metrics.InstrumentedConnection)
+    # REPLACE deletes the old row; let that fire the delete triggers too (FTS index)
+    conn.execute('PRAGMA recursive_triggers = ON')
+    return conn
+
+def create_search_index(cursor):
+    """FTS5 index over activity name, type and notes, kept in sync by triggers"""
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'activities_fts'"
+    ).fetchone()
+    
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS activities_fts USING fts5(
+            name, type, notes,
+            content='activities', content_rowid='rowid',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS activities_fts_insert AFTER INSERT ON activities BEGIN
+            INSERT INTO activities_fts (rowid, name, type, notes)
+            VALUES (new.rowid, new.name, new.type, new.notes);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS activities_fts_delete AFTER DELETE ON activities BEGIN
+            INSERT INTO activities_fts (activities_fts, rowid, name, type, notes)
+            VALUES ('delete', old.rowid, old.name, old.type, old.notes);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS activities_fts_update AFTER UPDATE OF name, type, notes ON activities BEGIN
+            INSERT INTO activities_fts (activities_fts, rowid, name, type, notes)
+            VALUES ('delete', old.rowid, old.name, old.type, old.notes);
+            INSERT INTO activities_fts (rowid, name, type, notes)
+            VALUES (new.rowid, new.name, new.type, new.notes);
+        END
+    ''')
+    
+    if not exists:
+        # Default ranking weights name over notes over type (bm25 column weights)
+        cursor.execute("INSERT INTO activities_fts (activities_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 5.0)')")
+        # Index rows that existed before the FTS table
+        cursor.execute("INSERT INTO activities_fts (activities_fts) VALUES ('rebuild')")
+
+def init_db():
+    """Initialize SQLite database for storing training data"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # Takes effect only while the file is still empty; maintenance.py converts older databases
+    cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
+    # Create activities table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activities (
+            id TEXT PRIMARY KEY,
+            date DATE,
+            type TEXT,
+            name TEXT,
+            duration INTEGER,
+            distance REAL,
+            avg_speed REAL,
+            avg_hr INTEGER,
+            avg_power INTEGER,
+            normalized_power INTEGER,
+            avg_cadence INTEGER,
+            tss INTEGER,
+            calories INTEGER,
+            data JSON,
+            notes TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create sync_logs table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sync_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT,
+            activities_synced INTEGER,
+            error_message TEXT,
+            details JSON
+        )
+    ''')
+    
+    # Create weekly_stats table
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weekly_stats (
+            week_start DATE PRIMARY KEY,
+            week_end DATE,
+            total_cycling_km REAL,
+            total_cycling_time INTEGER,
+            total_running_km REAL,
+            total_running_time INTEGER,
+            avg_hrv REAL,
+            total_activities INTEGER,
+            data JSON,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create sync_state table (checkpoints of long-running jobs such as backfill)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            key TEXT PRIMARY KEY,
+            value JSON,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create api_quota table (shared Google Sheets token buckets, see quota.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS api_quota (
+            bucket TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            refilled_at REAL NOT NULL,
+            backoff_seconds REAL NOT NULL DEFAULT 0,
+            blocked_until REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    # Create daily_wellness table (HRV, resting HR, sleep per calendar day)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS daily_wellness (
+            date DATE PRIMARY KEY,
+            hrv_last_night_avg REAL,
+            hrv_weekly_avg REAL,
+            hrv_status TEXT,
+            resting_hr INTEGER,
+            sleep_seconds INTEGER,
+            deep_sleep_seconds INTEGER,
+            light_sleep_seconds INTEGER,
+            rem_sleep_seconds INTEGER,
+            awake_seconds INTEGER,
+            sleep_score INTEGER,
+            data JSON,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create activity_streams table (per-sample time series, one float32 BLOB per channel)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_streams (
+            activity_id TEXT PRIMARY KEY,
+            samples INTEGER,
+            channels TEXT,
+            time BLOB,
+            power BLOB,
+            heart_rate BLOB,
+            cadence BLOB,
+            speed BLOB,
+            altitude BLOB,
+            fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create activity_metrics table (NP/IF/TSS and mean-max curves computed from streams)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_metrics (
+            activity_id TEXT PRIMARY KEY,
+            duration_s INTEGER,
+            avg_power REAL,
+            normalized_power REAL,
+            intensity_factor REAL,
+            tss REAL,
+            hr_tss REAL,
+            power_curve JSON,
+            speed_curve JSON,
+            ftp REAL,
+            lthr REAL,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    # Create training_load table (daily TSS with CTL/ATL/TSB, maintained incrementally)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS training_load (
+            date DATE PRIMARY KEY,
+            tss REAL,
+            ctl REAL,
+            atl REAL,
+            tsb REAL
+        )
+    ''')
+    
+    # Time in HR/power zones: seconds per zone as a JSON array, per activity and kind
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_zones (
+            activity_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            seconds JSON NOT NULL,
+            boundaries JSON,
+            source TEXT,
+            computed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (activity_id, kind)
+        )
+    ''')
+    
+    # Weekly zone totals (rebuilt from activity_zones for the weeks a sync touches);
+    # the key order serves season queries as a single range scan
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS weekly_zones (
+            kind TEXT NOT NULL,
+            week_start DATE NOT NULL,
+            zone INTEGER NOT NULL,
+            seconds INTEGER NOT NULL,
+            activities INTEGER,
+            PRIMARY KEY (kind, week_start, zone)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Best efforts per sport: power (target = seconds, value = W) and
+    # distance (target = metres, value = seconds); rows change only on a new best
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS records (
+            sport TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            target REAL NOT NULL,
+            value REAL NOT NULL,
+            activity_id TEXT,
+            date DATE,
+            start_offset INTEGER,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (sport, kind, target)
+        )
+    ''')
+    
+    # Activity sums per (period, bucket, sport) for /api/aggregate; period is
+    # day/week/month/year and bucket the first day of the period
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_rollups (
+            period TEXT NOT NULL,
+            bucket DATE NOT NULL,
+            sport TEXT NOT NULL,
+            activities INTEGER NOT NULL,
+            distance REAL,
+            duration REAL,
+            tss REAL,
+            hr_weighted REAL,
+            hr_seconds REAL,
+            PRIMARY KEY (period, bucket, sport)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Create activity_payloads table (raw Garmin JSON, zlib-compressed, loaded on demand)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS activity_payloads (
+            activity_id TEXT PRIMARY KEY,
+            sha256 TEXT,
+            encoding TEXT,
+            size INTEGER,
+            payload BLOB,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    for statement in INDEXES:
+        cursor.execute(statement)
+    
+    # Free-text notes (added after the first release)
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(activities)')}
+    if 'notes' not in columns:
+        cursor.execute('ALTER TABLE activities ADD COLUMN notes TEXT')
+    
+    create_search_index(cursor)
+    
+    conn.commit()
+    
+    # Databases created before activity_payloads kept the JSON in activities.data
+    from payloads import migrate_inline_payloads
+    migrate_inline_payloads(conn)
+    conn.close()
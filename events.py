@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Sync progress and "data changed" notifications for the dashboard (`/api/events`).
+
+Producers (sync.py, the notes API) write the latest state to `sync_state`:
+
+    sync_progress  {"run": ..., "status": "running", "stage": "details", "saved": 3, "total": 20}
+    generation     {"generation": 42, "panels": ["summary", "charts", ...]}
+
+and `stream()` turns changes of those two rows into Server-Sent Events. The
+store is SQLite rather than process memory because gunicorn runs several
+workers and the sync thread may live in a different one than the browser's
+stream; within one process a condition variable wakes streams immediately,
+otherwise they notice the change on their next poll of the two rows.
+"""
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from db import get_db
+
+PROGRESS_KEY = 'sync_progress'
+GENERATION_KEY = 'generation'
+
+# Dashboard panels a data change can affect (see static/js/app.js)
+ALL_PANELS = ('summary', 'charts', 'activities', 'weekly', 'logs')
+
+POLL_SECONDS = float(os.getenv('EVENTS_POLL_SECONDS', '1'))
+HEARTBEAT_SECONDS = 15
+# Streams end after this long and the browser reconnects (with Last-Event-ID),
+# so a worker thread is never held by a forgotten tab for long
+STREAM_SECONDS = int(os.getenv('EVENTS_STREAM_SECONDS', '25'))
+RETRY_MS = 3000
+# Every open stream holds a gthread worker thread (Procfile: 8 per worker); at
+# most this many per process, the rest stay free for API requests
+MAX_STREAMS = int(os.getenv('EVENTS_MAX_STREAMS', '4'))
+# A client turned away because all stream slots are taken retries after this long
+BUSY_RETRY_MS = 15000
+
+_wakeup = threading.Condition()
+_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+def _notify():
+    with _wakeup:
+        _wakeup.notify_all()
+
+
+def publish_progress(run, status='running', **progress):
+    """Record the current stage of a sync/backfill run"""
+    value = {'run': run, 'status': status, 'at': datetime.now().isoformat(timespec='seconds'), **progress}
+    conn = get_db()
+    try:
+        conn.execute('''
+            INSERT INTO sync_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+        ''', (PROGRESS_KEY, json.dumps(value)))
+        conn.commit()
+    finally:
+        conn.close()
+    _notify()
+
+
+def bump_generation(panels=ALL_PANELS):
+    """Advance the data generation after a commit; return the new number"""
+    conn = get_db()
+    try:
+        # Single statement, so concurrent writers cannot lose an increment
+        conn.execute('''
+            INSERT INTO sync_state (key, value, updated_at)
+            VALUES (?, json_object('generation', 1, 'panels', json(?)), CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET
+                value = json_object(
+                    'generation', COALESCE(json_extract(sync_state.value, '$.generation'), 0) + 1,
+                    'panels', json(?)
+                ),
+                updated_at = CURRENT_TIMESTAMP
+        ''', (GENERATION_KEY, json.dumps(list(panels)), json.dumps(list(panels))))
+        conn.commit()
+        generation = current_generation(conn)
+    finally:
+        conn.close()
+    _notify()
+    return generation
+
+
+def current_generation(conn=None):
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (GENERATION_KEY,)).fetchone()
+        return json.loads(row[0])['generation'] if row else 0
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def format_event(event, data, event_id=None):
+    """One SSE message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def _read_state(conn):
+    rows = conn.execute(
+        'SELECT key, value FROM sync_state WHERE key IN (?, ?)', (PROGRESS_KEY, GENERATION_KEY)
+    ).fetchall()
+    return dict(rows)
+
+
+def stream(last_event_id=None, duration=STREAM_SECONDS):
+    """Generator of SSE messages: `progress` on every stage change, `changed` per generation
+
+    A client reconnecting with an older Last-Event-ID gets the missed
+    `changed` event right away; a new client gets the current generation.
+    With MAX_STREAMS streams already open the client is only told to come
+    back after BUSY_RETRY_MS.
+    """
+    if not _slots.acquire(blocking=False):
+        yield f'retry: {BUSY_RETRY_MS}\n\n'
+        return
+    try:
+        yield from _stream(last_event_id, duration)
+    finally:
+        _slots.release()
+
+
+def _stream(last_event_id, duration):
+    try:
+        last_generation = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_generation = None
+    last_progress = first_progress = object()
+    deadline = time.monotonic() + duration
+    next_heartbeat = time.monotonic() + HEARTBEAT_SECONDS
+
+    yield f'retry: {RETRY_MS}\n\n'
+    conn = get_db()
+    try:
+        while True:
+            state = _read_state(conn)
+
+            progress = state.get(PROGRESS_KEY)
+            if progress != last_progress:
+                data = json.loads(progress) if progress else None
+                # On connect only a run still in progress is worth showing
+                if data and (last_progress is not first_progress or data.get('status') == 'running'):
+                    yield format_event('progress', data)
+                last_progress = progress
+
+            generation = json.loads(state.get(GENERATION_KEY) or '{"generation": 0, "panels": []}')
+            if generation['generation'] != last_generation:
+                if last_generation is None:
+                    # First contact: the page has just loaded its data, nothing to refresh
+                    generation = {**generation, 'panels': []}
+                yield format_event('changed', generation, event_id=generation['generation'])
+                last_generation = generation['generation']
+
+            now = time.monotonic()
+            if now >= deadline:
+                return
+            if now >= next_heartbeat:
+                yield ': ping\n\n'
+                next_heartbeat = now + HEARTBEAT_SECONDS
+
+            with _wakeup:
+                _wakeup.wait(timeout=min(POLL_SECONDS, deadline - now))
+    finally:
+        conn.close()
@@ -3,75 +3,33 @@
 Database initialization script for deployment
 Run this before starting the application to create database tables
 """
-import sqlite3
-import os
-
-DB_PATH = 'training_data.db'
+from db import DB_PATH, get_db, init_db as create_schema
 
 def init_db():
     """Initialize SQLite database for storing training data"""
     print("Initializing database...")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    # Create activities table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS activities (
-            id TEXT PRIMARY KEY,
-            date DATE,
-            type TEXT,
-            name TEXT,
-            duration INTEGER,
-            distance REAL,
-            avg_speed REAL,
-            avg_hr INTEGER,
-            avg_power INTEGER,
-            normalized_power INTEGER,
-            avg_cadence INTEGER,
-            tss INTEGER,
-            calories INTEGER,
-            data JSON,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Create sync_logs table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS sync_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            sync_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            status TEXT,
-            activities_synced INTEGER,
-            error_message TEXT,
-            details JSON
-        )
-    ''')
-
-    # Create weekly_stats table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS weekly_stats (
-            week_start DATE PRIMARY KEY,
-            week_end DATE,
-            total_cycling_km REAL,
-            total_cycling_time INTEGER,
-            total_running_km REAL,
-            total_running_time INTEGER,
-            avg_hrv REAL,
-            total_activities INTEGER,
-            data JSON,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+    create_schema()
 
     print(f"✅ Database initialized successfully at {DB_PATH}")
-    print(f"   - activities table created")
-    print(f"   - sync_logs table created")
-    print(f"   - weekly_stats table created")
+
+    # List what is actually there instead of a fixed set of names
+    conn = get_db()
+    try:
+        # FTS5 shadow tables (activities_fts_data, ...) are left out
+        objects = conn.execute('''
+            SELECT m.type, m.name FROM sqlite_master m
+            WHERE m.type IN ('table', 'index', 'trigger') AND m.name NOT LIKE 'sqlite_%'
+              AND NOT (m.type = 'table' AND EXISTS (
+                  SELECT 1 FROM sqlite_master v
+                  WHERE v.sql LIKE 'CREATE VIRTUAL TABLE%' AND m.name LIKE v.name || '\\_%' ESCAPE '\\'
+              ))
+            ORDER BY CASE m.type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END, m.name
+        ''').fetchall()
+    finally:
+        conn.close()
+    for object_type, name in objects:
+        print(f"   - {name} ({object_type})")
 
 if __name__ == '__main__':
     init_db()
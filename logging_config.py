@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Logging setup shared by the CLI sync (main.py) and the web app (app.py).
+
+    LOG_LEVEL=INFO          # DEBUG shows per-block details
+    LOG_FORMAT=text|json    # json emits one object per record with extra fields
+    SYNC_TRACE_CELLS=true   # additionally log every sheet cell written (very verbose)
+
+Fields passed via `extra={...}` are appended as key=value in text mode and as
+top-level keys in json mode.
+"""
+import os
+import sys
+import json
+import logging
+
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _extra_fields(record):
+    return {k: v for k, v in vars(record).items() if k not in _STANDARD_ATTRS and not k.startswith('_')}
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Plain text with extra fields appended as key=value"""
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in fields.items())
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record"""
+
+    def format(self, record):
+        payload = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **_extra_fields(record),
+        }
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def trace_cells_enabled():
+    """Per-cell tracing is opt-in: it writes one record for every cell in the sheet sync"""
+    return os.getenv('SYNC_TRACE_CELLS', 'false').lower() == 'true'
+
+
+def configure_logging(default_level='INFO'):
+    """Install a single stdout handler on the root logger according to LOG_LEVEL/LOG_FORMAT"""
+    level = os.getenv('LOG_LEVEL', default_level).upper()
+    if trace_cells_enabled():
+        level = 'DEBUG'
+
+    handler = logging.StreamHandler(sys.stdout)
+    if os.getenv('LOG_FORMAT', 'text').lower() == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(KeyValueFormatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
@@ -2,17 +2,30 @@
 import os
 import json
 import re
+import time
+import logging
 from datetime import datetime, timedelta
-from garminconnect import Garmin
-import gspread
-from google.oauth2.service_account import Credentials
 from dotenv import load_dotenv
+from backends import use_fake_garmin, use_fake_sheets, fake_garmin_from_env, fake_sheets_from_env
+import metrics
+import quota
+import wellness
+import analytics
+import streams
+from db import init_db
+from logging_config import configure_logging, trace_cells_enabled
 
 
 load_dotenv()
 
+logger = logging.getLogger('sub5.sync')
+
 def connect_to_garmin():
     """Подключение к Garmin Connect"""
+    if use_fake_garmin():
+        logger.info("Using offline Garmin backend (GARMIN_BACKEND=fake)")
+        return metrics.instrument_garmin(fake_garmin_from_env())
+    
     email = os.getenv('GARMIN_EMAIL')
     password = os.getenv('GARMIN_PASSWORD')
     session_data = os.getenv('SESSION_SECRET')
@@ -20,38 +33,40 @@ def connect_to_garmin():
     if not email or not password:
         raise ValueError("Garmin credentials not found. Please set GARMIN_EMAIL and GARMIN_PASSWORD")
     
-    print("Connecting to Garmin Connect...")
+    # Тяжелые клиентские библиотеки импортируются только при реальной синхронизации
+    from garminconnect import Garmin
+    
+    logger.info("Connecting to Garmin Connect...")
     
     try:
-        client = Garmin(email, password)
+        client = metrics.instrument_garmin(Garmin(email, password))
         
         if session_data:
             try:
-                print("Attempting to use saved session...")
+                logger.info("Attempting to use saved session...")
                 client.garth.loads(session_data)
                 test_date = datetime.today().strftime("%Y-%m-%d")
                 client.get_user_summary(test_date)
-                print("✓ Successfully connected using saved session!")
+                logger.info("✓ Successfully connected using saved session!")
                 return client
             except Exception as e:
-                print(f"Saved session invalid, logging in again... ({str(e)})")
+                logger.warning(f"Saved session invalid, logging in again... ({str(e)})")
         
-        print("Logging in with credentials (this may take a moment)...")
+        logger.info("Logging in with credentials (this may take a moment)...")
         client.login()
         
         try:
             token_data = client.garth.dumps()
-            print(f"\n{'='*60}")
-            print(f"✓ Login successful!")
-            print(f"{'='*60}")
-            print(f"\nIMPORTANT: To avoid re-logging in every time, add this to your Secrets:")
-            print(f"SESSION_SECRET = {token_data[:80]}...")
-            print(f"(Full token data has been saved, copy from logs if needed)")
-            print(f"{'='*60}\n")
+            logger.warning(
+                f"✓ Login successful!\n"
+                f"IMPORTANT: To avoid re-logging in every time, add this to your Secrets:\n"
+                f"SESSION_SECRET = {token_data[:80]}...\n"
+                f"(Full token data has been saved, copy from logs if needed)"
+            )
         except Exception as e:
-            print(f"Warning: Could not save session data: {str(e)}")
+            logger.warning(f"Could not save session data: {str(e)}")
         
-        print("Successfully connected to Garmin!")
+        logger.info("Successfully connected to Garmin!")
         return client
         
     except Exception as e:
@@ -72,13 +87,35 @@ def connect_to_garmin():
             )
         raise
 
+def connect_activity_source(source=None):
+    """Источник тренировок для синхронизации таблицы: Garmin или локальная база
+    
+    source (или SHEET_SOURCE): 'garmin' (по умолчанию) - живой клиент Garmin,
+    'local' - LocalActivityRepository поверх training_data.db, без обращений к Garmin.
+    """
+    source = (source or os.getenv('SHEET_SOURCE', 'garmin')).lower()
+    if source == 'local':
+        from repository import LocalActivityRepository
+        logger.info("Using local database as activity source (SHEET_SOURCE=local)")
+        return metrics.InstrumentedClient(LocalActivityRepository(), 'local', metrics.GARMIN_METHODS)
+    if source != 'garmin':
+        raise ValueError(f"Unknown SHEET_SOURCE: {source} (expected garmin or local)")
+    return connect_to_garmin()
+
 def connect_to_google_sheets():
     """Подключение к Google Sheets"""
+    if use_fake_sheets():
+        logger.info("Using offline Google Sheets backend (SHEETS_BACKEND=fake)")
+        return quota.guard_sheet(metrics.instrument_sheet(fake_sheets_from_env()))
+    
     spreadsheet_url = os.getenv('GOOGLE_SHEET_URL')
     
     if not spreadsheet_url:
         raise ValueError("Google Sheet URL not found. Please set GOOGLE_SHEET_URL")
     
+    import gspread
+    from google.oauth2.service_account import Credentials
+    
     scopes = [
         'https://www.googleapis.com/auth/spreadsheets',
         'https://www.googleapis.com/auth/drive'
@@ -90,28 +127,28 @@ def connect_to_google_sheets():
         creds_dict = json.loads(service_account_json)
         service_account_email = creds_dict.get('client_email', 'UNKNOWN')
         creds = Credentials.from_service_account_info(creds_dict, scopes=scopes)
-        print("Connecting to Google Sheets with service account...")
+        logger.info("Connecting to Google Sheets with service account...")
     else:
-        print("Error: SERVICE_ACCOUNT_JSON not found in environment variables")
+        logger.error("SERVICE_ACCOUNT_JSON not found in environment variables")
         raise ValueError("SERVICE_ACCOUNT_JSON is required")
     
     client = gspread.authorize(creds)
     
     try:
-        sheet = client.open_by_url(spreadsheet_url)
-        print(f"✓ Successfully connected to Google Sheet!")
-        return sheet
+        with metrics.timer('external_call', service='sheets', method='open_by_url'):
+            sheet = quota.READ_BUCKET.call(client.open_by_url, spreadsheet_url)
+        logger.info("✓ Successfully connected to Google Sheet!")
+        # Все вызовы листа проходят через общую квоту (quota.py) и метрики
+        return quota.guard_sheet(metrics.instrument_sheet(sheet))
     except PermissionError:
-        print("\n" + "="*60)
-        print("❌ ОШИБКА ДОСТУПА К GOOGLE ТАБЛИЦЕ")
-        print("="*60)
-        print(f"\nВам нужно дать доступ к таблице для Service Account!")
-        print(f"\n1. Откройте таблицу: {spreadsheet_url}")
-        print(f"2. Нажмите 'Настроить доступ' (Share)")
-        print(f"3. Добавьте этот email с правами 'Редактор':")
-        print(f"\n   {service_account_email}")
-        print(f"\n4. Нажмите 'Готово' и запустите скрипт снова")
-        print("="*60 + "\n")
+        logger.error(
+            f"❌ ОШИБКА ДОСТУПА К GOOGLE ТАБЛИЦЕ\n"
+            f"Вам нужно дать доступ к таблице для Service Account!\n"
+            f"1. Откройте таблицу: {spreadsheet_url}\n"
+            f"2. Нажмите 'Настроить доступ' (Share)\n"
+            f"3. Добавьте этот email с правами 'Редактор': {service_account_email}\n"
+            f"4. Нажмите 'Готово' и запустите скрипт снова"
+        )
         raise
 
 def parse_date(date_str):
@@ -161,15 +198,32 @@ def format_pace(speed_mps):
     seconds = int((pace_min_per_km - minutes) * 60)
     return f"{minutes}:{seconds:02d}"
 
+def iter_activity_pages(garmin_client, page_size=100, start=0):
+    """Генератор страниц истории тренировок Garmin (от новых к старым)
+    
+    Возвращает пары (start, page), где start - смещение страницы. Останавливается
+    на пустой или неполной странице, поэтому вся история читается потоково,
+    без загрузки в память целиком.
+    """
+    while True:
+        page = garmin_client.get_activities(start, page_size)
+        if not page:
+            return
+        yield start, page
+        if len(page) < page_size:
+            return
+        start += len(page)
+
 def get_activities_for_date(garmin_client, target_date):
     """Получить все тренировки за конкретную дату"""
-    # Получаем тренировки за этот день
-    activities = garmin_client.get_activities(0, 50)  # Берем последние 50 тренировок
-    
     # Если target_date - datetime, преобразуем в date
     if hasattr(target_date, 'date'):
         target_date = target_date.date()
     
+    # Запрос по диапазону дат вместо "последних 50": старые даты тоже находятся
+    date_str = target_date.strftime('%Y-%m-%d')
+    activities = garmin_client.get_activities_by_date(date_str, date_str)
+    
     result = []
     for activity in activities:
         start_time_str = activity.get('startTimeLocal', '')
@@ -202,6 +256,22 @@ def get_training_blocks(worksheet):
     
     return blocks
 
+def get_computed_metrics(activity_id):
+    """NP/TSS, рассчитанные по сохраненным потокам (analytics.py), или пустой словарь
+    
+    Используется, когда Garmin не дал normalizedPower / trainingStressScore
+    (бег, велосипед без измерителя мощности). Garmin при этом не запрашивается.
+    """
+    try:
+        computed = analytics.get_activity_metrics(activity_id)
+        if computed is None and streams.load_streams(activity_id, channels=('time',)) is not None:
+            analytics.analyze_activities([activity_id])
+            computed = analytics.get_activity_metrics(activity_id)
+        return computed or {}
+    except Exception as e:
+        logger.debug(f"Нет рассчитанных метрик для {activity_id}: {e}")
+        return {}
+
 def process_cycling_data(garmin_client, activities):
     """Обработка данных велосипеда"""
     if not activities:
@@ -228,6 +298,12 @@ def process_cycling_data(garmin_client, activities):
         avg_hr = summary.get('averageHR', '')
         tss = summary.get('trainingStressScore', '')
         
+        # Строки 8 и 43 не остаются пустыми: считаем NP/TSS по потокам
+        if not normalized_power or not tss:
+            computed = get_computed_metrics(activity_id)
+            normalized_power = normalized_power or computed.get('normalized_power') or ''
+            tss = tss or computed.get('tss') or computed.get('hr_tss') or ''
+        
         if avg_power:
             data['avg_power'].append(str(int(avg_power)))
         if normalized_power:
@@ -265,37 +341,52 @@ def process_running_data(garmin_client, activity):
         'hr': f"{int(avg_hr)} уд./мин" if avg_hr else ''
     }
 
+def rowcol_to_a1(row, col):
+    """Номер строки и столбца (с 1) в A1-нотацию, например (7, 5) -> 'E7'"""
+    letters = ''
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return f"{letters}{row}"
+
 class BatchUpdater:
     """Класс для накопления обновлений и отправки batch запросом"""
     def __init__(self, worksheet):
         self.worksheet = worksheet
         self.updates = []
+        self.trace = trace_cells_enabled()
     
-    def add_update(self, row, col, value):
-        """Добавить обновление в очередь"""
+    def add_update(self, row, col, value, label=None):
+        """Добавить обновление в очередь (при SYNC_TRACE_CELLS=true каждая ячейка пишется в лог)"""
         self.updates.append({
             'row': row,
             'col': col,
             'value': str(value) if value else ''
         })
+        if self.trace:
+            logger.debug("cell", extra={'cell': rowcol_to_a1(row, col), 'label': label, 'value': value})
     
     def flush(self):
-        """Отправить все накопленные обновления одним запросом"""
+        """Отправить все накопленные обновления одним запросом
+        
+        Запись идет через очередь quota.WRITES: при исчерпанной квоте ячейки
+        остаются в очереди и объединяются со следующими обновлениями листа.
+        """
         if not self.updates:
             return
         
         # Формируем batch_update запрос
         cells_to_update = []
         for update in self.updates:
-            cell = gspread.utils.rowcol_to_a1(update['row'], update['col'])
+            cell = rowcol_to_a1(update['row'], update['col'])
             cells_to_update.append({
                 'range': cell,
                 'values': [[update['value']]]
             })
         
-        # Отправляем batch update
+        # Отправляем batch update (или ставим в очередь до восстановления квоты)
         if cells_to_update:
-            self.worksheet.batch_update(cells_to_update, value_input_option='USER_ENTERED')
+            quota.WRITES.submit(self.worksheet, cells_to_update)
         
         self.updates = []
 
@@ -308,15 +399,18 @@ def calculate_weekly_totals(garmin_client, week_activities, sunday_date, batch,
         sunday_date: Дата воскресенья (конец недели из строки 20)
         batch: BatchUpdater для записи данных
         col_index: Индекс столбца
+    
+    Returns:
+        Словарь с недельными итогами (для сводной записи лога) или None
     """
     if not sunday_date or not week_activities:
-        return
+        return None
     
     # Неделя: понедельник - воскресенье (пн-вс)
     # Если воскресенье = 19.10, то понедельник = 19.10 - 6 дней = 13.10
     monday_date = sunday_date - timedelta(days=6)
     
-    print(f"\n📊 Подсчет недельных итогов (пн-вс: {monday_date.strftime('%d.%m')} - {sunday_date.strftime('%d.%m')})...")
+    logger.debug(f"📊 Подсчет недельных итогов (пн-вс: {monday_date.strftime('%d.%m')} - {sunday_date.strftime('%d.%m')})")
     
     # Фильтруем активности недели (пн-вс)
     week_filtered_activities = []
@@ -370,23 +464,19 @@ def calculate_weekly_totals(garmin_client, week_activities, sunday_date, batch,
     # Извлекаем HRV из воскресной Long Run
     if sunday_runs:
         try:
-            # Получаем HRV данные для воскресенья
-            hrv_data = garmin_client.get_hrv_data(sunday_date.strftime('%Y-%m-%d'))
-            if hrv_data and 'hrvSummary' in hrv_data:
-                # lastNightAvg - средняя HRV за последнюю ночь
-                hrv_value = hrv_data['hrvSummary'].get('lastNightAvg')
-                if hrv_value:
-                    sunday_long_run_hrv = str(hrv_value)
+            # lastNightAvg - средняя HRV за последнюю ночь; берется из локальной
+            # таблицы daily_wellness, Garmin запрашивается только для новых дней
+            hrv_value = wellness.get_hrv(garmin_client, sunday_date)
+            if hrv_value:
+                sunday_long_run_hrv = f"{hrv_value:g}"
         except Exception as e:
-            print(f"  ⚠️ Не удалось получить HRV: {e}")
-            pass
+            logger.warning(f"⚠️ Не удалось получить HRV: {e}", extra={'date': sunday_date.isoformat()})
     
     # Форматируем данные
     # Строка 18: TVD dist (Bike) - недельный проезд в км
     if total_cycling_distance > 0:
         cycling_dist_str = f"{total_cycling_distance:.2f}"
-        batch.add_update(18, col_index + 1, cycling_dist_str)
-        print(f"  ✓ TVD dist (Bike): {cycling_dist_str} км → строка 18")
+        batch.add_update(18, col_index + 1, cycling_dist_str, label='TVD dist (Bike)')
     
     # Строка 19: TVT time (Bike) - формат ЧЧ:ММ или ММ:СС
     if total_cycling_time > 0:
@@ -397,14 +487,12 @@ def calculate_weekly_totals(garmin_client, week_activities, sunday_date, batch,
         else:
             seconds = int(total_cycling_time % 60)
             cycling_time_str = f"{minutes}:{seconds:02d}"
-        batch.add_update(19, col_index + 1, cycling_time_str)
-        print(f"  ✓ TVT time (Bike): {cycling_time_str} → строка 19")
+        batch.add_update(19, col_index + 1, cycling_time_str, label='TVT time (Bike)')
     
     # Строка 29: TVD dist RUN - недельный пробег в км
     if total_running_distance > 0:
         running_dist_str = f"{total_running_distance:.2f}"
-        batch.add_update(29, col_index + 1, running_dist_str)
-        print(f"  ✓ TVD dist RUN: {running_dist_str} км → строка 29")
+        batch.add_update(29, col_index + 1, running_dist_str, label='TVD dist RUN')
     
     # Строка 30: TVT time RUN
     if total_running_time > 0:
@@ -415,15 +503,17 @@ def calculate_weekly_totals(garmin_client, week_activities, sunday_date, batch,
         else:
             seconds = int(total_running_time % 60)
             running_time_str = f"{minutes}:{seconds:02d}"
-        batch.add_update(30, col_index + 1, running_time_str)
-        print(f"  ✓ TVT time RUN: {running_time_str} → строка 30")
+        batch.add_update(30, col_index + 1, running_time_str, label='TVT time RUN')
     
     # Строка 31: вариабельность СР из Long Run (вс)
     if sunday_long_run_hrv:
-        batch.add_update(31, col_index + 1, sunday_long_run_hrv)
-        print(f"  ✓ Вариабельность СР (HRV): {sunday_long_run_hrv} → строка 31")
+        batch.add_update(31, col_index + 1, sunday_long_run_hrv, label='Вариабельность СР (HRV)')
     
-    print(f"  📈 Итого вел: {total_cycling_distance:.2f} км, бег: {total_running_distance:.2f} км")
+    return {
+        'cycling_km': round(total_cycling_distance, 2),
+        'running_km': round(total_running_distance, 2),
+        'hrv': sunday_long_run_hrv,
+    }
 
 def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, training_blocks=None, week_activities=None):
     """Синхронизация данных в конкретный столбец
@@ -436,10 +526,6 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
         training_blocks: Список блоков тренировок (для оптимизации API)
         week_activities: Список всех активностей недели (для оптимизации API)
     """
-    print(f"\n{'='*60}")
-    print(f"Синхронизация для столбца {column}")
-    print(f"{'='*60}")
-    
     # Создаем batch updater
     batch = BatchUpdater(worksheet)
     
@@ -448,11 +534,12 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
     
     # ФИКСИРОВАННАЯ ОБРАБОТКА СУББОТЫ (строки 7-15)
     # Суббота ВСЕГДА обрабатывается если есть week_start_date
+    stage_start = time.perf_counter()
     if week_start_date:
         # ВАЖНО: week_start_date это ВОСКРЕСЕНЬЕ (из строки 20)
         # Для субботы нужно взять день раньше
         saturday_date = week_start_date - timedelta(days=1)
-        print(f"\n📅 Суббота (Вел длинная + бег брик) - {saturday_date.strftime('%d.%m.%y')}")
+        logger.debug(f"📅 Суббота (Вел длинная + бег брик) - {saturday_date.strftime('%d.%m.%y')}")
         
         # Получаем тренировки за субботу
         saturday_activities = get_activities_for_date(garmin_client, saturday_date)
@@ -462,8 +549,7 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
             cycling_activities = [a for a in saturday_activities if 'cycling' in a.get('activityType', {}).get('typeKey', '').lower()]
             running_activities = [a for a in saturday_activities if 'running' in a.get('activityType', {}).get('typeKey', '').lower()]
             
-            print(f"  🚴 Велосипед: {len(cycling_activities)} тренировок")
-            print(f"  🏃 Бег: {len(running_activities)} тренировок")
+            logger.debug(f"🚴 Велосипед: {len(cycling_activities)}, 🏃 Бег: {len(running_activities)}")
             
             # Обрабатываем велосипед (строки 7-11)
             if cycling_activities:
@@ -493,20 +579,15 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                 hr = format_values([safe_get(hr_list, i) for i in range(min(2, len(cycling_activities)))])
                 
                 if avg_power:
-                    batch.add_update(7, col_index + 1, avg_power)
-                    print(f"  ✓ Средние ваты: {avg_power} → {column}7")
+                    batch.add_update(7, col_index + 1, avg_power, label='Средние ваты')
                 if np_power:
-                    batch.add_update(8, col_index + 1, np_power)
-                    print(f"  ✓ Normalized Power: {np_power} → {column}8")
+                    batch.add_update(8, col_index + 1, np_power, label='Normalized Power')
                 if speed:
-                    batch.add_update(9, col_index + 1, speed)
-                    print(f"  ✓ Средняя скорость: {speed} → {column}9")
+                    batch.add_update(9, col_index + 1, speed, label='Средняя скорость')
                 if cadence:
-                    batch.add_update(10, col_index + 1, cadence)
-                    print(f"  ✓ Частота вращения: {cadence} → {column}10")
+                    batch.add_update(10, col_index + 1, cadence, label='Частота вращения')
                 if hr:
-                    batch.add_update(11, col_index + 1, hr)
-                    print(f"  ✓ Средняя ЧСС: {hr} → {column}11")
+                    batch.add_update(11, col_index + 1, hr, label='Средняя ЧСС')
             
             # Обрабатываем бег брик (строки 13-15)
             if running_activities:
@@ -514,24 +595,24 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                 distance = run.get('distance', 0)
                 if distance:
                     distance_km = round(distance / 1000, 2)
-                    batch.add_update(13, col_index + 1, str(distance_km))
-                    print(f"  ✓ Бег брик км: {distance_km} → {column}13")
+                    batch.add_update(13, col_index + 1, str(distance_km), label='Бег брик км')
                 
                 avg_speed = run.get('averageSpeed')
                 if avg_speed:
                     pace_str = format_pace(avg_speed)
                     if pace_str:
-                        batch.add_update(14, col_index + 1, pace_str)
-                        print(f"  ✓ Бег брик темп: {pace_str} → {column}14")
+                        batch.add_update(14, col_index + 1, pace_str, label='Бег брик темп')
                 
                 avg_hr = run.get('averageHR')
                 if avg_hr:
-                    batch.add_update(15, col_index + 1, str(int(avg_hr)))
-                    print(f"  ✓ Бег брик ЧСС: {int(avg_hr)} → {column}15")
+                    batch.add_update(15, col_index + 1, str(int(avg_hr)), label='Бег брик ЧСС')
         else:
-            print(f"  ℹ️  Нет тренировок за субботу {week_start_date.strftime('%d.%m.%y')}")
+            logger.debug(f"ℹ️  Нет тренировок за субботу {week_start_date.strftime('%d.%m.%y')}")
+    
+    metrics.observe('sync_stage', time.perf_counter() - stage_start, stage='saturday')
     
     # Используем переданные блоки тренировок или получаем их (для совместимости)
+    stage_start = time.perf_counter()
     blocks = training_blocks if training_blocks is not None else get_training_blocks(worksheet)
     
     # Для каждого блока ищем дату в нужном столбце
@@ -554,7 +635,7 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
         # СПЕЦИАЛЬНАЯ ЛОГИКА ДЛЯ СУББОТЫ: используем дату начала недели
         if not date_obj and 'сб' in name.lower() and week_start_date:
             date_obj = week_start_date
-            print(f"📅 {name} - {date_obj.strftime('%d.%m.%y')} (начало недели)")
+            logger.debug(f"📅 {name} - {date_obj.strftime('%d.%m.%y')} (начало недели)")
         
         # Если в строке блока нет даты, проверяем строку 1 (заголовки недель) - устаревшая логика
         elif not date_obj:
@@ -566,13 +647,13 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
         if not date_obj:
             continue
         
-        print(f"\n📅 {name} - {date_str}")
+        logger.debug(f"📅 {name} - {date_str}")
         
         # Получаем тренировки за эту дату
         activities = get_activities_for_date(garmin_client, date_obj)
         
         if not activities:
-            print(f"  ℹ️  Нет тренировок в Garmin за {date_str}")
+            logger.debug(f"ℹ️  Нет тренировок в Garmin за {date_str}")
             continue
         
         # Разделяем по типам
@@ -581,10 +662,10 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
         strength_activities = [a for a in activities if 'strength' in a.get('activityType', {}).get('typeKey', '').lower()]
         swimming_activities = [a for a in activities if 'swimming' in a.get('activityType', {}).get('typeKey', '').lower() or 'lap_swimming' in a.get('activityType', {}).get('typeKey', '').lower()]
         
-        print(f"  🚴 Велосипед: {len(cycling_activities)} тренировок")
-        print(f"  🏃 Бег: {len(running_activities)} тренировок")
-        print(f"  💪 Силовая: {len(strength_activities)} тренировок")
-        print(f"  🏊 Плавание: {len(swimming_activities)} тренировок")
+        logger.debug(
+            f"🚴 Велосипед: {len(cycling_activities)}, 🏃 Бег: {len(running_activities)}, "
+            f"💪 Силовая: {len(strength_activities)}, 🏊 Плавание: {len(swimming_activities)}"
+        )
         
         # Определяем куда записывать данные
         # Сначала проверяем комбинированные блоки (вел+бег, например суббота)
@@ -610,38 +691,32 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                 hr_str = format_values(cycle_data['avg_hr'])
                 tss_str = format_values(cycle_data['tss'])
                 
-                print(f"  📊 Данные вел: power={avg_power_str}, NP={np_str}, speed={speed_str}, cadence={cadence_str}, HR={hr_str}, TSS={tss_str}")
+                logger.debug(f"📊 Данные вел: power={avg_power_str}, NP={np_str}, speed={speed_str}, cadence={cadence_str}, HR={hr_str}, TSS={tss_str}")
                 
                 # Строка 7: Средние ваты
                 if avg_power_str:
-                    batch.add_update(7, col_index + 1, avg_power_str)
-                    print(f"  ✓ Средние ваты: {avg_power_str} → {chr(64+col_index+1)}7")
+                    batch.add_update(7, col_index + 1, avg_power_str, label='Средние ваты')
                 
                 # Строка 8: Normalized Power
                 if np_str:
-                    batch.add_update(8, col_index + 1, np_str)
-                    print(f"  ✓ Normalized Power: {np_str} → {chr(64+col_index+1)}8")
+                    batch.add_update(8, col_index + 1, np_str, label='Normalized Power')
                 
                 # Строка 9: Сред.скорость
                 if speed_str:
-                    batch.add_update(9, col_index + 1, speed_str)
-                    print(f"  ✓ Средняя скорость: {speed_str} → {chr(64+col_index+1)}9")
+                    batch.add_update(9, col_index + 1, speed_str, label='Средняя скорость')
                 
                 # Строка 10: Частота вращения
                 if cadence_str:
-                    batch.add_update(10, col_index + 1, cadence_str)
-                    print(f"  ✓ Частота вращения: {cadence_str} → {chr(64+col_index+1)}10")
+                    batch.add_update(10, col_index + 1, cadence_str, label='Частота вращения')
                 
                 # Строка 11: Средняя ЧСС
                 if hr_str:
-                    batch.add_update(11, col_index + 1, hr_str)
-                    print(f"  ✓ Средняя ЧСС: {hr_str} → {chr(64+col_index+1)}11")
+                    batch.add_update(11, col_index + 1, hr_str, label='Средняя ЧСС')
                 
                 # Строка 43: TSS (между субботними блоками и следующим блоком)
                 # ВАЖНО: это строка находится ниже субботнего блока
                 if tss_str:
-                    batch.add_update(43, col_index + 1, tss_str)
-                    print(f"  ✓ TSS: {tss_str} → {chr(64+col_index+1)}43")
+                    batch.add_update(43, col_index + 1, tss_str, label='TSS')
             
             # Потом записываем бег брик (строки 13-15)
             # ВАЖНО: Для брик бега берем ПОСЛЕДНЮЮ беговую тренировку дня (по времени)
@@ -655,19 +730,16 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                 # Строка 13: Бег брик км
                 if run_data.get('distance'):
                     distance_only = run_data['distance'].replace(' км', '')
-                    batch.add_update(13, col_index + 1, distance_only)
-                    print(f"  ✓ Бег брик км: {distance_only} → {chr(64+col_index+1)}13")
+                    batch.add_update(13, col_index + 1, distance_only, label='Бег брик км')
                 
                 # Строка 14: Бег брик темп
                 if run_data.get('pace'):
-                    batch.add_update(14, col_index + 1, run_data['pace'])
-                    print(f"  ✓ Бег брик темп: {run_data['pace']} → {chr(64+col_index+1)}14")
+                    batch.add_update(14, col_index + 1, run_data['pace'], label='Бег брик темп')
                 
                 # Строка 15: Бег брик ЧСС
                 if run_data.get('hr'):
                     hr_only = run_data['hr'].replace(' уд./мин', '')
-                    batch.add_update(15, col_index + 1, hr_only)
-                    print(f"  ✓ Бег брик ЧСС: {hr_only} → {chr(64+col_index+1)}15")
+                    batch.add_update(15, col_index + 1, hr_only, label='Бег брик ЧСС')
         
         elif 'БЕГ' in name.upper() or 'RUN' in name.upper():
             # Это блок бега
@@ -676,16 +748,15 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                 # Записываем данные
                 # Строка +1 = Время, +2 = Расстояние, +3 = Темп, +4 = ЧСС
                 if run_data.get('time'):
-                    batch.add_update(row_num + 1, col_index + 1, run_data['time'])
+                    batch.add_update(row_num + 1, col_index + 1, run_data['time'], label='Время бега')
                 if run_data.get('distance'):
                     distance_only = run_data['distance'].replace(' км', '')
-                    batch.add_update(row_num + 2, col_index + 1, distance_only)
+                    batch.add_update(row_num + 2, col_index + 1, distance_only, label='Расстояние бега')
                 if run_data.get('pace'):
-                    batch.add_update(row_num + 3, col_index + 1, run_data['pace'])
+                    batch.add_update(row_num + 3, col_index + 1, run_data['pace'], label='Темп бега')
                 if run_data.get('hr'):
                     hr_only = run_data['hr'].replace(' уд./мин', '')
-                    batch.add_update(row_num + 4, col_index + 1, hr_only)
-                print(f"  ✓ Записаны данные бега")
+                    batch.add_update(row_num + 4, col_index + 1, hr_only, label='ЧСС бега')
         
         elif 'ВЕЛ' in name.upper() or 'BIKE' in name.upper() or 'FTP' in name.upper() or ('ЧТ' in name.upper() and 'ДЛИН' in name.upper()):
             # Это блок велосипеда
@@ -712,7 +783,7 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                 hr_str = format_values(cycle_data['avg_hr'])
                 tss_str = format_values(cycle_data['tss'])
                 
-                print(f"  📊 Данные вел: power={avg_power_str}, NP={np_str}, speed={speed_str}, cadence={cadence_str}, HR={hr_str}, TSS={tss_str}")
+                logger.debug(f"📊 Данные вел: power={avg_power_str}, NP={np_str}, speed={speed_str}, cadence={cadence_str}, HR={hr_str}, TSS={tss_str}")
                 
                 # Ищем строки по тексту в колонке B (только в пределах блока)
                 # row_num - это уже 1-based индекс из enumerate
@@ -727,7 +798,7 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                         block_end = next_idx
                         break
                 
-                print(f"  🔍 Ищем с row {row_num} до {block_end}")
+                logger.debug(f"🔍 Ищем с row {row_num} до {block_end}")
                 
                 for search_idx in range(row_num - 1, min(block_end, len(col_b))):
                     cell_text = str(col_b[search_idx]).strip().lower() if search_idx < len(col_b) else ''
@@ -742,8 +813,7 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                             times = [t for t in times if t]
                             if times:
                                 time_str = '/'.join(times) if len(times) > 1 else times[0]
-                                batch.add_update(actual_row, col_index + 1, time_str)
-                                print(f"  ✓ Время: {time_str} → {chr(64+col_index+1)}{actual_row}")
+                                batch.add_update(actual_row, col_index + 1, time_str, label='Время')
                     
                     elif 'расстоян' in cell_text:
                         # Расстояние (агрегация)
@@ -755,59 +825,49 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                                     distances.append(str(round(dist / 1000, 2)))
                             if distances:
                                 dist_str = '/'.join(distances) if len(distances) > 1 else distances[0]
-                                batch.add_update(actual_row, col_index + 1, dist_str)
-                                print(f"  ✓ Расстояние: {dist_str} км → {chr(64+col_index+1)}{actual_row}")
+                                batch.add_update(actual_row, col_index + 1, dist_str, label='Расстояние')
                     
                     elif 'средн' in cell_text and 'темп' in cell_text:
                         # Средний темп для вело = скорость (уже агрегировано)
                         if speed_str:
-                            batch.add_update(actual_row, col_index + 1, speed_str)
-                            print(f"  ✓ Средний темп (скорость): {speed_str} км/ч → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, speed_str, label='Средний темп (скорость)')
                     
                     elif 'средн' in cell_text and 'ват' in cell_text:
                         if avg_power_str:
-                            batch.add_update(actual_row, col_index + 1, avg_power_str)
-                            print(f"  ✓ Средние ваты: {avg_power_str} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, avg_power_str, label='Средние ваты')
                     
                     elif 'normalized' in cell_text or ('power' in cell_text and 'norm' in cell_text):
                         if np_str:
-                            batch.add_update(actual_row, col_index + 1, np_str)
-                            print(f"  ✓ Normalized Power: {np_str} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, np_str, label='Normalized Power')
                     
                     elif 'tss' in cell_text or 'training stress' in cell_text:
                         # Строка 43: TSS
                         if tss_str:
-                            batch.add_update(actual_row, col_index + 1, tss_str)
-                            print(f"  ✓ TSS: {tss_str} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, tss_str, label='TSS')
                     
                     elif 'сред' in cell_text and 'скор' in cell_text:
                         if speed_str:
-                            batch.add_update(actual_row, col_index + 1, speed_str)
-                            print(f"  ✓ Средняя скорость: {speed_str} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, speed_str, label='Средняя скорость')
                     
                     elif 'частот' in cell_text and 'вращ' in cell_text:
                         if cadence_str:
-                            batch.add_update(actual_row, col_index + 1, cadence_str)
-                            print(f"  ✓ Частота вращения: {cadence_str} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, cadence_str, label='Частота вращения')
                     
                     # Строка 42: "Средняя ЧП" - пользователь хочет сюда HR (несмотря на название)
                     # Строка 48: "средний каденс" - сюда каденс
                     elif 'каденс' in cell_text:
                         # Строка 48: средний каденс
                         if cadence_str:
-                            batch.add_update(actual_row, col_index + 1, cadence_str)
-                            print(f"  ✓ Средний каденс: {cadence_str} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, cadence_str, label='Средний каденс')
                     
                     elif ('средн' in cell_text or 'срадн' in cell_text) and 'чп' in cell_text:
                         # Строка 42: Средняя ЧП - пишем HR (несмотря на название)
                         if hr_str:
-                            batch.add_update(actual_row, col_index + 1, hr_str)
-                            print(f"  ✓ Средняя ЧП (HR): {hr_str} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, hr_str, label='Средняя ЧП (HR)')
                 
                 # Если это FTP блок (строка 3) или четверг (строка 60), TSS записываем в строку 43
                 if (is_ftp_block or is_thursday_block) and tss_str:
-                    batch.add_update(43, col_index + 1, tss_str)
-                    print(f"  ✓ TSS: {tss_str} → {chr(64+col_index+1)}43")
+                    batch.add_update(43, col_index + 1, tss_str, label='TSS')
         
         elif ('СТАНОВ' in name.upper() or 'ПЛАВ' in name.upper()) and 'ПН' in name.upper():
             # Это понедельник - становая + плавание
@@ -860,21 +920,39 @@ def sync_to_sheet(garmin_client, worksheet, column, week_start_date=None, traini
                     
                     if 'длительност' in cell_text and 'перв' in cell_text:
                         if len(durations) >= 1:
-                            batch.add_update(actual_row, col_index + 1, durations[0])
-                            print(f"  ✓ Длительность первой тренировки: {durations[0]} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, durations[0], label='Длительность первой тренировки')
                     
                     elif 'длительност' in cell_text and 'втор' in cell_text:
                         if len(durations) >= 2:
-                            batch.add_update(actual_row, col_index + 1, durations[1])
-                            print(f"  ✓ Длительность второй тренировки: {durations[1]} → {chr(64+col_index+1)}{actual_row}")
+                            batch.add_update(actual_row, col_index + 1, durations[1], label='Длительность второй тренировки')
+    
+    metrics.observe('sync_stage', time.perf_counter() - stage_start, stage='blocks')
     
     # Подсчитываем недельные итоги (строки 18, 19, 29, 30, 31)
     # Параметр week_start_date на самом деле содержит sunday_date (из строки 20)
+    weekly_totals = None
     if week_activities and week_start_date:
-        calculate_weekly_totals(garmin_client, week_activities, week_start_date, batch, col_index)
+        with metrics.timer('sync_stage', stage='weekly_totals'):
+            weekly_totals = calculate_weekly_totals(garmin_client, week_activities, week_start_date, batch, col_index)
+    
+    # Одна сводная запись лога на неделю вместо строки на каждую ячейку
+    cells_written = len(batch.updates)
     
     # Отправляем все накопленные обновления одним batch запросом
-    batch.flush()
+    with metrics.timer('sync_stage', stage='flush'):
+        batch.flush()
+    
+    metrics.inc('sheet_cells_written', cells_written)
+    logger.info(
+        f"✓ Неделя {column} синхронизирована: {cells_written} ячеек",
+        extra={
+            'column': column,
+            'week_end': week_start_date.isoformat() if week_start_date else None,
+            'activities': len(week_activities or []),
+            'cells': cells_written,
+            **(weekly_totals or {}),
+        },
+    )
 
 def get_week_start(date_obj):
     """Получить субботу начала недели для данной даты"""
@@ -891,7 +969,7 @@ def parse_week_dates_from_block_rows(worksheet):
     try:
         row_20 = worksheet.row_values(20)
     except Exception as e:
-        print(f"✗ Ошибка при чтении строки 20: {e}")
+        logger.error(f"✗ Ошибка при чтении строки 20: {e}")
         return {}
     
     # Словарь для хранения воскресений по столбцам: {столбец: дата_воскресенья}
@@ -938,130 +1016,154 @@ def find_column_for_date(activity_date, sunday_columns):
     
     return None
 
-def export_all_data_to_source(garmin, sheet):
-    """Выгружает все доступные данные тренировок на лист 'исходник' для диагностики"""
+SOURCE_TAB = "исходник"
+SOURCE_ID_COLUMN = 4  # столбец D строки-заголовка тренировки хранит activityId
+
+def source_rows(activity, summary):
+    """Строки листа 'исходник' для одной тренировки: заголовок с ID и пары ключ/значение"""
+    activity_type = activity.get('activityType', {}).get('typeKey', 'unknown')
+    activity_name = activity.get('activityName', 'Без названия')
+    start_time = activity.get('startTimeLocal', '')
+    
+    # Заголовок тренировки; ID в столбце D нужен для инкрементальной выгрузки
+    rows = [[f"=== {activity_name} ===", start_time[:10] if start_time else '', activity_type,
+             str(activity.get('activityId', ''))]]
+    
+    # Основные метрики
+    data_to_export = {
+        'Длительность': format_time(activity.get('duration', 0)),
+        'Расстояние (км)': round(activity.get('distance', 0) / 1000, 2) if activity.get('distance') else None,
+        'Средняя скорость (км/ч)': round(activity.get('averageSpeed', 0) * 3.6, 1) if activity.get('averageSpeed') else None,
+        'Средняя ЧСС': summary.get('averageHR'),
+        'Калории': activity.get('calories'),
+    }
+    
+    # Данные велосипеда
+    if 'cycling' in activity_type.lower():
+        data_to_export.update({
+            'Средняя мощность (Вт)': summary.get('avgPower'),
+            'Normalized Power': summary.get('normPower') or summary.get('normalizedPower'),
+            'Средняя каденс': summary.get('avgBikeCadence') or summary.get('averageBikingCadenceInRevPerMinute'),
+        })
+    
+    # Данные бега
+    if 'running' in activity_type.lower():
+        data_to_export.update({
+            'Средний темп (мин/км)': format_pace(activity.get('averageSpeed')),
+            'Средняя каденс (шаги/мин)': summary.get('averageRunningCadenceInStepsPerMinute'),
+        })
+    
+    for key, value in data_to_export.items():
+        if value is not None and value != '':
+            if trace_cells_enabled():
+                logger.debug(f"  {key}: {value}")
+            rows.append([key, str(value)])
+    
+    return rows
+
+def export_all_data_to_source(garmin, sheet, rebuild=False):
+    """Выгружает данные тренировок на лист 'исходник' для диагностики
+    
+    По умолчанию инкрементально: по ID в столбце D определяются уже выгруженные
+    тренировки, детали запрашиваются только для новых, и они дописываются в конец
+    листа одним запросом append (сетка листа растет сама). rebuild=True очищает
+    лист и записывает все тренировки заново одним запросом.
+    """
     try:
         # Открываем лист исходник (или создаем если нет)
         try:
-            worksheet = sheet.worksheet("исходник")
-        except:
-            worksheet = sheet.add_worksheet("исходник", rows=100, cols=20)
+            worksheet = sheet.worksheet(SOURCE_TAB)
+        except Exception:
+            worksheet = sheet.add_worksheet(SOURCE_TAB, rows=100, cols=SOURCE_ID_COLUMN)
+            rebuild = True
         
-        print("\n" + "="*60)
-        print("Выгрузка всех данных на лист 'исходник'")
-        print("="*60)
-        
-        # Получаем тренировки за последнюю неделю
+        # Тренировки за период синхронизации, от старых к новым
         days = int(os.getenv('DAYS_TO_SYNC', '7'))
-        activities = garmin.get_activities(0, days * 2)
+        activities = list(reversed(garmin.get_activities(0, days * 2)))
         
-        # Очищаем лист
-        worksheet.clear()
+        exported_ids = set()
+        if not rebuild:
+            exported_ids = {value for value in worksheet.col_values(SOURCE_ID_COLUMN) if value}
+            if not exported_ids and worksheet.row_values(1):
+                # Лист в старом формате (без ID) - один раз пересобираем целиком
+                logger.info("Лист 'исходник' без ID тренировок, выполняется полная пересборка")
+                rebuild = True
         
-        # Собираем все данные для batch update
-        batch = BatchUpdater(worksheet)
-        row = 1
+        new_activities = [a for a in activities if str(a.get('activityId')) not in exported_ids]
         
-        for activity in activities:
-            activity_type = activity.get('activityType', {}).get('typeKey', 'unknown')
-            activity_name = activity.get('activityName', 'Без названия')
-            start_time = activity.get('startTimeLocal', '')
-            
-            # Записываем заголовок тренировки
-            batch.add_update(row, 1, f"=== {activity_name} ===")
-            batch.add_update(row, 2, start_time[:10] if start_time else '')
-            batch.add_update(row, 3, activity_type)
-            print(f"\n{activity_name} ({start_time[:10]}) - {activity_type}")
-            row += 1
-            
-            # Получаем детали тренировки
+        rows = []
+        for activity in new_activities:
             try:
-                activity_id = activity.get('activityId')
-                details = garmin.get_activity(activity_id)
-                summary = details.get('summaryDTO', {})
-                
-                # Основные метрики
-                data_to_export = {
-                    'Длительность': format_time(activity.get('duration', 0)),
-                    'Расстояние (км)': round(activity.get('distance', 0) / 1000, 2) if activity.get('distance') else None,
-                    'Средняя скорость (км/ч)': round(activity.get('averageSpeed', 0) * 3.6, 1) if activity.get('averageSpeed') else None,
-                    'Средняя ЧСС': summary.get('averageHR'),
-                    'Калории': activity.get('calories'),
-                }
-                
-                # Данные велосипеда
-                if 'cycling' in activity_type.lower():
-                    data_to_export.update({
-                        'Средняя мощность (Вт)': summary.get('avgPower'),
-                        'Normalized Power': summary.get('normPower') or summary.get('normalizedPower'),
-                        'Средняя каденс': summary.get('avgBikeCadence') or summary.get('averageBikingCadenceInRevPerMinute'),
-                    })
-                
-                # Данные бега
-                if 'running' in activity_type.lower():
-                    data_to_export.update({
-                        'Средний темп (мин/км)': format_pace(activity.get('averageSpeed')),
-                        'Средняя каденс (шаги/мин)': summary.get('averageRunningCadenceInStepsPerMinute'),
-                    })
-                
-                # Записываем все доступные данные
-                for key, value in data_to_export.items():
-                    if value is not None and value != '':
-                        batch.add_update(row, 1, key)
-                        batch.add_update(row, 2, str(value))
-                        print(f"  {key}: {value}")
-                        row += 1
-                
+                details = garmin.get_activity(activity.get('activityId'))
+                rows.extend(source_rows(activity, details.get('summaryDTO', {})))
             except Exception as e:
-                batch.add_update(row, 1, f"Ошибка: {str(e)}")
-                row += 1
-            
-            # Пустая строка между тренировками
-            row += 1
+                rows.extend(source_rows(activity, {}))
+                rows.append([f"Ошибка: {str(e)}"])
         
-        # Отправляем все обновления одним запросом
-        batch.flush()
+        if rebuild:
+            worksheet.clear()
+            worksheet.resize(rows=max(len(rows), 1), cols=SOURCE_ID_COLUMN)
+            if rows:
+                worksheet.update(rows, 'A1', value_input_option='USER_ENTERED')
+        elif rows:
+            # INSERT_ROWS: Sheets добавляет строки в сетку, лимит rows не мешает
+            worksheet.append_rows(rows, value_input_option='USER_ENTERED',
+                                  insert_data_option='INSERT_ROWS', table_range='A1')
         
-        print(f"\n✓ Выгружено {len(activities)} тренировок на лист 'исходник'")
-        print("="*60)
+        logger.info(
+            f"✓ Выгружено {len(new_activities)} тренировок на лист '{SOURCE_TAB}'"
+            f"{' (полная пересборка)' if rebuild else ''}",
+            extra={'activities': len(new_activities), 'rows': len(rows), 'rebuild': rebuild},
+        )
         
     except Exception as e:
-        print(f"✗ Ошибка при выгрузке: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"✗ Ошибка при выгрузке: {e}")
 
-def main():
+def main(source=None, source_export=None):
     try:
-        print("=== Garmin to Google Sheets Sync ===\n")
+        logger.info("=== Garmin to Google Sheets Sync ===")
+        
+        # Локальная база (кеш daily_wellness для HRV, источник для SHEET_SOURCE=local)
+        init_db()
         
-        # Подключение к Garmin
-        garmin = connect_to_garmin()
+        # Очередь записей общая для процесса: остатки прошлого (упавшего) запуска не отправляем
+        dropped = quota.WRITES.clear()
+        if dropped:
+            logger.warning(f"⚠️ Отброшено {dropped} ячеек из очереди прошлого запуска", extra={'dropped': dropped})
+        
+        # Подключение к Garmin (или локальной базе)
+        garmin = connect_activity_source(source)
         
         # Подключение к Google Sheets
         sheet = connect_to_google_sheets()
         
-        # ДИАГНОСТИКА: выгружаем все данные на лист "исходник" (раскомментируйте при необходимости)
-        # export_all_data_to_source(garmin, sheet)
+        # ДИАГНОСТИКА: выгрузка данных на лист "исходник"
+        # SOURCE_EXPORT=incremental - дописывать только новые тренировки, rebuild - пересобрать лист
+        source_export = (source_export or os.getenv('SOURCE_EXPORT', 'off')).lower()
+        if source_export in ('incremental', 'rebuild'):
+            with metrics.timer('sync_stage', stage='source_export'):
+                export_all_data_to_source(garmin, sheet, rebuild=source_export == 'rebuild')
         
         worksheet = sheet.worksheet("ВЕЛ БЕГ")
-        print(f"\n✓ Opened worksheet: {worksheet.title}")
+        logger.info(f"✓ Opened worksheet: {worksheet.title}")
         
         # Парсим даты недель из строк блоков (20, 33, 38, 73)
-        week_columns = parse_week_dates_from_block_rows(worksheet)
-        print(f"✓ Найдено {len(week_columns)} недель в таблице")
+        with metrics.timer('sync_stage', stage='week_dates'):
+            week_columns = parse_week_dates_from_block_rows(worksheet)
+        logger.info(f"✓ Найдено {len(week_columns)} недель в таблице")
         
         # Диагностика: показываем все найденные недели
-        print("\n📅 Найденные недели:")
-        for col, date in sorted(week_columns.items()):
-            print(f"  Столбец {col}: {date.strftime('%d.%m.%Y')}")
+        if logger.isEnabledFor(logging.DEBUG):
+            for col, date in sorted(week_columns.items()):
+                logger.debug(f"📅 Столбец {col}: {date.strftime('%d.%m.%Y')}")
         
         # Получаем тренировки за последние N дней
         days_to_sync = int(os.getenv('DAYS_TO_SYNC', '14'))  # По умолчанию 30 дней
         activities = garmin.get_activities(0, days_to_sync * 2)  # С запасом
         
         # Группируем тренировки по неделям
-        print("\n📊 Тренировки из Garmin:")
         activities_by_week = {}
+        unmatched_dates = set()
         for activity in activities:
             # Проверяем что activity это dict
             if not isinstance(activity, dict):
@@ -1071,7 +1173,7 @@ def main():
             if start_time:
                 activity_date = datetime.strptime(start_time[:10], '%Y-%m-%d').date()
                 activity_name = activity.get('activityName', 'Без названия')
-                print(f"  {activity_date.strftime('%d.%m.%Y')} - {activity_name}")
+                logger.debug(f"📊 {activity_date.strftime('%d.%m.%Y')} - {activity_name}")
                 
                 column = find_column_for_date(activity_date, week_columns)
                 
@@ -1080,12 +1182,23 @@ def main():
                         activities_by_week[column] = []
                     activities_by_week[column].append(activity)
                 else:
-                    print(f"    ⚠️ Не найден столбец для даты {activity_date.strftime('%d.%m.%Y')}")
+                    unmatched_dates.add(activity_date)
+        
+        logger.info(
+            f"📊 Тренировки из Garmin: {len(activities)}, недель с тренировками: {len(activities_by_week)}",
+            extra={'activities': len(activities), 'weeks': len(activities_by_week)},
+        )
+        if unmatched_dates:
+            logger.warning(
+                f"⚠️ Не найден столбец для {len(unmatched_dates)} дат "
+                f"({min(unmatched_dates).strftime('%d.%m.%Y')} - {max(unmatched_dates).strftime('%d.%m.%Y')})"
+            )
         
         # Синхронизируем ВСЕ недели с тренировками
         if activities_by_week:
             # Получаем блоки тренировок ОДИН РАЗ для оптимизации API
-            training_blocks = get_training_blocks(worksheet)
+            with metrics.timer('sync_stage', stage='training_blocks'):
+                training_blocks = get_training_blocks(worksheet)
             
             # Сортируем недели по дате
             sorted_columns = sorted(activities_by_week.keys(), key=lambda col: week_columns.get(col, datetime.min.date()))
@@ -1094,28 +1207,32 @@ def main():
                 week_activities = activities_by_week[column]
                 week_date = week_columns.get(column)
                 
-                print(f"\n{'='*60}")
-                if week_date:
-                    print(f"Синхронизация недели {column} (начало: {week_date.strftime('%d.%m.%Y')})")
-                else:
-                    print(f"Синхронизация недели {column}")
-                print(f"Найдено тренировок: {len(week_activities)}")
-                print(f"{'='*60}")
-                
                 # Передаем дату начала недели, блоки и активности для оптимизации API
                 sync_to_sheet(garmin, worksheet, column, week_start_date=week_date, training_blocks=training_blocks, week_activities=week_activities)
         else:
-            print("\nℹ️  Нет тренировок для синхронизации")
+            logger.info("ℹ️  Нет тренировок для синхронизации")
+        
+        # Отложенные из-за квоты записи уходят одним batch запросом на лист
+        if len(quota.WRITES):
+            with metrics.timer('sync_stage', stage='drain_writes'):
+                quota.WRITES.drain()
         
-        print(f"\n{'='*60}")
-        print("✅ Синхронизация завершена!")
-        print(f"{'='*60}\n")
+        # Сводка по времени этапов и внешним вызовам
+        logger.info("✅ Синхронизация завершена!", extra={'timers': metrics.REGISTRY.summary()['timers']})
         
     except Exception as e:
-        print(f"\n✗ Error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"✗ Error: {e}")
         raise
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Синхронизация тренировок в Google таблицу "ВЕЛ БЕГ"')
+    parser.add_argument('--source', choices=['garmin', 'local'],
+                        help='откуда брать тренировки (по умолчанию SHEET_SOURCE или garmin)')
+    parser.add_argument('--source-export', choices=['off', 'incremental', 'rebuild'],
+                        help='выгрузка на лист "исходник" (по умолчанию SOURCE_EXPORT или off)')
+    args = parser.parse_args()
+    
+    configure_logging()
+    main(args.source, args.source_export)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Periodic SQLite upkeep: sync log retention, indexes, vacuum, statistics.
+
+`run_maintenance()` does, in order:
+
+- sync_logs older than SYNC_LOG_DETAIL_DAYS are collapsed to one row per
+  day (run count, error count and synced activities summed, per-run metrics
+  dropped); rows older than SYNC_LOG_RETENTION_DAYS are deleted
+- re-checks the secondary indexes in db.INDEXES and merges the FTS index
+- returns free pages to the OS with `PRAGMA incremental_vacuum` (databases
+  created before auto_vacuum=INCREMENTAL are converted once with VACUUM)
+- refreshes planner statistics (`ANALYZE` the first time, then `PRAGMA optimize`)
+
+and stores a size/fragmentation report in sync_state. Successful syncs call
+`run_if_due()`, so this happens at most every MAINTENANCE_INTERVAL_HOURS:
+
+    python maintenance.py run       # now
+    python maintenance.py report    # size and fragmentation only
+"""
+import os
+import json
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+import db
+import metrics
+from db import get_db, INDEXES
+
+logger = logging.getLogger(__name__)
+
+DETAIL_DAYS = int(os.getenv('SYNC_LOG_DETAIL_DAYS', '30'))
+RETENTION_DAYS = int(os.getenv('SYNC_LOG_RETENTION_DAYS', '365'))
+INTERVAL_HOURS = float(os.getenv('MAINTENANCE_INTERVAL_HOURS', '24'))
+
+STATE_KEY = 'maintenance'
+
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+
+
+def _utc_cutoff(days):
+    # sync_date is CURRENT_TIMESTAMP: UTC, 'YYYY-MM-DD HH:MM:SS'
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def prune_sync_logs(conn, detail_days=DETAIL_DAYS, retention_days=RETENTION_DAYS):
+    """Apply retention and per-day downsampling to sync_logs (caller commits)"""
+    deleted = conn.execute(
+        'DELETE FROM sync_logs WHERE sync_date < ?', (_utc_cutoff(retention_days),)
+    ).rowcount
+    cutoff = _utc_cutoff(detail_days)
+
+    # Days before the detail window that still have several rows or full details;
+    # already collapsed rows carry their counts in details, so repeated runs add up
+    days = conn.execute('''
+        SELECT date(sync_date) AS day, MAX(id), COUNT(*),
+               SUM(COALESCE(json_extract(details, '$.runs'), 1)),
+               SUM(COALESCE(json_extract(details, '$.errors'), status = 'error')),
+               SUM(COALESCE(activities_synced, 0))
+        FROM sync_logs
+        WHERE sync_date < ?
+        GROUP BY day
+        HAVING COUNT(*) > 1 OR MAX(details IS NOT NULL AND json_extract(details, '$.runs') IS NULL)
+    ''', (cutoff,)).fetchall()
+
+    collapsed = 0
+    for day, keep_id, count, runs, errors, activities in days:
+        conn.execute('''
+            UPDATE sync_logs SET activities_synced = ?, details = ?
+            WHERE id = ?
+        ''', (activities, json.dumps({'runs': runs, 'errors': errors}), keep_id))
+        next_day = (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        # Only the rows counted above: on the cutoff day, later rows stay in full
+        collapsed += conn.execute('''
+            DELETE FROM sync_logs
+            WHERE sync_date >= ? AND sync_date < ? AND sync_date < ? AND id != ?
+        ''', (day, next_day, cutoff, keep_id)).rowcount
+    return {'deleted': deleted, 'collapsed': collapsed, 'days': len(days)}
+
+
+def ensure_indexes(conn):
+    for statement in INDEXES:
+        conn.execute(statement)
+    # Merge the FTS segments left behind by incremental updates
+    conn.execute("INSERT INTO activities_fts (activities_fts) VALUES ('optimize')")
+    conn.commit()
+
+
+def vacuum(conn):
+    """Release free pages; convert the database to incremental auto_vacuum once"""
+    free_before = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        # The mode of an existing database only changes with a full rebuild
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return {'converted': True, 'freed_pages': free_before}
+    # Each returned row is a step; the pragma only completes when drained
+    conn.execute('PRAGMA incremental_vacuum').fetchall()
+    return {'converted': False, 'freed_pages': free_before - conn.execute('PRAGMA freelist_count').fetchone()[0]}
+
+
+def optimize(conn):
+    """Planner statistics: full ANALYZE on a database that has none, else PRAGMA optimize"""
+    has_stats = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone()
+    conn.execute('PRAGMA optimize' if has_stats else 'ANALYZE')
+    conn.commit()
+    return 'optimize' if has_stats else 'analyze'
+
+
+def report(conn=None):
+    """Database size, free-page fragmentation and per-table/index space"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+        pages = conn.execute('PRAGMA page_count').fetchone()[0]
+        free_pages = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        result = {
+            'file_bytes': os.path.getsize(db.DB_PATH) if os.path.exists(db.DB_PATH) else 0,
+            'page_size': page_size,
+            'pages': pages,
+            'free_pages': free_pages,
+            'free_ratio': round(free_pages / pages, 4) if pages else 0.0,
+            'auto_vacuum': AUTO_VACUUM_MODES.get(conn.execute('PRAGMA auto_vacuum').fetchone()[0]),
+            'sync_logs': conn.execute('SELECT COUNT(*) FROM sync_logs').fetchone()[0],
+        }
+        try:
+            # Space per table/index and how much of it is unused inside pages
+            rows = conn.execute('''
+                SELECT name, SUM(pgsize), SUM(unused) FROM dbstat GROUP BY name ORDER BY SUM(pgsize) DESC
+            ''').fetchall()
+            result['objects'] = {
+                name: {'bytes': size, 'unused_ratio': round(unused / size, 4) if size else 0.0}
+                for name, size, unused in rows
+            }
+        except Exception:
+            # SQLite built without the dbstat virtual table
+            result['objects'] = None
+        return result
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def last_run(conn=None):
+    """Result of the previous run_maintenance(), or None"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (STATE_KEY,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def run_maintenance():
+    """Run every maintenance step and record the result"""
+    started = time.perf_counter()
+    conn = get_db()
+    try:
+        with metrics.timer('maintenance_stage', stage='sync_logs'):
+            pruned = prune_sync_logs(conn)
+            conn.commit()
+        with metrics.timer('maintenance_stage', stage='indexes'):
+            ensure_indexes(conn)
+        with metrics.timer('maintenance_stage', stage='vacuum'):
+            vacuumed = vacuum(conn)
+        with metrics.timer('maintenance_stage', stage='optimize'):
+            statistics = optimize(conn)
+
+        result = {
+            'ran_at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - started, 3),
+            'sync_logs': pruned,
+            'vacuum': vacuumed,
+            'statistics': statistics,
+            'report': report(conn),
+        }
+        conn.execute('''
+            INSERT INTO sync_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+        ''', (STATE_KEY, json.dumps(result)))
+        conn.commit()
+    finally:
+        conn.close()
+
+    logger.info("Database maintenance complete", extra={
+        'sync_logs': pruned, 'vacuum': vacuumed, 'statistics': statistics,
+        'file_bytes': result['report']['file_bytes'], 'free_ratio': result['report']['free_ratio'],
+    })
+    return result
+
+
+def run_if_due():
+    """run_maintenance() if the last run is older than MAINTENANCE_INTERVAL_HOURS; never raises"""
+    try:
+        previous = last_run()
+        if previous:
+            elapsed = datetime.now() - datetime.fromisoformat(previous['ran_at'])
+            if elapsed < timedelta(hours=INTERVAL_HOURS):
+                return None
+        return run_maintenance()
+    except Exception as e:
+        logger.error(f"Database maintenance failed: {e}")
+        return None
+
+
+if __name__ == '__main__':
+    import argparse
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='SQLite maintenance')
+    parser.add_argument('command', choices=['run', 'report'])
+    args = parser.parse_args()
+
+    configure_logging()
+    db.init_db()
+    print(json.dumps(run_maintenance() if args.command == 'run' else report(), indent=2))
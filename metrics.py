@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Lightweight in-process instrumentation: counters and timers for external
+calls (Garmin, Google Sheets), SQLite queries and sync stages.
+
+Everything is recorded into a process-wide registry, rendered in Prometheus
+text format by `/metrics`. A `collect()` block additionally captures what
+its own thread recorded, so each sync run can store a per-run summary.
+Under gunicorn each worker keeps its own registry.
+"""
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+PREFIX = 'sub5'
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_str(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+class Registry:
+    """Thread-safe store of counters and timer summaries (count, sum, max)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.timers = {}
+
+    def inc(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            count, total, peak = self.timers.get(key, (0, 0.0, 0.0))
+            self.timers[key] = (count + 1, total + seconds, max(peak, seconds))
+
+    def summary(self):
+        """Plain dict view, keyed by 'name{label=value,...}'"""
+        with self._lock:
+            counters = dict(self.counters)
+            timers = dict(self.timers)
+
+        def flat(key):
+            name, labels = key
+            return name + ('{' + ','.join(f'{k}={v}' for k, v in labels) + '}' if labels else '')
+
+        return {
+            'counters': {flat(k): v for k, v in sorted(counters.items())},
+            'timers': {
+                flat(k): {'count': c, 'total_s': round(t, 4), 'max_s': round(m, 4)}
+                for k, (c, t, m) in sorted(timers.items())
+            },
+        }
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (counters and summaries)"""
+        with self._lock:
+            counters = dict(self.counters)
+            timers = dict(self.timers)
+
+        lines = []
+        for name in sorted({k[0] for k in counters}):
+            metric = f'{PREFIX}_{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f'{metric}{_label_str(labels)} {value}')
+        for name in sorted({k[0] for k in timers}):
+            metric = f'{PREFIX}_{name}_seconds'
+            lines.append(f'# TYPE {metric} summary')
+            for (n, labels), (count, total, peak) in sorted(timers.items()):
+                if n == name:
+                    lines.append(f'{metric}_count{_label_str(labels)} {count}')
+                    lines.append(f'{metric}_sum{_label_str(labels)} {total:.6f}')
+                    lines.append(f'{metric}_max{_label_str(labels)} {peak:.6f}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+_local = threading.local()
+
+
+def _active_collectors():
+    return getattr(_local, 'collectors', ())
+
+
+def inc(name, value=1, **labels):
+    REGISTRY.inc(name, value, **labels)
+    for collector in _active_collectors():
+        collector.inc(name, value, **labels)
+
+
+def observe(name, seconds, **labels):
+    REGISTRY.observe(name, seconds, **labels)
+    for collector in _active_collectors():
+        collector.observe(name, seconds, **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """Time the block; failures are also counted in `<name>_errors`"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        inc(f'{name}_errors', **labels)
+        raise
+    finally:
+        observe(name, time.perf_counter() - start, **labels)
+
+
+@contextmanager
+def collect():
+    """Capture metrics recorded by this thread inside the block into a fresh Registry"""
+    collector = Registry()
+    _local.collectors = _active_collectors() + (collector,)
+    try:
+        yield collector
+    finally:
+        _local.collectors = tuple(c for c in _active_collectors() if c is not collector)
+
+
+class InstrumentedClient:
+    """Proxy that times the listed methods of an API client as `external_call`
+
+    `children` maps a method name to the method set used to wrap the object it
+    returns (e.g. a spreadsheet's `worksheet()` returning a worksheet).
+    """
+
+    def __init__(self, client, service, methods, children=None):
+        self._client = client
+        self._service = service
+        self._methods = set(methods)
+        self._children = children or {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in self._methods or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with timer('external_call', service=self._service, method=name):
+                result = attr(*args, **kwargs)
+            if name in self._children and result is not None:
+                return InstrumentedClient(result, self._service, self._children[name])
+            return result
+
+        return call
+
+
+GARMIN_METHODS = (
+    'login', 'get_user_summary', 'get_activities', 'get_activities_by_date',
+    'get_activity', 'get_activity_details', 'get_hrv_data', 'get_sleep_data',
+)
+SHEETS_WORKSHEET_METHODS = (
+    'row_values', 'col_values', 'get_all_values', 'batch_get',
+    'batch_update', 'update', 'append_rows', 'clear', 'add_rows', 'resize',
+)
+SHEETS_SPREADSHEET_METHODS = ('worksheet', 'add_worksheet', 'values_append', 'values_batch_get')
+
+
+def instrument_garmin(client):
+    return InstrumentedClient(client, 'garmin', GARMIN_METHODS)
+
+
+def instrument_sheet(sheet):
+    return InstrumentedClient(
+        sheet, 'sheets', SHEETS_SPREADSHEET_METHODS,
+        children={'worksheet': SHEETS_WORKSHEET_METHODS, 'add_worksheet': SHEETS_WORKSHEET_METHODS},
+    )
+
+
+def _statement_kind(sql):
+    parts = sql.lstrip().split(None, 1)
+    return parts[0].lower() if parts else 'unknown'
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that times execute/executemany as `sqlite_query{op=...}`"""
+
+    def execute(self, sql, parameters=()):
+        with timer('sqlite_query', op=_statement_kind(sql)):
+            return super().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        with timer('sqlite_query', op=_statement_kind(sql)):
+            return super().executemany(sql, seq_of_parameters)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection factory for sqlite3.connect() whose cursors are instrumented"""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
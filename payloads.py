@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Raw Garmin payloads, stored apart from the hot `activities` table.
+
+Each activity's merged Garmin dict is kept zlib-compressed in
+`activity_payloads` with the SHA-256 of its canonical JSON, so re-syncing an
+unchanged activity does not rewrite the row. `activities` keeps only the
+scalar columns the dashboard queries; the API loads payloads lazily when a
+client asks for them (`include_raw=1`).
+"""
+import json
+import zlib
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENCODING = 'zlib'
+LEVEL = 6
+
+
+def encode(payload):
+    """Canonical JSON bytes -> (compressed blob, sha256 hex, raw size)"""
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return zlib.compress(raw, LEVEL), hashlib.sha256(raw).hexdigest(), len(raw)
+
+
+def decode(blob, encoding=ENCODING):
+    if encoding != ENCODING:
+        raise ValueError(f"Unsupported payload encoding: {encoding}")
+    return json.loads(zlib.decompress(blob))
+
+
+def save_payloads(conn, items, replace=True):
+    """Store (activity_id, payload) pairs (caller commits)
+
+    With `replace` an existing payload is overwritten only if its hash changed;
+    without it existing payloads are kept (e.g. list pages must not replace
+    the richer detail-merged payload).
+    """
+    rows = []
+    for activity_id, payload in items:
+        blob, digest, size = encode(payload)
+        rows.append((str(activity_id), digest, ENCODING, size, blob))
+    if not rows:
+        return
+    if replace:
+        conn.executemany('''
+            INSERT INTO activity_payloads (activity_id, sha256, encoding, size, payload, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(activity_id) DO UPDATE SET
+                sha256 = excluded.sha256,
+                encoding = excluded.encoding,
+                size = excluded.size,
+                payload = excluded.payload,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE activity_payloads.sha256 != excluded.sha256
+        ''', rows)
+    else:
+        conn.executemany('''
+            INSERT OR IGNORE INTO activity_payloads (activity_id, sha256, encoding, size, payload, updated_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', rows)
+
+
+def save_payload(conn, activity_id, payload):
+    save_payloads(conn, [(activity_id, payload)])
+
+
+def load_payloads(conn, activity_ids):
+    """Decoded payloads for the given activity IDs, keyed by ID (missing IDs omitted)"""
+    ids = [str(i) for i in activity_ids]
+    result = {}
+    # Stay under SQLite's host parameter limit
+    for offset in range(0, len(ids), 500):
+        chunk = ids[offset:offset + 500]
+        cursor = conn.execute(
+            f'SELECT activity_id, encoding, payload FROM activity_payloads '
+            f'WHERE activity_id IN ({",".join("?" * len(chunk))})', chunk
+        )
+        for activity_id, encoding, blob in cursor.fetchall():
+            result[activity_id] = decode(blob, encoding)
+    return result
+
+
+def migrate_inline_payloads(conn, batch_size=1000):
+    """Move JSON left in activities.data into activity_payloads; return the number moved
+
+    Runs once per database (flag in sync_state). The freed pages are reused by
+    new rows; the file itself shrinks only after VACUUM.
+    """
+    if conn.execute("SELECT 1 FROM sync_state WHERE key = 'payloads_migrated'").fetchone():
+        return 0
+    moved = 0
+    while True:
+        rows = conn.execute(
+            'SELECT id, data FROM activities WHERE data IS NOT NULL LIMIT ?', (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        save_payloads(conn, [(activity_id, json.loads(data)) for activity_id, data in rows], replace=False)
+        conn.executemany('UPDATE activities SET data = NULL WHERE id = ?', [(row[0],) for row in rows])
+        conn.commit()
+        moved += len(rows)
+    conn.execute('''
+        INSERT OR REPLACE INTO sync_state (key, value, updated_at)
+        VALUES ('payloads_migrated', ?, CURRENT_TIMESTAMP)
+    ''', (json.dumps({'moved': moved}),))
+    conn.commit()
+    if moved:
+        logger.info(f"Moved {moved} inline payloads to activity_payloads")
+    return moved
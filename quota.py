@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Shared Google Sheets API quota: token buckets in SQLite, retries on 429.
+
+Sheets limits read and write requests per minute per project, and the CLI,
+the dashboard's post-sync sheet refresh and every gunicorn worker spend the
+same quota. Each call therefore takes a token from a bucket row in
+`api_quota` (one for reads, one for writes) inside an IMMEDIATE transaction,
+so all processes on the host share one budget:
+
+    sheet = quota.guard_sheet(metrics.instrument_sheet(sheet))
+
+A 429 pauses the whole bucket for an exponentially growing backoff (or the
+server's Retry-After) shared by all processes; successful calls shrink it
+again. Cell writes from BatchUpdater go through `WRITES`, which coalesces
+them per worksheet (last value per range wins) and, while the write bucket is
+throttled, keeps them queued until a later flush or the final `drain()`.
+Each sheet sync starts with `clear()`, so cells left over from a failed
+earlier run in the same process are never replayed.
+"""
+import os
+import time
+import random
+import logging
+
+import metrics
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = int(os.getenv('SHEETS_MAX_RETRIES', '6'))
+BASE_BACKOFF = 1.0
+MAX_BACKOFF = 64.0
+
+# Reads are safe to repeat after any transient error; writes only after 429
+# (the request was rejected before doing anything)
+READ_RETRY_STATUSES = {429, 500, 502, 503}
+WRITE_RETRY_STATUSES = {429}
+
+
+def _status(error):
+    """HTTP status of a gspread APIError (None for other exceptions)"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None) or getattr(error, 'code', None)
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Cross-process token bucket stored in the api_quota table"""
+
+    def __init__(self, name, per_minute, burst, retry_statuses):
+        self.name = name
+        self.rate = per_minute / 60.0
+        self.burst = burst
+        self.retry_statuses = retry_statuses
+        self._backoff = 0.0  # last backoff seen by this process, to skip needless relax() writes
+
+    def _state(self, conn, now):
+        """Bucket state as of `now`, refilled for the time since the last update"""
+        row = conn.execute(
+            'SELECT tokens, refilled_at, backoff_seconds, blocked_until FROM api_quota WHERE bucket = ?',
+            (self.name,)
+        ).fetchone()
+        if row:
+            tokens, refilled_at, backoff, blocked_until = row
+            tokens = min(self.burst, tokens + max(0.0, now - refilled_at) * self.rate)
+        else:
+            tokens, backoff, blocked_until = float(self.burst), 0.0, 0.0
+        return {'tokens': tokens, 'backoff': backoff, 'blocked_until': blocked_until}
+
+    def _transaction(self, update):
+        """Run update(state, now) -> result on the locked bucket row"""
+        conn = get_db()
+        try:
+            conn.isolation_level = None
+            conn.execute('BEGIN IMMEDIATE')
+            now = time.time()
+            state = self._state(conn, now)
+            result = update(state, now)
+            conn.execute('''
+                INSERT INTO api_quota (bucket, tokens, refilled_at, backoff_seconds, blocked_until)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(bucket) DO UPDATE SET
+                    tokens = excluded.tokens,
+                    refilled_at = excluded.refilled_at,
+                    backoff_seconds = excluded.backoff_seconds,
+                    blocked_until = excluded.blocked_until
+            ''', (self.name, state['tokens'], now, state['backoff'], state['blocked_until']))
+            conn.execute('COMMIT')
+            self._backoff = state['backoff']
+            return result
+        finally:
+            conn.close()
+
+    def acquire(self):
+        """Take one token, sleeping while the bucket is empty or backing off"""
+        def take(state, now):
+            if now < state['blocked_until']:
+                return state['blocked_until'] - now
+            if state['tokens'] >= 1:
+                state['tokens'] -= 1
+                return 0.0
+            return (1 - state['tokens']) / self.rate
+
+        waited = 0.0
+        while True:
+            wait = self._transaction(take)
+            if not wait:
+                break
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            metrics.observe('quota_wait', waited, bucket=self.name)
+
+    def available(self):
+        """True if a call could go out right now (does not take a token)"""
+        # Plain read: a peek must not queue for the write lock behind real callers
+        conn = get_db()
+        try:
+            now = time.time()
+            state = self._state(conn, now)
+        finally:
+            conn.close()
+        return now >= state['blocked_until'] and state['tokens'] >= 1
+
+    def penalize(self, retry_after=None):
+        """Back off the whole bucket after a 429; return the pause in seconds"""
+        def back_off(state, now):
+            backoff = min(MAX_BACKOFF, max(BASE_BACKOFF, state['backoff'] * 2))
+            state['backoff'] = backoff
+            delay = max(backoff * random.uniform(1.0, 1.25), retry_after or 0)
+            state['blocked_until'] = max(state['blocked_until'], now + delay)
+            state['tokens'] = 0.0
+            return delay
+        return self._transaction(back_off)
+
+    def relax(self):
+        """Halve the backoff after a successful call"""
+        if not self._backoff:
+            return
+        def shrink(state, now):
+            state['backoff'] = state['backoff'] / 2 if state['backoff'] > BASE_BACKOFF else 0.0
+        self._transaction(shrink)
+
+    def call(self, func, *args, **kwargs):
+        """Call func under this bucket, retrying throttled/transient errors with backoff"""
+        for attempt in range(MAX_RETRIES + 1):
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                status = _status(e)
+                if status not in self.retry_statuses or attempt == MAX_RETRIES:
+                    raise
+                delay = self.penalize(_retry_after(e)) if status == 429 else BASE_BACKOFF * 2 ** attempt
+                metrics.inc('quota_retries', bucket=self.name, status=status)
+                logger.warning(f"Sheets API {status}, retry {attempt + 1}/{MAX_RETRIES} in {delay:.1f}s", extra={
+                    'bucket': self.name, 'status': status, 'delay': round(delay, 1),
+                })
+                if status != 429:
+                    time.sleep(delay)
+                continue
+            self.relax()
+            return result
+
+
+# Sheets counts requests per minute, so a full minute's budget may go out at
+# once; only sustained load beyond it is spread out
+READS_PER_MINUTE = int(os.getenv('SHEETS_READS_PER_MINUTE', '60'))
+WRITES_PER_MINUTE = int(os.getenv('SHEETS_WRITES_PER_MINUTE', '60'))
+READ_BUCKET = TokenBucket('sheets_read', READS_PER_MINUTE, READS_PER_MINUTE, READ_RETRY_STATUSES)
+WRITE_BUCKET = TokenBucket('sheets_write', WRITES_PER_MINUTE, WRITES_PER_MINUTE, WRITE_RETRY_STATUSES)
+
+WORKSHEET_BUCKETS = {
+    'row_values': READ_BUCKET, 'col_values': READ_BUCKET, 'get_all_values': READ_BUCKET, 'batch_get': READ_BUCKET,
+    'batch_update': WRITE_BUCKET, 'update': WRITE_BUCKET, 'append_rows': WRITE_BUCKET,
+    'clear': WRITE_BUCKET, 'add_rows': WRITE_BUCKET, 'resize': WRITE_BUCKET,
+}
+SPREADSHEET_BUCKETS = {
+    'worksheet': READ_BUCKET, 'values_batch_get': READ_BUCKET,
+    'add_worksheet': WRITE_BUCKET, 'values_append': WRITE_BUCKET,
+}
+
+
+class QuotaClient:
+    """Proxy that sends the listed methods of a gspread object through their bucket
+
+    `children` maps a method name to the bucket map used to wrap the object it
+    returns (a spreadsheet's `worksheet()` returning a worksheet).
+    """
+
+    def __init__(self, client, buckets, children=None):
+        self._client = client
+        self._buckets = buckets
+        self._children = children or {}
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in self._buckets or not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = self._buckets[name].call(attr, *args, **kwargs)
+            if name in self._children and result is not None:
+                return QuotaClient(result, self._children[name])
+            return result
+
+        return call
+
+
+def guard_sheet(sheet):
+    return QuotaClient(
+        sheet, SPREADSHEET_BUCKETS,
+        children={'worksheet': WORKSHEET_BUCKETS, 'add_worksheet': WORKSHEET_BUCKETS},
+    )
+
+
+def _worksheet_key(worksheet):
+    """(spreadsheet id, worksheet title): titles repeat across spreadsheets"""
+    spreadsheet_id = getattr(worksheet, 'spreadsheet_id', None)
+    if spreadsheet_id is None:
+        spreadsheet_id = getattr(getattr(worksheet, 'spreadsheet', None), 'id', None)
+    return spreadsheet_id, getattr(worksheet, 'title', None)
+
+
+class WriteQueue:
+    """Pending cell writes per worksheet, sent as one batch_update each"""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self._pending = {}  # (spreadsheet id, title) -> (worksheet, {range: values})
+
+    def __len__(self):
+        return sum(len(cells) for _, cells in self._pending.values())
+
+    def submit(self, worksheet, cells):
+        """Queue [{'range', 'values'}] for a worksheet; send now unless writes are throttled"""
+        key = _worksheet_key(worksheet)
+        _, pending = self._pending.setdefault(key, (worksheet, {}))
+        for cell in cells:
+            pending.pop(cell['range'], None)  # re-insert so the newest write goes last
+            pending[cell['range']] = cell['values']
+        if not self.bucket.available():
+            logger.info(f"Sheets writes throttled, {len(pending)} cells queued", extra={'queued': len(pending)})
+            return
+        try:
+            self._send(key)
+        except Exception as e:
+            if _status(e) != 429:
+                raise
+            logger.warning(f"Sheets write quota exhausted, {len(pending)} cells stay queued")
+
+    def _send(self, key):
+        worksheet, pending = self._pending[key]
+        if pending:
+            worksheet.batch_update(
+                [{'range': rng, 'values': values} for rng, values in pending.items()],
+                value_input_option='USER_ENTERED',
+            )
+        del self._pending[key]
+
+    def drain(self):
+        """Send everything still queued (the guarded batch_update waits out the quota)"""
+        for key in list(self._pending):
+            self._send(key)
+
+    def clear(self):
+        """Drop everything still queued; return the number of dropped cells"""
+        dropped = len(self)
+        self._pending.clear()
+        return dropped
+
+
+WRITES = WriteQueue(WRITE_BUCKET)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Best efforts (personal records) per sport, maintained at ingest.
+
+Each newly stored activity gets one pass over its 1 Hz streams (see
+streams.py and analytics.py):
+
+- best average power over RECORD_DURATIONS (5/20/60 min) from a cumulative
+  sum, so every window length is a single vectorized O(n) subtraction
+- fastest time over RECORD_DISTANCES (5 km, 10 km, half marathon) from the
+  cumulative distance of the speed stream: the end of the shortest window
+  starting at each second is found with one `searchsorted` call
+
+A row in `records` (sport, kind, target) is only written when the new
+effort beats the stored one, so `/api/records` just reads a table of a few
+dozen rows.
+
+    python records.py rebuild    # rescan every stored activity from scratch
+    python records.py show
+"""
+import json
+import logging
+
+import metrics
+import streams
+from analytics import resample_1hz, rolling_mean
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+# Best average power windows, seconds
+RECORD_DURATIONS = (300, 1200, 3600)
+
+# Fastest time over distance, metres
+RECORD_DISTANCES = (5000, 10000, 21097.5)
+
+SPORTS = ('running', 'cycling', 'swimming')
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def sport_of(activity_type):
+    """Sport a record belongs to: running/cycling/swimming, else the type key itself"""
+    activity_type = (activity_type or '').lower()
+    return next((sport for sport in SPORTS if sport in activity_type), activity_type or 'other')
+
+
+def best_power(power, durations=RECORD_DURATIONS):
+    """{seconds: (watts, start offset)} for each duration the activity is long enough for"""
+    np = _np()
+    best = {}
+    for duration in durations:
+        rolled = rolling_mean(power, duration)
+        if not len(rolled):
+            break
+        start = int(np.argmax(rolled))
+        best[duration] = (round(float(rolled[start]), 1), start)
+    return best
+
+
+def best_times(speed, distances=RECORD_DISTANCES):
+    """{metres: (seconds, start offset)} for each distance the activity covers"""
+    np = _np()
+    covered = np.concatenate(([0.0], np.cumsum(np.nan_to_num(speed))))
+    best = {}
+    for distance in distances:
+        if covered[-1] < distance:
+            break
+        # First sample at which `distance` is reached when starting at each second
+        ends = np.searchsorted(covered, covered + distance, side='left')
+        valid = ends < len(covered)
+        times = ends[valid] - np.arange(len(covered))[valid]
+        start = int(np.argmin(times))
+        best[distance] = (int(times[start]), start)
+    return best
+
+
+def activity_efforts(views):
+    """[(kind, target, value, start offset)] for one activity's stream views"""
+    efforts = []
+    time_s = views.get('time')
+    power = resample_1hz(time_s, views['power']) if 'power' in views else None
+    if power is not None and power.any():
+        efforts += [('power', d, value, start) for d, (value, start) in best_power(power).items()]
+    speed = resample_1hz(time_s, views['speed']) if 'speed' in views else None
+    if speed is not None and speed.any():
+        efforts += [('distance', d, value, start) for d, (value, start) in best_times(speed).items()]
+    return efforts
+
+
+def _save_effort(conn, sport, kind, target, value, activity_id, day, start):
+    """Upsert one effort if it beats the stored record; True when it did"""
+    # Power: higher is better; distance: fewer seconds is better
+    better = 'excluded.value > records.value' if kind == 'power' else 'excluded.value < records.value'
+    cursor = conn.execute(f'''
+        INSERT INTO records (sport, kind, target, value, activity_id, date, start_offset, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(sport, kind, target) DO UPDATE SET
+            value = excluded.value, activity_id = excluded.activity_id, date = excluded.date,
+            start_offset = excluded.start_offset, updated_at = CURRENT_TIMESTAMP
+        WHERE {better}
+    ''', (sport, kind, target, value, str(activity_id), day, start))
+    return cursor.rowcount > 0
+
+
+def update_records(activity_ids=None, since=None):
+    """Scan the given activities (or all with streams) and store new bests; return the new records"""
+    conn = get_db()
+    new_records = []
+    try:
+        with metrics.timer('sync_stage', stage='records'):
+            if activity_ids is None:
+                items = streams.iter_streams(('time', 'power', 'speed'), since=since, conn=conn)
+            else:
+                rows = conn.execute(
+                    f'SELECT id, date, type FROM activities WHERE id IN ({",".join("?" * len(activity_ids))})',
+                    [str(a) for a in activity_ids],
+                ).fetchall() if activity_ids else []
+                items = ((aid, day, activity_type, streams.load_streams(aid, ('time', 'power', 'speed'), conn=conn))
+                         for aid, day, activity_type in rows)
+            for activity_id, day, activity_type, views in items:
+                if not views:
+                    continue
+                sport = sport_of(activity_type)
+                for kind, target, value, start in activity_efforts(views):
+                    if _save_effort(conn, sport, kind, target, value, activity_id, day, start):
+                        new_records.append({'sport': sport, 'kind': kind, 'target': target,
+                                            'value': value, 'activity_id': str(activity_id)})
+            conn.commit()
+    finally:
+        conn.close()
+    if new_records:
+        logger.info(f"Records: {len(new_records)} new best efforts", extra={'records': new_records})
+    return new_records
+
+
+def rebuild_records():
+    """Drop every record and rescan all stored streams"""
+    conn = get_db()
+    try:
+        conn.execute('DELETE FROM records')
+        conn.commit()
+    finally:
+        conn.close()
+    return update_records()
+
+
+def get_records(sport=None, conn=None):
+    """Current records, grouped {sport: {'power': {seconds: {...}}, 'distance': {metres: {...}}}}"""
+    query = 'SELECT sport, kind, target, value, activity_id, date, start_offset FROM records'
+    params = ()
+    if sport:
+        query += ' WHERE sport = ?'
+        params = (sport,)
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        rows = conn.execute(query + ' ORDER BY sport, kind, target', params).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    result = {}
+    for sport, kind, target, value, activity_id, day, start in rows:
+        target = int(target) if float(target).is_integer() else target
+        result.setdefault(sport, {}).setdefault(kind, {})[target] = {
+            'value': value, 'activity_id': activity_id, 'date': day, 'start_offset': start,
+        }
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='Best efforts per sport')
+    parser.add_argument('command', choices=['rebuild', 'show'])
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.command == 'rebuild':
+        rebuild_records()
+    print(json.dumps(get_records(), indent=2))
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Read-only stand-in for the Garmin client backed by `training_data.db`.
+
+`LocalActivityRepository` answers the Garmin calls the sheet sync makes
+(`get_activities`, `get_activities_by_date`, `get_activity`, `get_hrv_data`,
+`get_sleep_data`) from the tables filled by sync.py, so the sheet can be
+re-rendered at any time without logging in to Garmin:
+
+    SHEET_SOURCE=local python main.py       # or: python main.py --source local
+
+Responses are rebuilt from the stored raw payloads; DB columns (including NP
+and TSS derived by analytics.py) fill summary fields the payload lacks.
+"""
+import logging
+
+from db import get_db, ACTIVITY_COLUMNS
+from payloads import load_payloads
+
+logger = logging.getLogger(__name__)
+
+# summaryDTO key -> activities column used when the stored payload has no value
+SUMMARY_COLUMNS = {
+    'duration': 'duration',
+    'distance': 'distance',
+    'averageSpeed': 'avg_speed',
+    'averageHR': 'avg_hr',
+    'averagePower': 'avg_power',
+    'normalizedPower': 'normalized_power',
+    'averageBikeCadence': 'avg_cadence',
+    'trainingStressScore': 'tss',
+    'calories': 'calories',
+}
+
+# list-endpoint key -> summaryDTO key, for payloads saved from list pages (backfill)
+LIST_TO_SUMMARY = {
+    'avgPower': 'averagePower',
+    'normPower': 'normalizedPower',
+    'averageBikingCadenceInRevPerMinute': 'averageBikeCadence',
+}
+
+
+class LocalActivityRepository:
+    """Garmin-client-shaped reads from the local SQLite store"""
+
+    # wellness.ensure_days must not cache "no data" answers from this source
+    offline = True
+
+    def __init__(self, conn=None):
+        self._conn = conn or get_db()
+
+    def close(self):
+        self._conn.close()
+
+    def login(self, tokenstore=None):
+        return None, None
+
+    def get_user_summary(self, cdate):
+        return {'calendarDate': cdate}
+
+    def _query(self, where='1=1', params=(), order='DESC', limit=-1, offset=0):
+        cursor = self._conn.execute(f'''
+            SELECT {", ".join(ACTIVITY_COLUMNS)} FROM activities
+            WHERE {where}
+            ORDER BY date {order}, id {order}
+            LIMIT ? OFFSET ?
+        ''', (*params, limit, offset))
+        rows = [dict(zip(ACTIVITY_COLUMNS, row)) for row in cursor.fetchall()]
+        raw = load_payloads(self._conn, [row['id'] for row in rows])
+        return [self._activity(row, raw.get(row['id'])) for row in rows]
+
+    @staticmethod
+    def _activity(row, payload):
+        """List-style activity dict: the stored payload, or one rebuilt from columns"""
+        activity = dict(payload or {})
+        activity.setdefault('activityId', int(row['id']) if str(row['id']).isdigit() else row['id'])
+        activity.setdefault('activityName', row['name'])
+        activity.setdefault('activityType', {'typeKey': row['type'] or ''})
+        if not activity.get('startTimeLocal'):
+            activity['startTimeLocal'] = f"{row['date']} 00:00:00"
+        for key, column in (('duration', 'duration'), ('distance', 'distance'), ('averageSpeed', 'avg_speed'),
+                            ('averageHR', 'avg_hr'), ('avgPower', 'avg_power'), ('calories', 'calories'),
+                            ('averageBikingCadenceInRevPerMinute', 'avg_cadence')):
+            if activity.get(key) is None and row[column] is not None:
+                activity[key] = row[column]
+        activity['_row'] = row
+        return activity
+
+    def get_activities(self, start=0, limit=20, activitytype=None):
+        where, params = '1=1', ()
+        if activitytype:
+            where, params = 'type = ?', (activitytype,)
+        return [self._strip(a) for a in self._query(where, params, limit=limit, offset=start)]
+
+    def get_activities_by_date(self, startdate, enddate=None, activitytype=None, sortorder=None):
+        where = 'date >= ? AND date <= ?'
+        params = (startdate, enddate or startdate)
+        if activitytype:
+            where += ' AND type = ?'
+            params += (activitytype,)
+        order = 'ASC' if sortorder == 'asc' else 'DESC'
+        return [self._strip(a) for a in self._query(where, params, order=order)]
+
+    def get_activity(self, activity_id):
+        activities = self._query('id = ?', (str(activity_id),), limit=1)
+        if not activities:
+            return {'activityId': activity_id, 'summaryDTO': {}}
+        activity = activities[0]
+        row = activity.pop('_row')
+        summary = dict(activity)
+        for list_key, summary_key in LIST_TO_SUMMARY.items():
+            if summary.get(summary_key) is None and activity.get(list_key) is not None:
+                summary[summary_key] = activity[list_key]
+        for summary_key, column in SUMMARY_COLUMNS.items():
+            if summary.get(summary_key) is None and row[column] is not None:
+                summary[summary_key] = row[column]
+        return {'activityId': activity['activityId'], 'summaryDTO': summary}
+
+    @staticmethod
+    def _strip(activity):
+        activity.pop('_row', None)
+        return activity
+
+    def _wellness(self, cdate):
+        cursor = self._conn.execute('SELECT * FROM daily_wellness WHERE date = ?', (cdate,))
+        row = cursor.fetchone()
+        return dict(zip([d[0] for d in cursor.description], row)) if row else None
+
+    def get_hrv_data(self, cdate):
+        day = self._wellness(cdate)
+        if not day or day['hrv_last_night_avg'] is None:
+            return None
+        return {'hrvSummary': {
+            'calendarDate': cdate,
+            'lastNightAvg': day['hrv_last_night_avg'],
+            'weeklyAvg': day['hrv_weekly_avg'],
+            'status': day['hrv_status'],
+        }}
+
+    def get_sleep_data(self, cdate):
+        day = self._wellness(cdate)
+        if not day:
+            return None
+        return {
+            'restingHeartRate': day['resting_hr'],
+            'dailySleepDTO': {
+                'calendarDate': cdate,
+                'sleepTimeSeconds': day['sleep_seconds'],
+                'deepSleepSeconds': day['deep_sleep_seconds'],
+                'lightSleepSeconds': day['light_sleep_seconds'],
+                'remSleepSeconds': day['rem_sleep_seconds'],
+                'awakeSleepSeconds': day['awake_seconds'],
+                'sleepScores': {'overall': {'value': day['sleep_score']}},
+            },
+        }
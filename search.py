@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Full-text activity search over name, type and notes (FTS5 index `activities_fts`).
+
+User input is split into words and each word becomes a quoted prefix term,
+so "лонг инт" matches "Лонг RUN ... интервалы" and FTS syntax characters in
+the input cannot break the query. Results are ranked with bm25, weighting
+name over notes over type (the index's configured `rank`); without extra
+filters FTS5 picks the top page itself before touching `activities`.
+"""
+import re
+
+from db import get_db, ACTIVITY_COLUMNS
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_match_query(text):
+    """'Лонг RUN' -> '"Лонг"* AND "RUN"*'; None if the text has no words"""
+    words = _WORD_RE.findall(text or '')
+    if not words:
+        return None
+    return ' AND '.join(f'"{word}"*' for word in words)
+
+
+def search_activities(text, limit=20, offset=0, activity_type=None, start_date=None, end_date=None):
+    """Ranked page of matching activities plus the total match count"""
+    match = build_match_query(text)
+    if match is None:
+        return {'query': text, 'total': 0, 'results': []}
+
+    filters = ''
+    params = [match]
+    if activity_type:
+        filters += ' AND a.type LIKE ?'
+        params.append(f'%{activity_type}%')
+    if start_date:
+        filters += ' AND a.date >= ?'
+        params.append(start_date)
+    if end_date:
+        filters += ' AND a.date <= ?'
+        params.append(end_date)
+
+    columns = ", ".join("a." + c for c in ACTIVITY_COLUMNS)
+    conn = get_db()
+    try:
+        if filters:
+            total = conn.execute(f'''
+                SELECT COUNT(*) FROM activities_fts
+                JOIN activities a ON a.rowid = activities_fts.rowid
+                WHERE activities_fts MATCH ?{filters}
+            ''', params).fetchone()[0]
+            rows = conn.execute(f'''
+                SELECT {columns}, activities_fts.rank
+                FROM activities_fts
+                JOIN activities a ON a.rowid = activities_fts.rowid
+                WHERE activities_fts MATCH ?{filters}
+                ORDER BY activities_fts.rank
+                LIMIT ? OFFSET ?
+            ''', params + [limit, offset]).fetchall()
+        else:
+            total = conn.execute(
+                'SELECT COUNT(*) FROM activities_fts WHERE activities_fts MATCH ?', params
+            ).fetchone()[0]
+            rows = conn.execute(f'''
+                WITH hits AS (
+                    SELECT rowid, rank FROM activities_fts
+                    WHERE activities_fts MATCH ?
+                    ORDER BY rank
+                    LIMIT ? OFFSET ?
+                )
+                SELECT {columns}, hits.rank
+                FROM hits JOIN activities a ON a.rowid = hits.rowid
+                ORDER BY hits.rank
+            ''', params + [limit, offset]).fetchall()
+    finally:
+        conn.close()
+
+    results = []
+    for row in rows:
+        activity = dict(zip(ACTIVITY_COLUMNS, row))
+        activity['rank'] = round(row[-1], 4)
+        results.append(activity)
+    return {'query': text, 'total': total, 'limit': limit, 'offset': offset, 'results': results}
+
+
+def set_notes(activity_id, notes):
+    """Update an activity's notes; False if the activity does not exist"""
+    conn = get_db()
+    try:
+        cursor = conn.execute(
+            'UPDATE activities SET notes = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?', (notes, str(activity_id))
+        )
+        conn.commit()
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Static JSON snapshots of the default dashboard data, rebuilt after each sync.
+
+The dashboard's first screen only changes when a sync (or a notes edit)
+commits, so instead of running its queries on every page load they are
+materialized once into content-hashed files under SNAPSHOT_DIR:
+
+    snapshots/summary.3f2a9c1b04de.json
+    snapshots/manifest.json        {"generation": 7, "files": {"summary": "summary.3f2a9c1b04de.json", ...}}
+
+Files are immutable (a new content gets a new name), written with .gz/.br
+variants and served with far-future cache headers; only the small manifest
+is revalidated. The new manifest replaces the old one with os.replace, so
+readers always see a complete set. Files of the previous manifest are kept for clients that
+loaded it a moment ago; older ones are removed.
+
+Some payloads are relative to today (the last 7 days, the last 12 weeks), so
+the manifest records the day it was built for and `current_manifest()`
+rebuilds it on the first request of a new day.
+
+    python snapshots.py          # rebuild by hand
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from datetime import date, datetime
+
+import charts
+import compression
+import events
+import dashboard_data
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = os.getenv('SNAPSHOT_DIR', 'snapshots')
+MANIFEST = 'manifest.json'
+
+# name -> payload builder; parameters match the dashboard's default requests
+BUILDERS = {
+    'summary': dashboard_data.summary,
+    'activities': lambda: dashboard_data.list_activities(limit=100),
+    'weekly_stats': lambda: dashboard_data.weekly_stats(),
+    'chart_volume': lambda: charts.volume('week', 12),
+    'chart_types': lambda: charts.types(90),
+}
+
+# Files this young may belong to a build running in another worker
+KEEP_RECENT_SECONDS = 60
+
+_rebuild_lock = threading.Lock()
+
+
+def _write_atomic(path, data):
+    # A unique temp name: workers may build the same file at the same time
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path) or '.', prefix='.', suffix='.tmp', delete=False) as f:
+        f.write(data)
+    os.replace(f.name, path)
+
+
+def read_manifest(directory=None):
+    """Current manifest, or None if no snapshot has been built"""
+    try:
+        with open(os.path.join(directory or SNAPSHOT_DIR, MANIFEST), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_snapshots(directory=None):
+    """Materialize every payload in BUILDERS and swap in the new manifest"""
+    directory = directory or SNAPSHOT_DIR
+    os.makedirs(directory, exist_ok=True)
+    previous = read_manifest(directory)
+
+    # Generation before the caller bumps it: a client that loaded this
+    # snapshot refreshes once it sees the bump on /api/events
+    manifest = {
+        'generation': events.current_generation(),
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'day': date.today().isoformat(),
+        'files': {},
+    }
+    for name, build in BUILDERS.items():
+        body = json.dumps(build(), ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8')
+        filename = f'{name}.{hashlib.sha256(body).hexdigest()[:12]}.json'
+        path = os.path.join(directory, filename)
+        if not os.path.exists(path):
+            compression.write_precompressed(path, body)
+            _write_atomic(path, body)
+        manifest['files'][name] = filename
+
+    _write_atomic(os.path.join(directory, MANIFEST), json.dumps(manifest, indent=2).encode('utf-8'))
+
+    keep = set(manifest['files'].values()) | set((previous or {}).get('files', {}).values()) | {MANIFEST}
+    now = time.time()
+    for filename in os.listdir(directory):
+        base = filename.removesuffix('.gz').removesuffix('.br')
+        path = os.path.join(directory, filename)
+        if base.endswith('.json') and base not in keep:
+            try:
+                if now - os.path.getmtime(path) > KEEP_RECENT_SECONDS:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass  # removed by a concurrent build
+
+    logger.info(f"Dashboard snapshot built ({len(manifest['files'])} files)", extra={
+        'generation': manifest['generation'], 'directory': directory,
+    })
+    return manifest
+
+
+def refresh_snapshots():
+    """build_snapshots() for post-commit hooks: a failure only leaves the live API in charge"""
+    try:
+        return build_snapshots()
+    except Exception as e:
+        logger.error(f"Dashboard snapshot failed: {e}")
+        return None
+
+
+def current_manifest():
+    """Manifest for today: rebuilt (and announced to open dashboards) once the day changes
+
+    Returns None before the first build; a failed rebuild keeps serving the old manifest.
+    """
+    manifest = read_manifest()
+    if manifest is None or manifest.get('day') == date.today().isoformat():
+        return manifest
+    with _rebuild_lock:
+        manifest = read_manifest()
+        if manifest.get('day') == date.today().isoformat():
+            return manifest  # rebuilt by another request meanwhile
+        rebuilt = refresh_snapshots()
+        if rebuilt is None:
+            return manifest
+    events.bump_generation(('summary', 'charts'))
+    return rebuilt
+
+
+if __name__ == '__main__':
+    from logging_config import configure_logging
+
+    configure_logging()
+    print(json.dumps(build_snapshots(), indent=2))
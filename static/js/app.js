@@ -2,6 +2,9 @@
 
 // Global state
 let charts = {};
+let dataGeneration = null;  // generation of the data currently shown (see /api/events)
+let snapshot = null;        // manifest of the static dashboard snapshot (see /api/snapshot)
+const ALL_PANELS = ['summary', 'charts', 'activities', 'weekly', 'logs'];
 
 // Initialize on page load
 document.addEventListener('DOMContentLoaded', function() {
@@ -10,10 +13,127 @@ document.addEventListener('DOMContentLoaded', function() {
     initializeFilters();
     loadDashboardData();
 
-    // Auto-refresh every 5 minutes
-    setInterval(loadDashboardData, 5 * 60 * 1000);
+    if (window.EventSource) {
+        initializeEvents();
+    } else {
+        // No SSE support: fall back to refreshing every 5 minutes
+        setInterval(loadDashboardData, 5 * 60 * 1000);
+    }
 });
 
+// Server-Sent Events: sync progress and data changes
+function initializeEvents() {
+    // EventSource reconnects by itself and sends Last-Event-ID (the generation)
+    const source = new EventSource('/api/events');
+
+    source.addEventListener('progress', function(event) {
+        showSyncProgress(JSON.parse(event.data));
+    });
+
+    source.addEventListener('changed', function(event) {
+        const change = JSON.parse(event.data);
+        if (dataGeneration !== null && change.generation > dataGeneration) {
+            // No panel list (first contact after a missed change): refresh everything
+            refreshPanels(change.panels.length ? change.panels : ALL_PANELS);
+        }
+        setDataGeneration(change.generation);
+    });
+}
+
+function setDataGeneration(generation) {
+    dataGeneration = Math.max(dataGeneration || 0, generation);
+}
+
+// Reload only the panels a data change affects; hidden tabs load on open anyway
+async function refreshPanels(panels) {
+    const activeTab = document.querySelector('.tab.active')?.getAttribute('data-tab');
+
+    // The snapshot is rebuilt before the change is announced
+    await loadSnapshotManifest();
+
+    if (panels.includes('summary')) {
+        getDashboardData('summary', '/api/summary')
+            .then(data => updateSummaryCards(data))
+            .catch(error => console.error('Error refreshing summary:', error));
+    }
+    if (panels.includes('charts')) {
+        updateOverviewCharts().catch(error => console.error('Error refreshing charts:', error));
+    }
+    if (panels.includes('activities') && activeTab === 'activities') {
+        loadActivities();
+    }
+    if (panels.includes('weekly') && activeTab === 'weekly') {
+        loadWeeklyStats();
+    }
+    if (panels.includes('logs') && activeTab === 'logs') {
+        loadSyncLogs();
+    }
+}
+
+// Static snapshot of the default dashboard data, rebuilt after each sync
+async function loadSnapshotManifest() {
+    try {
+        const response = await axios.get('/api/snapshot');
+        snapshot = response.data;
+        setDataGeneration(snapshot.generation);
+    } catch (error) {
+        snapshot = null;  // no snapshot yet: live API
+    }
+}
+
+// Default view data: the snapshot file if there is one, otherwise the live endpoint
+async function getDashboardData(name, liveUrl) {
+    if (snapshot && snapshot.files[name]) {
+        try {
+            return (await axios.get(snapshot.files[name])).data;
+        } catch (error) {
+            console.warn(`Snapshot ${name} unavailable, using live API`, error);
+        }
+    }
+    return (await axios.get(liveUrl)).data;
+}
+
+// Sync button label follows the progress of the running sync
+const SYNC_STAGES = {
+    connect: 'Подключение к Garmin',
+    details: 'Загрузка тренировок',
+    streams: 'Загрузка графиков',
+    wellness: 'HRV и сон',
+    rollups: 'Пересчет статистики',
+    backfill: 'Загрузка истории'
+};
+
+function showSyncProgress(progress) {
+    const syncBtn = document.getElementById('syncBtn');
+
+    if (progress.status === 'running') {
+        let label = SYNC_STAGES[progress.stage] || 'Синхронизация';
+        if (progress.stage === 'details' && progress.total) {
+            label += ` ${progress.saved}/${progress.total}`;
+        } else if (progress.stage === 'backfill') {
+            label += ` (${progress.saved})`;
+        }
+        syncBtn.classList.add('syncing');
+        syncBtn.innerHTML = `<i class="fas fa-sync fa-spin"></i> ${label}...`;
+        syncBtn.disabled = true;
+        return;
+    }
+
+    resetSyncButton();
+    if (progress.status === 'success') {
+        showNotification(`Синхронизация завершена: ${progress.saved || 0} активностей`, 'success');
+    } else {
+        showNotification('Ошибка синхронизации: ' + (progress.error || ''), 'error');
+    }
+}
+
+function resetSyncButton() {
+    const syncBtn = document.getElementById('syncBtn');
+    syncBtn.classList.remove('syncing');
+    syncBtn.innerHTML = '<i class="fas fa-sync"></i> Синхронизировать';
+    syncBtn.disabled = false;
+}
+
 // Tab Management
 function initializeTabs() {
     const tabs = document.querySelectorAll('.tab');
@@ -59,21 +179,26 @@ function initializeSyncButton() {
         try {
             const response = await axios.post('/api/sync');
 
-            if (response.data.status === 'started') {
+            if (response.data.status === 'running') {
+                // Another run is in flight; its progress events drive the button
+                showNotification(response.data.message, 'info');
+                if (!window.EventSource) {
+                    resetSyncButton();
+                }
+            } else if (response.data.status === 'started') {
                 showNotification('Синхронизация запущена в фоновом режиме', 'success');
 
-                // Wait a bit and reload data
-                setTimeout(() => {
-                    loadDashboardData();
-                }, 5000);
+                if (!window.EventSource) {
+                    // Without progress events: wait a bit and reload data
+                    setTimeout(loadDashboardData, 5000);
+                    resetSyncButton();
+                }
+                // Otherwise the button is reset by the final progress event
             }
         } catch (error) {
             console.error('Sync error:', error);
             showNotification('Ошибка синхронизации: ' + (error.response?.data?.message || error.message), 'error');
-        } finally {
-            this.classList.remove('syncing');
-            this.innerHTML = '<i class="fas fa-sync"></i> Синхронизировать';
-            this.disabled = false;
+            resetSyncButton();
         }
     });
 }
@@ -117,13 +242,15 @@ async function loadDashboardData() {
     try {
         showLoading(true);
 
+        await loadSnapshotManifest();
+
         // Load summary
-        const summaryResponse = await axios.get('/api/summary');
-        updateSummaryCards(summaryResponse.data);
+        const summary = await getDashboardData('summary', '/api/summary');
+        updateSummaryCards(summary);
+        setDataGeneration(summary.generation);
 
-        // Load activities for chart
-        const activitiesResponse = await axios.get('/api/activities?limit=50');
-        updateOverviewCharts(activitiesResponse.data);
+        // Load pre-aggregated chart series
+        await updateOverviewCharts();
 
         showLoading(false);
     } catch (error) {
@@ -153,67 +280,30 @@ function updateSummaryCards(data) {
     if (last_sync) {
         const syncDate = new Date(last_sync.date);
         document.getElementById('lastSync').textContent = formatDateTime(syncDate);
-        document.getElementById('syncStatus').textContent =
-            last_sync.status === 'success' ?
-            `${last_sync.activities_synced} активностей` :
-            'Ошибка';
+        const statusText = {
+            success: `${last_sync.activities_synced} активностей`,
+            running: `Выполняется: ${last_sync.activities_synced} активностей`
+        };
+        document.getElementById('syncStatus').textContent = statusText[last_sync.status] || 'Ошибка';
     }
 }
 
 // Update overview charts
-function updateOverviewCharts(activities) {
-    // Group activities by week
-    const weeklyData = groupActivitiesByWeek(activities);
+async function updateOverviewCharts() {
+    const [volume, types] = await Promise.all([
+        getDashboardData('chart_volume', '/api/charts/volume?period=week&limit=12'),
+        getDashboardData('chart_types', '/api/charts/types?days=90')
+    ]);
 
     // Create/update weekly volume chart
-    createWeeklyVolumeChart(weeklyData);
+    createWeeklyVolumeChart(volume);
 
     // Create/update activity type chart
-    createActivityTypeChart(activities);
-}
-
-// Group activities by week
-function groupActivitiesByWeek(activities) {
-    const weeks = {};
-
-    activities.forEach(activity => {
-        const date = new Date(activity.date);
-        const weekStart = getWeekStart(date);
-        const weekKey = weekStart.toISOString().split('T')[0];
-
-        if (!weeks[weekKey]) {
-            weeks[weekKey] = {
-                date: weekKey,
-                cycling: 0,
-                running: 0,
-                total: 0
-            };
-        }
-
-        const distance = (activity.distance || 0) / 1000; // Convert to km
-
-        if (activity.type && activity.type.toLowerCase().includes('cycling')) {
-            weeks[weekKey].cycling += distance;
-        } else if (activity.type && activity.type.toLowerCase().includes('running')) {
-            weeks[weekKey].running += distance;
-        }
-
-        weeks[weekKey].total += distance;
-    });
-
-    return Object.values(weeks).sort((a, b) => new Date(a.date) - new Date(b.date));
-}
-
-// Get week start (Monday)
-function getWeekStart(date) {
-    const d = new Date(date);
-    const day = d.getDay();
-    const diff = d.getDate() - day + (day === 0 ? -6 : 1);
-    return new Date(d.setDate(diff));
+    createActivityTypeChart(types);
 }
 
 // Create weekly volume chart
-function createWeeklyVolumeChart(weeklyData) {
+function createWeeklyVolumeChart(volume) {
     const ctx = document.getElementById('weeklyVolumeChart');
     if (!ctx) return;
 
@@ -225,18 +315,18 @@ function createWeeklyVolumeChart(weeklyData) {
     charts.weeklyVolume = new Chart(ctx, {
         type: 'bar',
         data: {
-            labels: weeklyData.map(w => formatDate(new Date(w.date))),
+            labels: volume.labels.map(label => formatDate(new Date(label))),
             datasets: [
                 {
                     label: 'Велосипед',
-                    data: weeklyData.map(w => w.cycling),
+                    data: volume.distance_km.cycling,
                     backgroundColor: 'rgba(54, 162, 235, 0.6)',
                     borderColor: 'rgba(54, 162, 235, 1)',
                     borderWidth: 1
                 },
                 {
                     label: 'Бег',
-                    data: weeklyData.map(w => w.running),
+                    data: volume.distance_km.running,
                     backgroundColor: 'rgba(255, 99, 132, 0.6)',
                     borderColor: 'rgba(255, 99, 132, 1)',
                     borderWidth: 1
@@ -260,17 +350,10 @@ function createWeeklyVolumeChart(weeklyData) {
 }
 
 // Create activity type chart
-function createActivityTypeChart(activities) {
+function createActivityTypeChart(types) {
     const ctx = document.getElementById('activityTypeChart');
     if (!ctx) return;
 
-    // Count by type
-    const types = {};
-    activities.forEach(activity => {
-        const type = activity.type || 'Неизвестно';
-        types[type] = (types[type] || 0) + 1;
-    });
-
     // Destroy existing chart
     if (charts.activityType) {
         charts.activityType.destroy();
@@ -279,9 +362,9 @@ function createActivityTypeChart(activities) {
     charts.activityType = new Chart(ctx, {
         type: 'doughnut',
         data: {
-            labels: Object.keys(types),
+            labels: types.labels.map(label => label === 'unknown' ? 'Неизвестно' : label),
             datasets: [{
-                data: Object.values(types),
+                data: types.counts,
                 backgroundColor: [
                     'rgba(54, 162, 235, 0.8)',
                     'rgba(255, 99, 132, 0.8)',
@@ -301,8 +384,7 @@ function createActivityTypeChart(activities) {
 // Load activities list
 async function loadActivities() {
     try {
-        const response = await axios.get('/api/activities?limit=100');
-        displayActivities(response.data);
+        displayActivities(await getDashboardData('activities', '/api/activities?limit=100'));
     } catch (error) {
         console.error('Error loading activities:', error);
         showNotification('Ошибка загрузки активностей', 'error');
@@ -347,8 +429,7 @@ function displayActivities(activities) {
 // Load weekly statistics
 async function loadWeeklyStats() {
     try {
-        const response = await axios.get('/api/weekly-stats');
-        displayWeeklyStats(response.data);
+        displayWeeklyStats(await getDashboardData('weekly_stats', '/api/weekly-stats'));
     } catch (error) {
         console.error('Error loading weekly stats:', error);
         showNotification('Ошибка загрузки статистики', 'error');
@@ -513,7 +594,7 @@ function displaySyncLogs(logs) {
     let html = '<div class="logs-container">';
 
     logs.forEach(log => {
-        const statusClass = log.status === 'success' ? 'success' : 'error';
+        const statusClass = log.status === 'error' ? 'error' : 'success';
         html += `
             <div class="log-entry ${statusClass}">
                 <div class="log-header">
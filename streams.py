@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Per-second activity streams (power, HR, cadence, speed, altitude) in SQLite.
+
+Each activity's time series is fetched once with `get_activity_details` and
+stored column by column in `activity_streams`: one BLOB per channel holding
+little-endian float32 samples (missing samples are NaN). A 1 Hz hour is
+~14 KB per channel, so a year of rides stays in the tens of MB. Reads
+return memoryviews over the fetched BLOBs without copying or unpacking;
+`numpy.frombuffer` accepts them directly.
+
+    python streams.py ingest [--limit N]    # fetch streams for stored activities that lack them
+    python streams.py stats                 # storage used by activity_streams
+"""
+import os
+import sys
+import math
+import logging
+from array import array
+
+import metrics
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+CHANNELS = ('time', 'power', 'heart_rate', 'cadence', 'speed', 'altitude')
+
+# Garmin metric descriptor keys per channel, in order of preference
+DESCRIPTOR_KEYS = {
+    'time': ('sumDuration', 'sumElapsedDuration', 'directTimestamp'),
+    'power': ('directPower',),
+    'heart_rate': ('directHeartRate',),
+    'cadence': ('directBikeCadence', 'directRunCadence', 'directDoubleCadence'),
+    'speed': ('directSpeed',),
+    'altitude': ('directElevation',),
+}
+
+# Garmin downsamples the chart to maxChartSize points; ask for enough to keep 1 Hz
+MAX_SAMPLES = int(os.getenv('STREAM_MAX_SAMPLES', '100000'))
+
+_SWAP = sys.byteorder == 'big'
+
+
+def _to_blob(values):
+    samples = array('f', (math.nan if v is None else v for v in values))
+    if _SWAP:
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def _view(blob):
+    if blob is None:
+        return None
+    if _SWAP:
+        samples = array('f', blob)
+        samples.byteswap()
+        return memoryview(samples)
+    return memoryview(blob).cast('f')
+
+
+def parse_details(details):
+    """Split a get_activity_details response into channel -> list of samples"""
+    descriptors = {d.get('key'): d.get('metricsIndex') for d in details.get('metricDescriptors') or []}
+    rows = [row.get('metrics') or [] for row in details.get('activityDetailMetrics') or []]
+    if not rows:
+        return {}
+
+    result = {}
+    for channel, keys in DESCRIPTOR_KEYS.items():
+        key = next((k for k in keys if k in descriptors), None)
+        if key is None:
+            continue
+        index = descriptors[key]
+        values = [row[index] if index < len(row) else None for row in rows]
+        if key == 'directTimestamp':
+            start = next((v for v in values if v is not None), 0)
+            values = [None if v is None else (v - start) / 1000 for v in values]
+        if any(v is not None for v in values):
+            result[channel] = values
+    return result
+
+
+def save_streams(conn, activity_id, channels):
+    """Store parsed channels for one activity (caller commits)"""
+    samples = max((len(v) for v in channels.values()), default=0)
+    conn.execute(f'''
+        INSERT OR REPLACE INTO activity_streams
+        (activity_id, samples, channels, {", ".join(CHANNELS)}, fetched_at)
+        VALUES (?, ?, ?, {", ".join("?" * len(CHANNELS))}, CURRENT_TIMESTAMP)
+    ''', [str(activity_id), samples, ','.join(c for c in CHANNELS if c in channels)]
+        + [_to_blob(channels[c]) if c in channels else None for c in CHANNELS])
+
+
+def missing_stream_ids(conn, activity_ids=None):
+    """Activity IDs that have no stored streams yet (all stored activities if none given)"""
+    if activity_ids is None:
+        cursor = conn.execute('''
+            SELECT a.id FROM activities a
+            LEFT JOIN activity_streams s ON s.activity_id = a.id
+            WHERE s.activity_id IS NULL
+            ORDER BY a.date DESC
+        ''')
+        return [row[0] for row in cursor.fetchall()]
+    ids = [str(i) for i in activity_ids]
+    if not ids:
+        return []
+    placeholders = ','.join('?' * len(ids))
+    stored = {row[0] for row in conn.execute(
+        f'SELECT activity_id FROM activity_streams WHERE activity_id IN ({placeholders})', ids
+    )}
+    return [i for i in ids if i not in stored]
+
+
+def ingest_streams(garmin_client, activity_ids=None, limit=None, on_progress=None):
+    """Fetch and store streams for activities that lack them; return how many were stored
+
+    `on_progress()` is called after every activity, stored or not.
+    """
+    conn = get_db()
+    try:
+        pending = missing_stream_ids(conn, activity_ids)
+        if limit:
+            pending = pending[:limit]
+        stored = 0
+        for activity_id in pending:
+            try:
+                with metrics.timer('sync_stage', stage='stream'):
+                    details = garmin_client.get_activity_details(activity_id, maxchart=MAX_SAMPLES)
+                    # Activities without a time series (e.g. manual entries) are
+                    # stored empty so they are not requested again
+                    save_streams(conn, activity_id, parse_details(details or {}))
+                conn.commit()
+                stored += 1
+            except Exception as e:
+                logger.warning(f"Failed to fetch streams for activity {activity_id}: {e}")
+            if on_progress:
+                on_progress()
+        if pending:
+            logger.info(f"Streams: stored {stored} of {len(pending)} activities", extra={
+                'stored': stored, 'pending': len(pending),
+            })
+        return stored
+    finally:
+        conn.close()
+
+
+def load_streams(activity_id, channels=CHANNELS, conn=None):
+    """Channel -> float32 memoryview for one activity, or None if not stored
+
+    The views reference the BLOBs returned by SQLite directly; absent channels
+    are omitted.
+    """
+    channels = [c for c in channels if c in CHANNELS]
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        row = conn.execute(
+            f'SELECT {", ".join(channels)} FROM activity_streams WHERE activity_id = ?', (str(activity_id),)
+        ).fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    if row is None:
+        return None
+    return {c: _view(blob) for c, blob in zip(channels, row) if blob is not None}
+
+
+def iter_streams(channels=CHANNELS, since=None, activity_type=None, conn=None):
+    """Yield (activity_id, date, type, {channel: memoryview}) for stored streams, oldest first"""
+    channels = [c for c in channels if c in CHANNELS]
+    own_conn = conn is None
+    conn = conn or get_db()
+    query = f'''
+        SELECT s.activity_id, a.date, a.type, {", ".join("s." + c for c in channels)}
+        FROM activity_streams s JOIN activities a ON a.id = s.activity_id
+        WHERE s.samples > 0
+    '''
+    params = []
+    if since:
+        query += ' AND a.date >= ?'
+        params.append(str(since))
+    if activity_type:
+        query += ' AND a.type LIKE ?'
+        params.append(f'%{activity_type}%')
+    query += ' ORDER BY a.date, s.activity_id'
+    try:
+        for row in conn.execute(query, params):
+            views = {c: _view(blob) for c, blob in zip(channels, row[3:]) if blob is not None}
+            yield row[0], row[1], row[2], views
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def storage_stats(conn=None):
+    """Row count, samples and bytes held in activity_streams"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        row = conn.execute(f'''
+            SELECT COUNT(*), COALESCE(SUM(samples), 0),
+                   COALESCE(SUM({" + ".join(f"COALESCE(LENGTH({c}), 0)" for c in CHANNELS)}), 0)
+            FROM activity_streams
+        ''').fetchone()
+    finally:
+        if own_conn:
+            conn.close()
+    return {'activities': row[0], 'samples': row[1], 'bytes': row[2]}
+
+
+if __name__ == '__main__':
+    import argparse
+    import json
+    from logging_config import configure_logging
+    from main import connect_to_garmin
+
+    parser = argparse.ArgumentParser(description='Activity stream storage')
+    parser.add_argument('command', choices=['ingest', 'stats'])
+    parser.add_argument('--limit', type=int, help='fetch at most N activities')
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.command == 'ingest':
+        ingest_streams(connect_to_garmin(), limit=args.limit)
+    print(json.dumps(storage_stats()))
@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+Garmin -> SQLite synchronization used by the web app.
+
+Client libraries (garminconnect, gspread, google-auth) are only imported by
+`main.connect_to_garmin` / `main.connect_to_google_sheets` when a sync
+actually runs, so importing this module from app.py stays cheap.
+"""
+import os
+import json
+import time
+import logging
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+import metrics
+import payloads
+import records
+import streams
+import analytics
+import aggregate
+import events
+import snapshots
+import maintenance
+import training_load
+import wellness
+import zones
+from db import get_db
+from main import connect_to_garmin, iter_activity_pages, main as sheet_sync
+
+logger = logging.getLogger(__name__)
+
+def _activity_row(activity_data):
+    """Column values of the activities table for one Garmin activity"""
+    return (
+        activity_data.get('activityId'),
+        activity_data.get('startTimeLocal', '')[:10],
+        activity_data.get('activityType', {}).get('typeKey', ''),
+        activity_data.get('activityName', ''),
+        activity_data.get('duration'),
+        activity_data.get('distance'),
+        activity_data.get('averageSpeed'),
+        activity_data.get('averageHR'),
+        activity_data.get('avgPower'),
+        activity_data.get('normalizedPower'),
+        activity_data.get('averageBikingCadenceInRevPerMinute'),
+        activity_data.get('trainingStressScore'),
+        activity_data.get('calories'),
+    )
+
+def save_activity_to_db(activity_data, conn=None):
+    """Save activity data to database (raw payload goes to activity_payloads)
+    
+    With `conn` the caller commits, e.g. together with a sync checkpoint.
+    """
+    own_conn = conn is None
+    conn = conn or get_db()
+    cursor = conn.cursor()
+    
+    # Upsert rather than REPLACE: keeps the rowid (search index) and user notes.
+    # NP/TSS computed from streams (analytics.py) stay when Garmin has none
+    cursor.execute('''
+        INSERT INTO activities 
+        (id, date, type, name, duration, distance, avg_speed, avg_hr, 
+         avg_power, normalized_power, avg_cadence, tss, calories, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(id) DO UPDATE SET
+            date = excluded.date,
+            type = excluded.type,
+            name = excluded.name,
+            duration = excluded.duration,
+            distance = excluded.distance,
+            avg_speed = excluded.avg_speed,
+            avg_hr = excluded.avg_hr,
+            avg_power = excluded.avg_power,
+            normalized_power = COALESCE(excluded.normalized_power, activities.normalized_power),
+            avg_cadence = excluded.avg_cadence,
+            tss = COALESCE(excluded.tss, activities.tss),
+            calories = excluded.calories,
+            updated_at = CURRENT_TIMESTAMP
+    ''', _activity_row(activity_data))
+    payloads.save_payload(conn, activity_data.get('activityId'), activity_data)
+    
+    if own_conn:
+        conn.commit()
+        conn.close()
+
+def save_activities_bulk(conn, activities):
+    """Upsert a page of list-endpoint activities in one statement (caller commits)
+    
+    List payloads lack the per-activity detail summary, so values already stored
+    by a regular sync are kept where the page has none, and so is the raw payload.
+    """
+    conn.executemany('''
+        INSERT INTO activities
+        (id, date, type, name, duration, distance, avg_speed, avg_hr,
+         avg_power, normalized_power, avg_cadence, tss, calories, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(id) DO UPDATE SET
+            date = excluded.date,
+            type = excluded.type,
+            name = excluded.name,
+            duration = COALESCE(excluded.duration, activities.duration),
+            distance = COALESCE(excluded.distance, activities.distance),
+            avg_speed = COALESCE(excluded.avg_speed, activities.avg_speed),
+            avg_hr = COALESCE(excluded.avg_hr, activities.avg_hr),
+            avg_power = COALESCE(excluded.avg_power, activities.avg_power),
+            normalized_power = COALESCE(excluded.normalized_power, activities.normalized_power),
+            avg_cadence = COALESCE(excluded.avg_cadence, activities.avg_cadence),
+            tss = COALESCE(excluded.tss, activities.tss),
+            calories = COALESCE(excluded.calories, activities.calories),
+            updated_at = CURRENT_TIMESTAMP
+    ''', [_activity_row(activity) for activity in activities])
+    payloads.save_payloads(conn, [(a.get('activityId'), a) for a in activities], replace=False)
+
+def get_sync_state(conn, key):
+    """Read a JSON checkpoint from sync_state, or None"""
+    row = conn.execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+    return json.loads(row[0]) if row and row[0] else None
+
+def set_sync_state(conn, key, value):
+    """Store a JSON checkpoint in sync_state (caller commits)"""
+    conn.execute('''
+        INSERT INTO sync_state (key, value, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(key) DO UPDATE SET value = excluded.value, updated_at = CURRENT_TIMESTAMP
+    ''', (key, json.dumps(value)))
+
+def log_sync(status, activities_synced=0, error_message=None, details=None, log_id=None):
+    """Log synchronization attempt (with `log_id`: finish that run's 'running' row)"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    if log_id:
+        cursor.execute('''
+            UPDATE sync_logs SET status = ?, activities_synced = ?, error_message = ?, details = ?
+            WHERE id = ?
+        ''', (status, activities_synced, error_message, json.dumps(details) if details else None, log_id))
+    else:
+        cursor.execute('''
+            INSERT INTO sync_logs (status, activities_synced, error_message, details)
+            VALUES (?, ?, ?, ?)
+        ''', (status, activities_synced, error_message, json.dumps(details) if details else None))
+    
+    conn.commit()
+    conn.close()
+
+# A sync run is a persistent job in sync_state: activities processed so far,
+# current stage and a heartbeat. Every activity is committed together with the
+# checkpoint, so a run killed with its worker is resumed by the next sync
+# (or app start) once its heartbeat is older than SYNC_JOB_STALE_SECONDS.
+# Stages without per-activity checkpoints refresh the heartbeat after every
+# stream, wellness day and rollup step, so a slow live run is never taken over.
+JOB_KEY = 'sync_job'
+JOB_STAGES = ('details', 'streams', 'wellness', 'rollups')
+JOB_STALE_SECONDS = int(os.getenv('SYNC_JOB_STALE_SECONDS', '180'))
+
+def _job_is_stale(job):
+    return time.time() - job.get('heartbeat', 0) > JOB_STALE_SECONDS
+
+def active_job():
+    """The unfinished sync job, if any (running now or interrupted)"""
+    conn = get_db()
+    try:
+        return get_sync_state(conn, JOB_KEY)
+    finally:
+        conn.close()
+
+def interrupted_job():
+    """An unfinished sync job whose process stopped sending heartbeats"""
+    job = active_job()
+    return job if job and _job_is_stale(job) else None
+
+def _claim_job(conn, run, days):
+    """Start a job or take over an interrupted one; None if another run is alive"""
+    conn.execute('BEGIN IMMEDIATE')
+    job = get_sync_state(conn, JOB_KEY)
+    if job and not _job_is_stale(job):
+        conn.rollback()
+        return None
+    if job:
+        job['resumed'] = job.get('resumed', 0) + 1
+        logger.info("Resuming interrupted sync", extra={
+            'run': job['run'], 'stage': job['stage'], 'processed': len(job['done']),
+        })
+    else:
+        cursor = conn.execute(
+            "INSERT INTO sync_logs (status, activities_synced, details) VALUES ('running', 0, ?)",
+            (json.dumps({'stage': 'details'}),)
+        )
+        job = {'run': run, 'log_id': cursor.lastrowid, 'days': days, 'stage': 'details',
+               'total': None, 'done': [], 'saved_ids': [], 'saved_dates': [], 'resumed': 0}
+    job['heartbeat'] = time.time()
+    set_sync_state(conn, JOB_KEY, job)
+    conn.commit()
+    return job
+
+def _checkpoint(conn, job, stage=None):
+    """Persist job progress and mirror it on the running sync_logs row (caller commits)"""
+    if stage:
+        job['stage'] = stage
+    job['heartbeat'] = time.time()
+    set_sync_state(conn, JOB_KEY, job)
+    conn.execute('UPDATE sync_logs SET activities_synced = ?, details = ? WHERE id = ?', (
+        len(job['saved_ids']),
+        json.dumps({'stage': job['stage'], 'processed': len(job['done']), 'total': job['total'],
+                    'resumed': job['resumed']}),
+        job['log_id'],
+    ))
+
+def _heartbeat(job):
+    """Refresh the checkpoint of a running job from inside a long stage"""
+    conn = get_db()
+    try:
+        _checkpoint(conn, job)
+        conn.commit()
+    finally:
+        conn.close()
+
+def _finish_job(job, status, error_message=None, details=None):
+    """Final sync_logs row for the job and removal of its checkpoint"""
+    details = {**(details or {}), 'resumed': job['resumed']} if job['resumed'] else details
+    log_sync(status, len(job['saved_ids']), error_message, details=details, log_id=job['log_id'])
+    conn = get_db()
+    try:
+        conn.execute('DELETE FROM sync_state WHERE key = ?', (JOB_KEY,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def perform_sync():
+    """Perform the actual synchronization (or resume an interrupted one)"""
+    with metrics.collect() as run_metrics:
+        _perform_sync(run_metrics)
+
+def _publish_progress(run, status='running', **progress):
+    """Progress for /api/events; a failed write must not fail the sync"""
+    try:
+        events.publish_progress(run, status, **progress)
+    except Exception as e:
+        logger.warning(f"Could not publish sync progress: {e}")
+
+def _perform_sync(run_metrics):
+    run = datetime.now().isoformat(timespec='seconds')
+    days = int(os.getenv('DAYS_TO_SYNC', '14'))
+    conn = get_db()
+    try:
+        job = _claim_job(conn, run, days)
+    finally:
+        conn.close()
+    if job is None:
+        logger.info("Synchronization already running, not starting another one")
+        return
+    run, days = job['run'], job['days']
+    stage_index = JOB_STAGES.index(job['stage'])
+    
+    try:
+        logger.info("Starting synchronization...")
+        _publish_progress(run, stage='connect')
+        
+        # Connect to Garmin
+        garmin = connect_to_garmin()
+        
+        conn = get_db()
+        try:
+            if stage_index <= JOB_STAGES.index('details'):
+                # Get activities
+                with metrics.timer('sync_stage', stage='fetch_list'):
+                    activities = garmin.get_activities(0, days * 2)
+                done = set(job['done'])
+                pending = [a for a in activities if str(a.get('activityId')) not in done]
+                job['total'] = len(done) + len(pending)
+                _publish_progress(run, stage='details', fetched=job['total'], saved=len(job['saved_ids']),
+                                  total=job['total'])
+                
+                stage_start = time.perf_counter()
+                for activity in pending:
+                    activity_id = activity.get('activityId')
+                    try:
+                        # Get detailed activity data
+                        details = garmin.get_activity(activity_id)
+                        summary = details.get('summaryDTO', {})
+                        
+                        # Merge data
+                        activity_full = {**activity, **summary}
+                        
+                        # Save to database, in one transaction with the checkpoint
+                        save_activity_to_db(activity_full, conn)
+                        job['saved_ids'].append(activity_id)
+                        job['saved_dates'].append(activity_full.get('startTimeLocal', '')[:10])
+                    except Exception as e:
+                        conn.rollback()
+                        logger.error(f"Error saving activity {activity.get('activityName')}: {e}")
+                    job['done'].append(str(activity_id))
+                    _checkpoint(conn, job)
+                    conn.commit()
+                    _publish_progress(run, stage='details', fetched=job['total'], saved=len(job['saved_ids']),
+                                      total=job['total'])
+                
+                metrics.observe('sync_stage', time.perf_counter() - stage_start, stage='fetch_details')
+                _checkpoint(conn, job, 'streams')
+                conn.commit()
+            
+            saved_ids = job['saved_ids']
+            progress = {'fetched': job['total'], 'saved': len(saved_ids)}
+            
+            # Time series are fetched once per activity
+            if stage_index <= JOB_STAGES.index('streams'):
+                if os.getenv('SYNC_STREAMS', 'true').lower() == 'true':
+                    _publish_progress(run, stage='streams', **progress)
+                    with metrics.timer('sync_stage', stage='streams'):
+                        streams.ingest_streams(garmin, saved_ids, on_progress=lambda: _heartbeat(job))
+                    try:
+                        analytics.analyze_activities(saved_ids)
+                        _heartbeat(job)
+                        zones.update_zones(saved_ids, garmin_client=garmin)
+                        _heartbeat(job)
+                        records.update_records(saved_ids)
+                    except ImportError:
+                        logger.warning("NumPy is not installed, stream analytics skipped")
+                _checkpoint(conn, job, 'wellness')
+                conn.commit()
+            
+            # Daily HRV / resting HR / sleep: only days not stored yet are requested
+            if stage_index <= JOB_STAGES.index('wellness'):
+                _publish_progress(run, stage='wellness', **progress)
+                with metrics.timer('sync_stage', stage='wellness'):
+                    today = datetime.now().date()
+                    try:
+                        wellness.sync_range(garmin, today - timedelta(days=days), today,
+                                            on_progress=lambda: _heartbeat(job))
+                    except Exception as e:
+                        logger.error(f"Error syncing wellness data: {e}")
+                _checkpoint(conn, job, 'rollups')
+                conn.commit()
+        finally:
+            conn.close()
+        
+        # Calculate weekly stats
+        _publish_progress(run, stage='rollups', **progress)
+        with metrics.timer('sync_stage', stage='weekly_stats'):
+            calculate_and_save_weekly_stats()
+        _heartbeat(job)
+        
+        # CTL/ATL/TSB: only days from the oldest synced activity onwards, or
+        # just the days since the last run when nothing was saved
+        since = min((d for d in job['saved_dates'] if d), default=None)
+        training_load.update_load(since or training_load.next_day())
+        _heartbeat(job)
+        
+        # Day/week/month/year rollups behind /api/aggregate, from the same day;
+        # nothing to redo without new activities once they are built
+        if since or not aggregate.rollups_built():
+            aggregate.update_rollups(since)
+        
+        # Log successful sync
+        activities_saved = len(saved_ids)
+        metrics.inc('sync_runs', status='success')
+        _finish_job(job, 'success', details={'days_synced': days, 'metrics': run_metrics.summary()})
+        logger.info(f"Synchronization complete. Saved {activities_saved} activities.")
+        snapshots.refresh_snapshots()
+        _notify_changed(events.ALL_PANELS if activities_saved else ('summary', 'logs'))
+        _publish_progress(run, 'success', stage='done', **progress)
+        
+        # Log retention, vacuum and planner statistics, at most once per MAINTENANCE_INTERVAL_HOURS
+        maintenance.run_if_due()
+        
+        # Re-render the sheet from the freshly ingested data, without Garmin calls
+        if os.getenv('SHEET_SYNC_AFTER_SYNC', 'false').lower() == 'true':
+            try:
+                sheet_sync(source='local')
+            except Exception as e:
+                logger.error(f"Sheet refresh from local data failed: {e}")
+        
+    except Exception as e:
+        logger.error(f"Sync failed: {e}")
+        metrics.inc('sync_runs', status='error')
+        _finish_job(job, 'error', str(e), details={'metrics': run_metrics.summary()})
+        snapshots.refresh_snapshots()
+        _notify_changed(('summary', 'logs'))
+        _publish_progress(run, 'error', stage='done', error=str(e))
+
+def _notify_changed(panels):
+    try:
+        events.bump_generation(panels)
+    except Exception as e:
+        logger.warning(f"Could not publish data change: {e}")
+
+# The backfill cursor lives in sync_state too; like a sync job it is claimed
+# with a heartbeat, so only one process pages through the history at a time
+BACKFILL_KEY = 'backfill'
+
+def active_backfill():
+    """The backfill checkpoint if a live process is running it, else None"""
+    conn = get_db()
+    try:
+        state = get_sync_state(conn, BACKFILL_KEY)
+    finally:
+        conn.close()
+    return state if state and state.get('running') and not _job_is_stale(state) else None
+
+def _claim_backfill(conn, page_size, restart):
+    """Take the backfill checkpoint (new, resumed or stale); None if another run is alive"""
+    conn.execute('BEGIN IMMEDIATE')
+    state = get_sync_state(conn, BACKFILL_KEY)
+    if state and state.get('running') and not _job_is_stale(state):
+        conn.rollback()
+        return None
+    if state and state.get('done') and not restart:
+        conn.rollback()
+        return state
+    # The cursor is an offset into the newest-first list; new activities that
+    # arrive between runs shift it by a few rows, which only re-upserts them
+    if restart or not state:
+        state = {'next_start': 0, 'saved': 0, 'done': False}
+    state.update(page_size=page_size, running=True, heartbeat=time.time())
+    set_sync_state(conn, BACKFILL_KEY, state)
+    conn.commit()
+    return state
+
+def run_backfill(page_size=None, restart=False):
+    """Load the whole Garmin activity history page by page, resuming from the checkpoint
+    
+    Each page is upserted together with the next page cursor in one transaction,
+    so an interrupted backfill continues from the last committed page. A finished
+    backfill is not repeated unless `restart` is set. Returns the checkpoint, or
+    None when another process is running the backfill.
+    """
+    page_size = page_size or int(os.getenv('BACKFILL_PAGE_SIZE', '100'))
+    conn = get_db()
+    try:
+        state = _claim_backfill(conn, page_size, restart)
+    except Exception:
+        conn.close()
+        raise
+    if state is None:
+        logger.info("Backfill already running, not starting another one")
+        conn.close()
+        return None
+    if not state.get('running'):
+        logger.info(f"Backfill already complete ({state['saved']} activities), use restart to run again",
+                    extra={'saved': state['saved']})
+        conn.close()
+        return state
+    logger.info("Backfill starting", extra={'start': state['next_start'], 'page_size': page_size})
+    run = datetime.now().isoformat(timespec='seconds')
+    _publish_progress(run, stage='backfill', saved=state['saved'])
+    
+    try:
+        garmin = connect_to_garmin()
+        for start, page in iter_activity_pages(garmin, page_size, state['next_start']):
+            with metrics.timer('sync_stage', stage='backfill_page'):
+                save_activities_bulk(conn, page)
+                # `state` only advances once the page is committed
+                checkpoint = dict(state, next_start=start + len(page), saved=state['saved'] + len(page),
+                                  heartbeat=time.time())
+                set_sync_state(conn, BACKFILL_KEY, checkpoint)
+                conn.commit()
+                state = checkpoint
+            logger.info("Backfill page saved", extra={
+                'start': start, 'count': len(page), 'saved': state['saved'],
+                'oldest': page[-1].get('startTimeLocal', '')[:10],
+            })
+            _publish_progress(run, stage='backfill', saved=state['saved'],
+                              oldest=page[-1].get('startTimeLocal', '')[:10])
+        
+        state.update(done=True, running=False)
+        set_sync_state(conn, BACKFILL_KEY, state)
+        conn.commit()
+    except Exception as e:
+        logger.error(f"Backfill interrupted at {state['next_start']}: {e}")
+        # Release the claim; the cursor stays for the next run
+        conn.rollback()
+        state['running'] = False
+        set_sync_state(conn, BACKFILL_KEY, state)
+        conn.commit()
+        log_sync('error', state['saved'], str(e), details={'backfill': state})
+        snapshots.refresh_snapshots()
+        _notify_changed(events.ALL_PANELS)
+        _publish_progress(run, 'error', stage='done', saved=state['saved'], error=str(e))
+        return state
+    finally:
+        conn.close()
+    
+    _publish_progress(run, stage='rollups', saved=state['saved'])
+    calculate_and_save_weekly_stats()
+    training_load.update_load()
+    aggregate.update_rollups()
+    log_sync('success', state['saved'], details={'backfill': state})
+    logger.info(f"Backfill complete. Saved {state['saved']} activities.")
+    snapshots.refresh_snapshots()
+    _notify_changed(events.ALL_PANELS)
+    _publish_progress(run, 'success', stage='done', saved=state['saved'])
+    return state
+
+def calculate_and_save_weekly_stats():
+    """Calculate and save weekly statistics"""
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    # Get all activities grouped by week
+    cursor.execute('''
+        SELECT 
+            strftime('%Y-%W', date) as week,
+            type,
+            SUM(distance) as total_distance,
+            SUM(duration) as total_duration,
+            AVG(avg_hr) as avg_hr,
+            COUNT(*) as count
+        FROM activities
+        WHERE date >= date('now', '-84 days')
+        GROUP BY week, type
+    ''')
+    
+    # Organize data by week
+    weeks_data = defaultdict(lambda: {
+        'cycling_km': 0,
+        'cycling_time': 0,
+        'running_km': 0,
+        'running_time': 0,
+        'total_activities': 0
+    })
+    
+    for row in cursor.fetchall():
+        week, activity_type, distance, duration, avg_hr, count = row
+        week_data = weeks_data[week]
+        
+        if 'cycling' in (activity_type or '').lower():
+            week_data['cycling_km'] += (distance or 0) / 1000
+            week_data['cycling_time'] += (duration or 0)
+        elif 'running' in (activity_type or '').lower():
+            week_data['running_km'] += (distance or 0) / 1000
+            week_data['running_time'] += (duration or 0)
+        
+        week_data['total_activities'] += count
+    
+    # Weekly wellness averages from the local daily_wellness store
+    cursor.execute('''
+        SELECT
+            strftime('%Y-%W', date) as week,
+            AVG(hrv_last_night_avg),
+            AVG(resting_hr),
+            AVG(sleep_seconds),
+            AVG(sleep_score)
+        FROM daily_wellness
+        WHERE date >= date('now', '-84 days')
+        GROUP BY week
+    ''')
+    
+    for week, avg_hrv, avg_resting_hr, avg_sleep, avg_sleep_score in cursor.fetchall():
+        week_data = weeks_data[week]
+        week_data['avg_hrv'] = round(avg_hrv, 1) if avg_hrv is not None else None
+        week_data['wellness'] = {
+            'avg_resting_hr': round(avg_resting_hr, 1) if avg_resting_hr is not None else None,
+            'avg_sleep_hours': round(avg_sleep / 3600, 2) if avg_sleep is not None else None,
+            'avg_sleep_score': round(avg_sleep_score, 1) if avg_sleep_score is not None else None,
+        }
+    
+    # Save weekly stats
+    for week, data in weeks_data.items():
+        # Convert week format to dates
+        year, week_num = week.split('-')
+        week_start = datetime.strptime(f'{year}-W{week_num}-1', '%Y-W%W-%w').date()
+        week_end = week_start + timedelta(days=6)
+        
+        cursor.execute('''
+            INSERT OR REPLACE INTO weekly_stats
+            (week_start, week_end, total_cycling_km, total_cycling_time,
+             total_running_km, total_running_time, avg_hrv, total_activities, data, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ''', (
+            week_start,
+            week_end,
+            data['cycling_km'],
+            data['cycling_time'],
+            data['running_km'],
+            data['running_time'],
+            data.get('avg_hrv'),
+            data['total_activities'],
+            json.dumps(data['wellness']) if 'wellness' in data else None
+        ))
+    
+    conn.commit()
+    conn.close()
+
+if __name__ == '__main__':
+    import argparse
+    from logging_config import configure_logging
+    
+    parser = argparse.ArgumentParser(description='Garmin -> SQLite synchronization')
+    parser.add_argument('command', choices=['sync', 'backfill'], nargs='?', default='sync')
+    parser.add_argument('--page-size', type=int, help='activities per Garmin page (backfill)')
+    parser.add_argument('--restart', action='store_true', help='ignore the saved backfill checkpoint')
+    args = parser.parse_args()
+    
+    configure_logging()
+    if args.command == 'backfill':
+        run_backfill(args.page_size, restart=args.restart)
+    else:
+        perform_sync()
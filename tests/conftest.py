@@ -0,0 +1,31 @@
+"""
+Shared fixtures: every test gets its own SQLite file and snapshot directory,
+and offline Garmin data from benchmarks.fixtures (see backends.FakeGarmin).
+"""
+import pytest
+
+import db
+import snapshots
+from backends import FakeGarmin
+from benchmarks.fixtures import write_fixtures
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Fresh schema in a temporary database file"""
+    monkeypatch.setattr(db, 'DB_PATH', str(tmp_path / 'training_data.db'))
+    monkeypatch.setattr(snapshots, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    db.init_db()
+    return db.DB_PATH
+
+
+@pytest.fixture
+def garmin_dir(tmp_path):
+    """Recorded-style Garmin responses: 4 weeks, 20 activities"""
+    garmin_dir, _ = write_fixtures(str(tmp_path / 'fixtures'), weeks=4, activity_count=20)
+    return garmin_dir
+
+
+@pytest.fixture
+def garmin(garmin_dir):
+    return FakeGarmin(garmin_dir)
@@ -0,0 +1,116 @@
+import json
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import aggregate
+from db import get_db
+
+TYPES = ('road_biking', 'running', 'lap_swimming', 'strength_training', 'indoor_cycling', 'trail_running')
+
+
+def _insert_activities(count, start, days, seed=0, first_id=1):
+    rng = random.Random(seed)
+    conn = get_db()
+    conn.executemany('''
+        INSERT INTO activities (id, date, type, name, duration, distance, avg_hr, tss)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            str(first_id + i),
+            (start + timedelta(days=rng.randrange(days))).isoformat(),
+            rng.choice(TYPES),
+            f'Activity {i}',
+            rng.uniform(1200, 10800),
+            rng.choice([None, rng.uniform(1000, 120000)]),
+            rng.choice([None, rng.randint(110, 170)]),
+            rng.choice([None, rng.uniform(20, 200)]),
+        )
+        for i in range(count)
+    ])
+    conn.commit()
+    conn.close()
+
+
+def _fallback(*args, **kwargs):
+    """The same query answered straight from activities"""
+    conn = get_db()
+    value = conn.execute("SELECT value FROM sync_state WHERE key = 'rollups'").fetchone()[0]
+    conn.execute("DELETE FROM sync_state WHERE key = 'rollups'")
+    conn.commit()
+    try:
+        return aggregate.aggregate(*args, **kwargs)
+    finally:
+        conn.execute("INSERT INTO sync_state (key, value) VALUES ('rollups', ?)", (value,))
+        conn.commit()
+        conn.close()
+
+
+QUERIES = [
+    (['year'], None, {'since': '2024-01-01'}),
+    (['year', 'sport'], None, {'since': '2024-01-01'}),
+    (['month', 'sport'], ['distance', 'duration'], {'since': '2025-03-17', 'until': '2026-02-03'}),
+    (['week'], ['tss', 'hr'], {'limit': 20, 'compare': True}),
+    (['day'], None, {'limit': 60, 'sport': 'running'}),
+    (['sport'], None, {'since': '2025-06-01', 'until': '2025-09-30'}),
+    ([], None, {}),
+]
+
+
+@pytest.fixture
+def history(database):
+    _insert_activities(400, date.today() - timedelta(days=700), 700)
+
+
+@pytest.mark.parametrize('group_by,metric_names,options', QUERIES)
+def test_rollup_matches_fallback(history, group_by, metric_names, options):
+    aggregate.update_rollups()
+    from_rollup = aggregate.aggregate(group_by, metric_names, **options)
+    from_activities = _fallback(group_by, metric_names, **options)
+    assert from_rollup['source'] == 'rollup'
+    assert from_activities['source'] == 'activities'
+    assert from_rollup['rows'] == from_activities['rows']
+    assert from_rollup['rows']
+
+
+def test_first_incremental_update_builds_everything(history):
+    # A pre-existing database: the first sync only knows about recent days
+    aggregate.update_rollups(date.today() - timedelta(days=3))
+    rows = aggregate.aggregate(['year'], since='2000-01-01')
+    assert rows['source'] == 'rollup'
+    assert rows['rows'] == _fallback(['year'], since='2000-01-01')['rows']
+    assert sum(r['activities'] for r in rows['rows']) == 400
+
+
+def test_partial_build_state_from_older_versions_is_not_trusted(history):
+    conn = get_db()
+    conn.execute("INSERT INTO sync_state (key, value) VALUES ('rollups', ?)", (json.dumps({'since': '2026-10-15'}),))
+    conn.commit()
+    conn.close()
+    assert aggregate.aggregate(['year'])['source'] == 'activities'
+
+
+def test_incremental_update_equals_full_rebuild(history):
+    aggregate.update_rollups()
+    recent = date.today() - timedelta(days=40)
+    _insert_activities(30, recent, 40, seed=1, first_id=1000)
+    aggregate.update_rollups(recent)
+
+    conn = get_db()
+    incremental = conn.execute('SELECT * FROM activity_rollups ORDER BY period, bucket, sport').fetchall()
+    conn.close()
+    aggregate.update_rollups()
+    conn = get_db()
+    full = conn.execute('SELECT * FROM activity_rollups ORDER BY period, bucket, sport').fetchall()
+    conn.close()
+    assert incremental == full
+
+
+def test_invalid_request():
+    with pytest.raises(ValueError):
+        aggregate.parse_request(['hour'])
+    with pytest.raises(ValueError):
+        aggregate.parse_request(['week', 'month'])
+    with pytest.raises(ValueError):
+        aggregate.parse_request(['week'], ['watts'])
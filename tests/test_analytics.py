@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+import analytics
+import streams
+import sync
+from db import get_db
+
+
+def _views(**channels):
+    return {name: np.asarray(values, dtype=np.float32).tobytes() for name, values in channels.items()}
+
+
+def _stored_activities(garmin):
+    conn = get_db()
+    sync.save_activities_bulk(conn, garmin.get_activities(0, 100))
+    conn.commit()
+    conn.close()
+    streams.ingest_streams(garmin)
+
+
+def test_constant_power():
+    result = analytics.compute_activity_metrics(_views(power=[200.0] * 3600), ftp=250)
+    assert result['duration_s'] == 3600
+    assert result['avg_power'] == 200.0
+    assert result['normalized_power'] == 200.0
+    assert result['intensity_factor'] == 0.8
+    assert result['tss'] == 64.0
+    assert result['power_curve'][3600] == 200.0
+    assert 7200 not in result['power_curve']
+
+
+def test_normalized_power_matches_definition():
+    power = np.random.default_rng(0).uniform(0, 400, 1800)
+    rolled = [power[i:i + 30].mean() for i in range(len(power) - 29)]
+    expected = np.mean(np.asarray(rolled) ** 4) ** 0.25
+    assert analytics.normalized_power(power) == pytest.approx(expected)
+    # Variable power normalizes above the average
+    assert analytics.normalized_power(power) > power.mean()
+    assert analytics.normalized_power(power[:29]) is None
+
+
+def test_mean_max_curve_matches_brute_force():
+    values = np.random.default_rng(1).uniform(50, 500, 700)
+    curve = analytics.mean_max_curve(values)
+    assert sorted(curve) == [1, 5, 10, 30, 60, 120, 300, 600]
+    for duration, best in curve.items():
+        expected = max(values[i:i + duration].mean() for i in range(len(values) - duration + 1))
+        assert best == round(expected, 2)
+
+
+def test_resample_fills_gaps():
+    time_s = np.asarray([0, 1, 4, 5], dtype=np.float32).tobytes()
+    power = np.asarray([100, 100, 400, float('nan')], dtype=np.float32).tobytes()
+    assert analytics.resample_1hz(time_s, power).tolist() == [100.0, 100.0, 200.0, 300.0, 400.0]
+
+
+def test_hr_tss():
+    # One hour at LTHR scores 100
+    assert analytics.hr_tss(np.full(3600, 165.0), 165) == pytest.approx(100.0)
+    assert analytics.hr_tss(np.zeros(10), 165) is None
+
+
+def test_analyze_activities(database, garmin):
+    _stored_activities(garmin)
+    analyzed = analytics.analyze_activities(ftp=250, lthr=165)
+
+    conn = get_db()
+    ids = [aid for (aid,) in conn.execute('SELECT activity_id FROM activity_streams WHERE time IS NOT NULL')]
+    conn.close()
+    assert analyzed == len(ids) > 0
+    assert any(analytics.get_activity_metrics(a)['normalized_power'] for a in ids)
+    for activity_id in ids:
+        stored = analytics.get_activity_metrics(activity_id)
+        expected = analytics.compute_activity_metrics(streams.load_streams(activity_id), 250, 165)
+        assert stored['normalized_power'] == expected.get('normalized_power')
+        assert stored['tss'] == expected.get('tss')
+        assert stored['power_curve'] == expected.get('power_curve')
+
+
+def test_missing_thresholds_are_logged_once(database, caplog, monkeypatch):
+    monkeypatch.delenv('FTP', raising=False)
+    monkeypatch.delenv('LTHR', raising=False)
+    monkeypatch.setattr(analytics, '_missing_warned', set())
+    analytics.analyze_activities([])
+    analytics.analyze_activities([], lthr=165)
+    warnings = [r.getMessage() for r in caplog.records if r.levelname == 'WARNING']
+    assert len(warnings) == 2
+    assert warnings[0].startswith('FTP is not set')
+    assert warnings[1].startswith('LTHR is not set')
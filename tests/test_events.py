@@ -0,0 +1,24 @@
+import events
+
+
+def test_streams_end_and_free_their_slot(database, monkeypatch):
+    monkeypatch.setattr(events, 'POLL_SECONDS', 0.01)
+    messages = list(events.stream(duration=0.05))
+    assert messages[0] == f'retry: {events.RETRY_MS}\n\n'
+    assert any('event: changed' in m for m in messages)
+    assert events._slots.acquire(blocking=False)
+    events._slots.release()
+
+
+def test_busy_worker_turns_streams_away(database, monkeypatch):
+    monkeypatch.setattr(events, '_slots', events.threading.BoundedSemaphore(1))
+    first = events.stream(duration=60)
+    assert next(first) == f'retry: {events.RETRY_MS}\n\n'
+
+    assert list(events.stream(duration=60)) == [f'retry: {events.BUSY_RETRY_MS}\n\n']
+
+    # A closed (disconnected) stream gives its slot back
+    first.close()
+    second = events.stream(duration=60)
+    assert next(second) == f'retry: {events.RETRY_MS}\n\n'
+    second.close()
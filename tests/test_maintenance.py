@@ -0,0 +1,43 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import maintenance
+from db import get_db
+
+
+def _log(conn, when, status='success', synced=1):
+    conn.execute(
+        'INSERT INTO sync_logs (sync_date, status, activities_synced) VALUES (?, ?, ?)',
+        (when.strftime('%Y-%m-%d %H:%M:%S'), status, synced),
+    )
+
+
+def test_prune_keeps_rows_after_the_cutoff(database, monkeypatch):
+    now = datetime(2026, 3, 31, 12, 0, tzinfo=timezone.utc)
+    monkeypatch.setattr(maintenance, '_utc_cutoff', lambda days: (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S'))
+    cutoff_day = now - timedelta(days=30)
+    conn = get_db()
+    _log(conn, cutoff_day.replace(hour=6))
+    _log(conn, cutoff_day.replace(hour=9), 'error', 0)
+    _log(conn, cutoff_day.replace(hour=18), 'error', 0)     # newer than the cutoff
+    _log(conn, cutoff_day - timedelta(days=1))
+    _log(conn, cutoff_day - timedelta(days=1, hours=-2))
+    _log(conn, now - timedelta(days=400))                   # past retention
+    conn.commit()
+
+    result = maintenance.prune_sync_logs(conn, detail_days=30, retention_days=365)
+    conn.commit()
+    rows = conn.execute('SELECT sync_date, status, details FROM sync_logs ORDER BY sync_date').fetchall()
+    conn.close()
+
+    assert result == {'deleted': 1, 'collapsed': 2, 'days': 2}
+    assert len(rows) == 3
+    assert json.loads(rows[0][2]) == {'runs': 2, 'errors': 0}
+    assert json.loads(rows[1][2]) == {'runs': 2, 'errors': 1}
+    # The 18:00 row is inside the detail window and untouched
+    assert rows[2][0].endswith('18:00:00') and rows[2][1] == 'error' and rows[2][2] is None
+
+    # A second pass counts the collapsed rows instead of re-adding them
+    conn = get_db()
+    assert maintenance.prune_sync_logs(conn, detail_days=30, retention_days=365)['collapsed'] == 0
+    conn.close()
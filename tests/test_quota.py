@@ -0,0 +1,60 @@
+import time
+
+import pytest
+
+import quota
+from backends import FakeSpreadsheet
+from db import get_db
+
+
+def test_available_does_not_take_the_write_lock(database):
+    bucket = quota.TokenBucket('test_reads', 60, 60, quota.READ_RETRY_STATUSES)
+    bucket.acquire()
+
+    # Another process holding the write lock must not stall a peek
+    writer = get_db()
+    writer.isolation_level = None
+    writer.execute('BEGIN IMMEDIATE')
+    try:
+        started = time.perf_counter()
+        assert bucket.available()
+        assert time.perf_counter() - started < 1.0
+    finally:
+        writer.execute('ROLLBACK')
+        writer.close()
+
+
+def test_write_queue_keeps_same_titled_sheets_apart(database, monkeypatch):
+    bucket = quota.TokenBucket('test_writes', 60, 60, quota.WRITE_RETRY_STATUSES)
+    monkeypatch.setattr(bucket, 'available', lambda: False)
+    queue = quota.WriteQueue(bucket)
+    first = FakeSpreadsheet(worksheets={'ВЕЛ БЕГ': []}).worksheet('ВЕЛ БЕГ')
+    second = FakeSpreadsheet(worksheets={'ВЕЛ БЕГ': []}).worksheet('ВЕЛ БЕГ')
+
+    queue.submit(first, [{'range': 'A1', 'values': [[1]]}])
+    queue.submit(second, [{'range': 'A1', 'values': [[2]]}])
+    queue.submit(first, [{'range': 'B1', 'values': [[3]]}])
+    assert len(queue) == 3
+
+    queue.drain()
+    assert first.row_values(1) == ['1', '3']
+    assert second.row_values(1) == ['2']
+    assert first.spreadsheet.calls['batch_update'] == 1
+    assert second.spreadsheet.calls['batch_update'] == 1
+
+
+def test_sheet_sync_drops_writes_left_by_an_earlier_run(database, monkeypatch):
+    import main
+
+    monkeypatch.setattr(quota.WRITES.bucket, 'available', lambda: False)
+    worksheet = FakeSpreadsheet(worksheets={'ВЕЛ БЕГ': []}).worksheet('ВЕЛ БЕГ')
+    quota.WRITES.submit(worksheet, [{'range': 'A1', 'values': [[1]]}])
+    assert len(quota.WRITES) == 1
+
+    def fail(source):
+        raise RuntimeError('Garmin unavailable')
+    monkeypatch.setattr(main, 'connect_activity_source', fail)
+    with pytest.raises(RuntimeError):
+        main.main()
+    assert len(quota.WRITES) == 0
+    assert worksheet.spreadsheet.calls['batch_update'] == 0
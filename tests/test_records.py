@@ -0,0 +1,76 @@
+import numpy as np
+
+import records
+import streams
+import sync
+from db import get_db
+
+
+def _brute_force_power(power, duration):
+    means = [power[i:i + duration].mean() for i in range(len(power) - duration + 1)]
+    start = int(np.argmax(means))
+    return round(float(means[start]), 1), start
+
+
+def _brute_force_time(speed, distance):
+    covered = np.concatenate(([0.0], np.cumsum(speed)))
+    best = None
+    for start in range(len(covered)):
+        reached = np.nonzero(covered[start:] - covered[start] >= distance)[0]
+        if len(reached) and (best is None or reached[0] < best[0]):
+            best = (int(reached[0]), start)
+    return best
+
+
+def test_best_power_matches_brute_force():
+    power = np.random.default_rng(0).uniform(0, 450, 1500)
+    best = records.best_power(power)
+    assert sorted(best) == [300, 1200]
+    for duration, value in best.items():
+        assert value == _brute_force_power(power, duration)
+
+
+def test_best_times_match_brute_force():
+    # Whole metres per second keep the cumulative distance exact
+    speed = np.random.default_rng(1).integers(2, 6, 3000).astype(np.float64)
+    best = records.best_times(speed)
+    assert sorted(best) == [5000, 10000]
+    for distance, value in best.items():
+        assert value == _brute_force_time(speed, distance)
+
+
+def test_save_effort_keeps_the_better_value(database):
+    conn = get_db()
+    assert records._save_effort(conn, 'cycling', 'power', 1200, 280.0, 1, '2026-01-01', 0)
+    assert not records._save_effort(conn, 'cycling', 'power', 1200, 275.0, 2, '2026-02-01', 0)
+    assert records._save_effort(conn, 'cycling', 'power', 1200, 290.0, 3, '2026-03-01', 10)
+    assert records._save_effort(conn, 'running', 'distance', 5000, 1300, 4, '2026-01-01', 0)
+    assert not records._save_effort(conn, 'running', 'distance', 5000, 1320, 5, '2026-02-01', 0)
+    assert records._save_effort(conn, 'running', 'distance', 5000, 1250, 6, '2026-03-01', 0)
+    conn.commit()
+    conn.close()
+
+    stored = records.get_records()
+    assert stored['cycling']['power'][1200]['value'] == 290.0
+    assert stored['cycling']['power'][1200]['activity_id'] == '3'
+    assert stored['running']['distance'][5000]['value'] == 1250
+    assert stored['running']['distance'][5000]['activity_id'] == '6'
+
+
+def test_incremental_records_equal_rebuild(database, garmin):
+    activities = garmin.get_activities(0, 100)
+    ids = [a['activityId'] for a in activities]
+    conn = get_db()
+    sync.save_activities_bulk(conn, activities)
+    conn.commit()
+    conn.close()
+    streams.ingest_streams(garmin)
+
+    # One activity at a time, as each sync adds them
+    for activity_id in reversed(ids):
+        records.update_records([activity_id])
+    incremental = records.get_records()
+
+    records.rebuild_records()
+    assert records.get_records() == incremental
+    assert incremental
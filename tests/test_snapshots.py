@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+
+import events
+import snapshots
+
+
+def test_snapshot_files_match_builders(database):
+    manifest = snapshots.build_snapshots()
+    assert set(manifest['files']) == set(snapshots.BUILDERS)
+    for name, filename in manifest['files'].items():
+        with open(os.path.join(snapshots.SNAPSHOT_DIR, filename), encoding='utf-8') as f:
+            assert json.load(f) == json.loads(json.dumps(snapshots.BUILDERS[name](), default=str))
+
+
+def test_manifest_is_rebuilt_on_a_new_day(database):
+    snapshots.build_snapshots()
+    path = os.path.join(snapshots.SNAPSHOT_DIR, snapshots.MANIFEST)
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    manifest['day'] = '2000-01-01'
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    generation = events.current_generation()
+
+    current = snapshots.current_manifest()
+    assert current['day'] != '2000-01-01'
+    assert snapshots.read_manifest()['day'] == current['day']
+    # Open dashboards are told to reload the date-relative panels
+    assert events.current_generation() > generation
+    assert snapshots.current_manifest() == current
+
+
+def test_concurrent_builds_leave_a_complete_snapshot(database):
+    errors = []
+
+    def build():
+        try:
+            snapshots.build_snapshots()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=build) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    manifest = snapshots.read_manifest()
+    for filename in manifest['files'].values():
+        assert os.path.exists(os.path.join(snapshots.SNAPSHOT_DIR, filename))
+    assert not [f for f in os.listdir(snapshots.SNAPSHOT_DIR) if f.endswith('.tmp')]
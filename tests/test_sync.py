@@ -0,0 +1,248 @@
+from unittest import mock
+
+import pytest
+
+import aggregate
+import sync
+from backends import FakeGarmin
+from db import get_db
+
+
+class Killed(BaseException):
+    """The worker dying mid-stage: not caught by the sync's error handling"""
+
+
+class DyingGarmin(FakeGarmin):
+    """Raises `error` (by default kills the sync) on the `after`-th call of one method"""
+
+    def __init__(self, *args, method=None, after=1, error=Killed, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.method, self.after, self.error = method, after, error
+
+    def _call(self, name):
+        super()._call(name)
+        if name == self.method and self.calls[name] == self.after:
+            raise self.error(name)
+
+
+class AgingGarmin(FakeGarmin):
+    """Checks the job is alive on every slow call, then ages its heartbeat past the limit"""
+
+    SLOW = ('get_activity_details', 'get_hrv_data')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stale = []
+
+    def _call(self, name):
+        super()._call(name)
+        if name in self.SLOW:
+            self.stale.append(sync.interrupted_job() is not None)
+            conn = get_db()
+            job = sync.get_sync_state(conn, sync.JOB_KEY)
+            job['heartbeat'] -= sync.JOB_STALE_SECONDS + 1
+            sync.set_sync_state(conn, sync.JOB_KEY, job)
+            conn.commit()
+            conn.close()
+
+
+def _run(garmin, job=sync.perform_sync, **kwargs):
+    with mock.patch.object(sync, 'connect_to_garmin', return_value=garmin), \
+            mock.patch.object(sync, 'sheet_sync'), \
+            mock.patch.object(sync.maintenance, 'run_if_due'):
+        return job(**kwargs)
+
+
+def _logs():
+    conn = get_db()
+    try:
+        return conn.execute('SELECT status, activities_synced FROM sync_logs').fetchall()
+    finally:
+        conn.close()
+
+
+def _count(table):
+    conn = get_db()
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_sync_stores_everything(database, garmin):
+    _run(garmin)
+    assert _logs() == [('success', 20)]
+    assert _count('activities') == 20
+    assert _count('activity_streams') == 20
+    assert sync.active_job() is None
+
+
+@pytest.mark.parametrize('method,stage', [
+    ('get_activity', 'details'),
+    ('get_activity_details', 'streams'),
+    ('get_hrv_data', 'wellness'),
+])
+def test_killed_sync_resumes(database, garmin_dir, method, stage):
+    dying = DyingGarmin(garmin_dir, method=method, after=5)
+    with pytest.raises(Killed):
+        _run(dying)
+    job = sync.active_job()
+    assert job['stage'] == stage
+    assert _logs() == [('running', len(job['saved_ids']))]
+
+    # A live job is left alone
+    garmin = FakeGarmin(garmin_dir)
+    _run(garmin)
+    assert sync.active_job() is not None
+    assert not garmin.calls
+
+    with mock.patch.object(sync, 'JOB_STALE_SECONDS', -1):
+        assert sync.interrupted_job() is not None
+        _run(garmin)
+
+    assert sync.active_job() is None
+    assert _logs() == [('success', 20)]
+    assert _count('activities') == 20
+    assert _count('activity_streams') == 20
+    # Finished stages are not repeated
+    assert garmin.calls['get_activity'] == (20 - 4 if stage == 'details' else 0)
+    if stage == 'wellness':
+        assert garmin.calls['get_activity_details'] == 0
+
+
+def test_slow_stages_keep_the_job_alive(database, garmin_dir):
+    garmin = AgingGarmin(garmin_dir)
+    _run(garmin)
+    assert garmin.calls['get_activity_details'] == 20
+    assert garmin.calls['get_hrv_data'] == 15
+    assert not any(garmin.stale)
+    assert _logs() == [('success', 20)]
+
+
+def test_backfill_resumes_from_the_last_page(database, garmin_dir):
+    failing = DyingGarmin(garmin_dir, method='get_activities', after=3, error=RuntimeError)
+    state = _run(failing, sync.run_backfill, page_size=6)
+    assert (state['next_start'], state['saved'], state['done'], state['running']) == (12, 12, False, False)
+    assert _count('activities') == 12
+    assert _logs() == [('error', 12)]
+
+    garmin = FakeGarmin(garmin_dir)
+    state = _run(garmin, sync.run_backfill, page_size=6)
+    assert (state['next_start'], state['saved'], state['done'], state['running']) == (20, 20, True, False)
+    # Pages at 12 and 18 only
+    assert garmin.calls['get_activities'] == 2
+    assert _count('activities') == 20
+    assert _logs()[-1] == ('success', 20)
+
+    # A finished backfill runs again only on restart
+    assert _run(garmin, sync.run_backfill, page_size=6)['done']
+    assert garmin.calls['get_activities'] == 2
+    _run(garmin, sync.run_backfill, page_size=6, restart=True)
+    assert garmin.calls['get_activities'] == 6
+
+
+def test_only_one_backfill_runs(database, garmin_dir):
+    seen = []
+
+    class SecondBackfill(FakeGarmin):
+        """Starts another backfill while the first one is on its second page"""
+        def get_activities(self, start=0, limit=20, activitytype=None):
+            if start == 6:
+                seen.append(sync.active_backfill() is not None)
+                seen.append(sync.run_backfill(page_size=6))
+            return super().get_activities(start, limit, activitytype)
+
+    state = _run(SecondBackfill(garmin_dir), sync.run_backfill, page_size=6)
+    assert seen == [True, None]
+    assert (state['saved'], state['done']) == (20, True)
+    assert sync.active_backfill() is None
+
+
+def test_stale_backfill_is_taken_over(database, garmin_dir):
+    with pytest.raises(Killed):
+        _run(DyingGarmin(garmin_dir, method='get_activities', after=2), sync.run_backfill, page_size=6)
+    assert sync.active_backfill() is not None
+    garmin = FakeGarmin(garmin_dir)
+    assert _run(garmin, sync.run_backfill, page_size=6) is None
+    assert not garmin.calls
+
+    with mock.patch.object(sync, 'JOB_STALE_SECONDS', -1):
+        state = _run(garmin, sync.run_backfill, page_size=6)
+    assert (state['saved'], state['done']) == (20, True)
+    assert garmin.calls['get_activities'] == 3
+
+
+def test_backfill_keeps_synced_details(database, garmin):
+    def stored():
+        conn = get_db()
+        try:
+            cursor = conn.execute('SELECT * FROM activities ORDER BY id')
+            columns = [d[0] for d in cursor.description]
+            return [{k: v for k, v in zip(columns, row) if k != 'updated_at'} for row in cursor.fetchall()]
+        finally:
+            conn.close()
+
+    _run(garmin)
+    synced = stored()
+    _run(garmin, sync.run_backfill, restart=True)
+    assert stored() == synced
+
+
+def test_sync_without_new_activities_keeps_earlier_load(database, garmin):
+    _run(garmin)
+    conn = get_db()
+    first = conn.execute('SELECT MIN(date) FROM training_load').fetchone()[0]
+    conn.execute('UPDATE training_load SET ctl = -1 WHERE date = ?', (first,))
+    conn.execute("DELETE FROM training_load WHERE date = date('now', 'localtime')")
+    conn.commit()
+    conn.close()
+
+    _run(FakeGarmin(activities=[]))
+    conn = get_db()
+    assert conn.execute('SELECT ctl FROM training_load WHERE date = ?', (first,)).fetchone()[0] == -1
+    # The days since the last run are still added
+    assert conn.execute("SELECT COUNT(*) FROM training_load WHERE date = date('now', 'localtime')").fetchone()[0] == 1
+    conn.close()
+    assert _logs()[-1] == ('success', 0)
+
+
+def test_sync_without_new_activities_keeps_rollups(database, garmin):
+    _run(garmin)
+    conn = get_db()
+    conn.execute("UPDATE activity_rollups SET activities = -1 WHERE period = 'year'")
+    conn.commit()
+    conn.close()
+
+    _run(FakeGarmin(activities=[]))
+    conn = get_db()
+    assert {n for (n,) in conn.execute("SELECT activities FROM activity_rollups WHERE period = 'year'")} == {-1}
+    conn.close()
+
+
+def test_first_sync_without_activities_builds_rollups(database):
+    _run(FakeGarmin(activities=[]))
+    assert aggregate.rollups_built()
+
+
+def test_resync_keeps_computed_metrics(database):
+    activity = {'activityId': 7, 'startTimeLocal': '2026-10-01 07:00:00',
+                'activityType': {'typeKey': 'road_biking'}, 'activityName': 'Ride', 'duration': 3600.0}
+    sync.save_activity_to_db(activity)
+    conn = get_db()
+    # As analytics.analyze_activities() fills them in from streams
+    conn.execute("UPDATE activities SET normalized_power = 210, tss = 70 WHERE id = '7'")
+    conn.commit()
+    conn.close()
+
+    def stored():
+        conn = get_db()
+        try:
+            return conn.execute("SELECT normalized_power, tss, duration FROM activities WHERE id = '7'").fetchone()
+        finally:
+            conn.close()
+
+    sync.save_activity_to_db(dict(activity, duration=3700.0))
+    assert stored() == (210, 70, 3700.0)
+    # Garmin's own values still win
+    sync.save_activity_to_db(dict(activity, normalizedPower=205, trainingStressScore=68))
+    assert stored() == (205, 68, 3600.0)
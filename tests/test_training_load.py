@@ -0,0 +1,86 @@
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import training_load
+from db import get_db
+
+
+def _add(activities, first_id=1):
+    conn = get_db()
+    conn.executemany(
+        'INSERT INTO activities (id, date, type, tss) VALUES (?, ?, ?, ?)',
+        [(str(first_id + i), day.isoformat(), 'running', tss) for i, (day, tss) in enumerate(activities)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _series():
+    conn = get_db()
+    try:
+        return conn.execute('SELECT date, tss, ctl, atl, tsb FROM training_load ORDER BY date').fetchall()
+    finally:
+        conn.close()
+
+
+def _random_activities(start, days, count, seed):
+    rng = random.Random(seed)
+    return [(start + timedelta(days=rng.randrange(days)), rng.choice([None, rng.uniform(20, 180)]))
+            for _ in range(count)]
+
+
+def test_single_activity(database):
+    today = date.today()
+    _add([(today - timedelta(days=2), 84.0)])
+    assert training_load.update_load() == 3
+    (day, tss, ctl, atl, tsb), after, last = _series()
+    assert (day, tss) == ((today - timedelta(days=2)).isoformat(), 84.0)
+    assert (ctl, atl, tsb) == (pytest.approx(2.0), pytest.approx(12.0), 0.0)
+    # Form on the morning after is yesterday's fitness minus fatigue
+    assert after[4] == pytest.approx(2.0 - 12.0)
+    assert after[2] == pytest.approx(2.0 * 41 / 42)
+    assert last[0] == today.isoformat()
+
+
+def test_incremental_update_equals_full_recompute(database):
+    start = date.today() - timedelta(days=200)
+    _add(_random_activities(start, 180, 120, seed=0))
+    training_load.update_load()
+
+    # New and late-arriving activities in the last weeks
+    recent = date.today() - timedelta(days=25)
+    _add(_random_activities(recent, 25, 15, seed=1), first_id=1000)
+    training_load.update_load(recent)
+    incremental = _series()
+
+    training_load.update_load()
+    full = _series()
+    assert len(incremental) == len(full)
+    for a, b in zip(incremental, full):
+        assert a[:2] == b[:2]
+        assert a[2:] == pytest.approx(b[2:])
+
+
+def test_missing_seed_recomputes_from_first_activity(database):
+    start = date.today() - timedelta(days=60)
+    _add(_random_activities(start, 60, 40, seed=2))
+    # Nothing stored yet: a partial update must not start from zero load
+    training_load.update_load(date.today() - timedelta(days=10))
+    partial = _series()
+    training_load.update_load()
+    assert partial == _series()
+    assert partial[0][0] == min(d for d, _ in _random_activities(start, 60, 40, seed=2)).isoformat()
+
+
+def test_no_activities(database):
+    assert training_load.update_load() == 0
+    assert _series() == []
+
+
+def test_next_day(database):
+    assert training_load.next_day() == date.today()
+    _add([(date.today() - timedelta(days=30), 50.0)])
+    training_load.update_load(until=date.today() - timedelta(days=3))
+    assert training_load.next_day() == date.today() - timedelta(days=2)
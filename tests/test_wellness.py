@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+import wellness
+from backends import FakeGarmin
+
+
+class FlakyGarmin(FakeGarmin):
+    """HRV requests fail with a rate limit until `failures` runs out"""
+
+    def __init__(self, *args, failures=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.failures = failures
+
+    def get_hrv_data(self, cdate):
+        if self.failures:
+            self.failures -= 1
+            self._call('get_hrv_data')
+            raise RuntimeError('429 Too Many Requests')
+        return super().get_hrv_data(cdate)
+
+
+def test_failed_day_is_not_cached(database):
+    day = date.today() - timedelta(days=3)
+    garmin = FlakyGarmin(hrv={day.isoformat(): {'hrvSummary': {'lastNightAvg': 61}}})
+
+    first = wellness.ensure_days(garmin, [day])
+    assert first[day]['hrv_last_night_avg'] is None
+    assert garmin.calls['get_hrv_data'] == 1
+
+    # The failed day is requested again and stored once both parts succeed
+    second = wellness.ensure_days(garmin, [day])
+    assert second[day]['hrv_last_night_avg'] == 61
+    assert garmin.calls['get_hrv_data'] == 2
+
+    wellness.ensure_days(garmin, [day])
+    assert garmin.calls['get_hrv_data'] == 2
+    assert garmin.calls['get_sleep_data'] == 2
+
+
+def test_past_days_are_fetched_once(database):
+    garmin = FakeGarmin()
+    start = date.today() - timedelta(days=6)
+    wellness.sync_range(garmin, start, date.today())
+    assert garmin.calls['get_hrv_data'] == 7
+
+    # Only today is requested again
+    wellness.sync_range(garmin, start, date.today())
+    assert garmin.calls['get_hrv_data'] == 8
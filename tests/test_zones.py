@@ -0,0 +1,49 @@
+import json
+
+import streams
+import sync
+import zones
+from db import get_db
+
+
+def _stored_activities(garmin):
+    conn = get_db()
+    sync.save_activities_bulk(conn, garmin.get_activities(0, 100))
+    conn.commit()
+    conn.close()
+    streams.ingest_streams(garmin)
+
+
+def test_histogram():
+    import numpy as np
+    values = np.asarray([100, 150, 150, 200, 250, float('nan')])
+    assert zones.histogram(values, [150, 200]) == [1, 2, 2]
+
+
+def test_season_boundaries_are_the_binning_edges(database, garmin, monkeypatch):
+    monkeypatch.setenv('LTHR', '165')
+    monkeypatch.delenv('HR_ZONES', raising=False)
+    _stored_activities(garmin)
+    assert zones.update_zones() > 0
+
+    season = zones.season_zones('hr')
+    assert season['status'] == 'ok'
+    assert season['boundaries'] == [round(v * 165, 1) for v in (0.81, 0.90, 0.94, 1.00, 1.03, 1.06)]
+    conn = get_db()
+    stored = {b for (b,) in conn.execute("SELECT boundaries FROM activity_zones WHERE kind = 'hr'")}
+    conn.close()
+    assert [json.loads(b) for b in stored] == [season['boundaries']]
+    assert len(season['zones']) == len(season['boundaries']) + 1
+
+
+def test_relative_zones_without_threshold(database, monkeypatch):
+    monkeypatch.delenv('FTP', raising=False)
+    monkeypatch.delenv('POWER_ZONES', raising=False)
+    season = zones.season_zones('power')
+    assert season['status'] == 'thresholds_not_configured'
+    assert season['boundaries'] is None
+    assert season['zones'] == []
+
+    monkeypatch.setenv('POWER_ZONES', '150,200,250')
+    season = zones.season_zones('power')
+    assert (season['status'], season['boundaries']) == ('ok', [150.0, 200.0, 250.0])
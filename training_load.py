@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Daily training load (performance management chart): CTL, ATL and TSB.
+
+Daily TSS is the sum of `activities.tss` for the day (Garmin's value, or
+the one derived from streams by analytics.py). Fitness and fatigue are
+exponentially weighted averages of it:
+
+    CTL_d = CTL_{d-1} + (TSS_d - CTL_{d-1}) / 42    (fitness)
+    ATL_d = ATL_{d-1} + (TSS_d - ATL_{d-1}) / 7     (fatigue)
+    TSB_d = CTL_{d-1} - ATL_{d-1}                   (form on the morning of day d)
+
+Each day depends only on the previous one, so `update_load(since)` seeds
+from the stored row before `since` and rewrites only the days from `since`
+up to today.
+
+    python training_load.py [--since 2024-01-01]    # recompute (everything without --since)
+"""
+import os
+import logging
+from datetime import date, datetime, timedelta
+
+import metrics
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+CTL_DAYS = int(os.getenv('CTL_DAYS', '42'))
+ATL_DAYS = int(os.getenv('ATL_DAYS', '7'))
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def update_load(since=None, until=None, conn=None):
+    """Recompute the load series from `since` (earliest activity if None) through `until` (today)
+
+    Returns the number of days written.
+    """
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        with metrics.timer('sync_stage', stage='training_load'):
+            first = conn.execute('SELECT MIN(date) FROM activities').fetchone()[0]
+            if first is None:
+                return 0
+            first = _as_date(first)
+            since = max(_as_date(since), first) if since else first
+            until = _as_date(until) if until else date.today()
+
+            seed = conn.execute(
+                'SELECT ctl, atl FROM training_load WHERE date = ?', ((since - timedelta(days=1)).isoformat(),)
+            ).fetchone()
+            if seed is None and since > first:
+                # No stored history before `since`: start from the first activity instead
+                since = first
+            ctl, atl = seed if seed else (0.0, 0.0)
+
+            daily_tss = dict(conn.execute('''
+                SELECT date, SUM(COALESCE(tss, 0)) FROM activities
+                WHERE date >= ? AND date <= ?
+                GROUP BY date
+            ''', (since.isoformat(), until.isoformat())).fetchall())
+
+            rows = []
+            day = since
+            while day <= until:
+                tss = daily_tss.get(day.isoformat(), 0.0) or 0.0
+                tsb = ctl - atl
+                ctl += (tss - ctl) / CTL_DAYS
+                atl += (tss - atl) / ATL_DAYS
+                rows.append((day.isoformat(), tss, ctl, atl, tsb))
+                day += timedelta(days=1)
+
+            # Stored unrounded: later runs seed from these values
+            conn.execute('DELETE FROM training_load WHERE date >= ?', (since.isoformat(),))
+            conn.executemany(
+                'INSERT INTO training_load (date, tss, ctl, atl, tsb) VALUES (?, ?, ?, ?, ?)', rows
+            )
+            conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+    logger.info(f"Training load updated from {since}: {len(rows)} days", extra={'since': since.isoformat(), 'days': len(rows)})
+    return len(rows)
+
+
+def next_day(conn=None):
+    """First day the stored series does not cover: the day after its last row, today if empty"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        last = conn.execute('SELECT MAX(date) FROM training_load').fetchone()[0]
+    finally:
+        if own_conn:
+            conn.close()
+    return _as_date(last) + timedelta(days=1) if last else date.today()
+
+
+def get_load(days=None, conn=None):
+    """Stored series, oldest first: the last `days` days, or everything if None"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        query = 'SELECT date, tss, ROUND(ctl, 1) AS ctl, ROUND(atl, 1) AS atl, ROUND(tsb, 1) AS tsb FROM training_load'
+        params = ()
+        if days:
+            query += ' WHERE date > ?'
+            params = ((date.today() - timedelta(days=days)).isoformat(),)
+        cursor = conn.execute(query + ' ORDER BY date', params)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    finally:
+        if own_conn:
+            conn.close()
+
+
+if __name__ == '__main__':
+    import argparse
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='Recompute the CTL/ATL/TSB series')
+    parser.add_argument('--since', help='first day to recompute (YYYY-MM-DD)')
+    args = parser.parse_args()
+
+    configure_logging()
+    update_load(args.since)
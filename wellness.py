@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Daily wellness store: HRV, resting HR and sleep per calendar day.
+
+Garmin serves these per day (`get_hrv_data`, `get_sleep_data`), so a date range
+is filled day by day, requesting only the days not yet stored in
+`daily_wellness` (two requests per day: HRV and sleep). Past days never
+change once recorded; today is refetched until the day is over, since last
+night's values may not be uploaded yet. A day where either request failed is
+not stored, so a transient error (e.g. a 429) is retried on the next sync
+instead of caching an empty day.
+Offline sources (repository.LocalActivityRepository) only read what is stored.
+"""
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = (
+    'date', 'hrv_last_night_avg', 'hrv_weekly_avg', 'hrv_status', 'resting_hr',
+    'sleep_seconds', 'deep_sleep_seconds', 'light_sleep_seconds',
+    'rem_sleep_seconds', 'awake_seconds', 'sleep_score',
+)
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def date_range(start, end):
+    """All calendar days from start to end inclusive"""
+    start, end = _as_date(start), _as_date(end)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def parse_wellness(cdate, hrv_data, sleep_data):
+    """Flatten get_hrv_data / get_sleep_data responses into a daily_wellness row"""
+    hrv = (hrv_data or {}).get('hrvSummary') or {}
+    sleep = sleep_data or {}
+    daily = sleep.get('dailySleepDTO') or {}
+    score = ((daily.get('sleepScores') or {}).get('overall') or {}).get('value')
+    return {
+        'date': cdate.isoformat(),
+        'hrv_last_night_avg': hrv.get('lastNightAvg'),
+        'hrv_weekly_avg': hrv.get('weeklyAvg'),
+        'hrv_status': hrv.get('status'),
+        'resting_hr': sleep.get('restingHeartRate'),
+        'sleep_seconds': daily.get('sleepTimeSeconds'),
+        'deep_sleep_seconds': daily.get('deepSleepSeconds'),
+        'light_sleep_seconds': daily.get('lightSleepSeconds'),
+        'rem_sleep_seconds': daily.get('remSleepSeconds'),
+        'awake_seconds': daily.get('awakeSleepSeconds'),
+        'sleep_score': score,
+    }
+
+
+def fetch_day(garmin_client, cdate):
+    """Request one day's HRV and sleep from Garmin
+
+    Returns (row, complete): a failed part is left empty in the row and
+    `complete` is False, so the caller does not store it.
+    """
+    cdate_str = cdate.isoformat()
+    responses = {}
+    complete = True
+    for name, method in (('hrv', 'get_hrv_data'), ('sleep', 'get_sleep_data')):
+        try:
+            responses[name] = getattr(garmin_client, method)(cdate_str)
+        except Exception as e:
+            logger.warning(f"Failed to fetch {name} for {cdate_str}: {e}")
+            responses[name] = None
+            complete = False
+    row = parse_wellness(cdate, responses['hrv'], responses['sleep'])
+    row['data'] = json.dumps(responses)
+    return row, complete
+
+
+def load_days(conn, dates):
+    """Stored daily_wellness rows for the given dates, keyed by date"""
+    dates = [_as_date(d).isoformat() for d in dates]
+    if not dates:
+        return {}
+    placeholders = ','.join('?' * len(dates))
+    cursor = conn.execute(
+        f'SELECT {", ".join(COLUMNS)} FROM daily_wellness WHERE date IN ({placeholders})', dates
+    )
+    return {_as_date(row[0]): dict(zip(COLUMNS, row)) for row in cursor.fetchall()}
+
+
+def ensure_days(garmin_client, dates, conn=None, on_progress=None):
+    """Make sure the given days are stored, fetching only missing ones; return them keyed by date
+
+    `on_progress()` is called after every fetched day.
+    """
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        dates = sorted({_as_date(d) for d in dates})
+        stored = load_days(conn, dates)
+        today = date.today()
+        missing = [d for d in dates if d not in stored or d >= today]
+        missing = [d for d in missing if d <= today]
+        if getattr(garmin_client, 'offline', False):
+            # Local repository: nothing new to fetch, and "no data" must not be cached
+            missing = []
+
+        failed = 0
+        for cdate in missing:
+            row, complete = fetch_day(garmin_client, cdate)
+            if complete:
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO daily_wellness ({", ".join(COLUMNS)}, data, fetched_at)
+                    VALUES ({", ".join("?" * (len(COLUMNS) + 1))}, CURRENT_TIMESTAMP)
+                ''', [row[c] for c in COLUMNS] + [row['data']])
+                conn.commit()
+            else:
+                failed += 1
+            # A partial day is still returned for this run (unless an earlier
+            # fetch of it is stored), it just is not cached
+            if complete or cdate not in stored:
+                stored[cdate] = {c: row[c] for c in COLUMNS}
+            if on_progress:
+                on_progress()
+
+        if missing:
+            logger.info(f"Wellness: fetched {len(missing)} of {len(dates)} days", extra={
+                'fetched': len(missing), 'requested': len(dates), 'failed': failed,
+            })
+        return stored
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def sync_range(garmin_client, start, end, conn=None, on_progress=None):
+    """Fill daily_wellness for every day from start to end inclusive"""
+    return ensure_days(garmin_client, date_range(start, end), conn, on_progress)
+
+
+def get_hrv(garmin_client, cdate):
+    """lastNightAvg HRV for a day, read from the local store (fetched once if missing)"""
+    cdate = _as_date(cdate)
+    day = ensure_days(garmin_client, [cdate]).get(cdate)
+    return day['hrv_last_night_avg'] if day else None
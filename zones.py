@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Time in HR and power zones per activity and per week.
+
+Zones are computed once at ingest from the stored 1 Hz streams (see
+streams.py): the samples are binned against the zone boundaries with a
+single `searchsorted` + `bincount` pass. Boundaries come from the
+environment as the lower edges of zones 2..N, either as fractions of the
+threshold (FTP / LTHR) or as absolute watts / bpm:
+
+    POWER_ZONES=0.55,0.75,0.90,1.05,1.20,1.50   # Coggan, x FTP (default)
+    HR_ZONES=0.81,0.90,0.94,1.00,1.03,1.06      # Friel, x LTHR (default)
+    HR_ZONES=120,140,155,165,175                # absolute bpm
+    HR_ZONES=garmin                             # Garmin's own HR zones per activity
+
+Results are stored compactly: one `activity_zones` row per activity and
+kind (seconds per zone as a JSON array), and one `weekly_zones` row per
+week, kind and zone, so a season of zone time is a single range scan over
+the weekly primary key:
+
+    python zones.py rebuild [--since 2025-01-01]    # recompute after changing boundaries
+    python zones.py season [--kind hr] [--since 2025-01-01]
+"""
+import os
+import json
+import logging
+from datetime import date, datetime, timedelta
+
+import metrics
+import streams
+from analytics import resample_1hz, thresholds
+from db import get_db
+
+logger = logging.getLogger(__name__)
+
+KINDS = ('hr', 'power')
+
+DEFAULT_ZONES = {
+    'power': '0.55,0.75,0.90,1.05,1.20,1.50',
+    'hr': '0.81,0.90,0.94,1.00,1.03,1.06',
+}
+
+# Stream channel per kind
+CHANNELS = {'hr': 'heart_rate', 'power': 'power'}
+
+# Boundaries up to this value are read as fractions of the threshold
+RELATIVE_LIMIT = 3.0
+
+
+def _np():
+    import numpy
+    return numpy
+
+
+def zone_config(kind):
+    """Configured boundaries for a kind: a list of floats, or 'garmin'"""
+    value = os.getenv(f'{kind.upper()}_ZONES', DEFAULT_ZONES[kind]).strip()
+    if kind == 'hr' and value.lower() == 'garmin':
+        return 'garmin'
+    return sorted(float(v) for v in value.split(',') if v.strip())
+
+
+def boundaries(kind, ftp=None, lthr=None):
+    """Absolute lower edges of zones 2..N for a kind, or None without the needed threshold"""
+    config = zone_config(kind)
+    if config == 'garmin' or not config:
+        return None
+    if max(config) > RELATIVE_LIMIT:
+        return config
+    threshold = ftp if kind == 'power' else lthr
+    if not threshold:
+        return None
+    return [round(v * threshold, 1) for v in config]
+
+
+def histogram(values, edges):
+    """Seconds per zone for a 1 Hz series: len(edges) + 1 integers (NaN samples are skipped)"""
+    np = _np()
+    values = values[~np.isnan(values)]
+    index = np.searchsorted(np.asarray(edges, dtype=np.float64), values, side='right')
+    return np.bincount(index, minlength=len(edges) + 1).tolist()
+
+
+def garmin_hr_zones(garmin_client, activity_id):
+    """(seconds, edges) from Garmin's HR time-in-zone endpoint, or None"""
+    try:
+        zones = garmin_client.get_activity_hr_in_timezones(activity_id) or []
+    except Exception as e:
+        logger.warning(f"HR zones unavailable for {activity_id}: {e}")
+        return None
+    zones = sorted(zones, key=lambda z: z.get('zoneNumber', 0))
+    if not zones:
+        return None
+    seconds = [int(round(z.get('secsInZone') or 0)) for z in zones]
+    return seconds, [z.get('zoneLowBoundary') for z in zones[1:]]
+
+
+def _save_zones(conn, activity_id, kind, seconds, edges, source):
+    conn.execute('''
+        INSERT OR REPLACE INTO activity_zones (activity_id, kind, seconds, boundaries, source, computed_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    ''', (str(activity_id), kind, json.dumps(seconds), json.dumps(edges), source))
+
+
+def week_start(value):
+    """Monday of the week containing a date"""
+    day = value if isinstance(value, date) else datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    return day - timedelta(days=day.weekday())
+
+
+def update_weeks(conn, since=None, until=None):
+    """Rebuild weekly_zones for the weeks covering since..until (all weeks if None); caller commits"""
+    # Whole weeks: from the Monday of `since` up to the Sunday of `until`
+    first = week_start(since).isoformat() if since else '0000-01-01'
+    end = (week_start(until) + timedelta(days=7)).isoformat() if until else '9999-12-31'
+    conn.execute('DELETE FROM weekly_zones WHERE week_start >= ? AND week_start < ?', (first, end))
+    conn.execute('''
+        INSERT INTO weekly_zones (kind, week_start, zone, seconds, activities)
+        SELECT z.kind, date(a.date, '-6 days', 'weekday 1') AS week, j.key + 1, SUM(j.value), COUNT(*)
+        FROM activity_zones z
+        JOIN activities a ON a.id = z.activity_id, json_each(z.seconds) j
+        WHERE a.date >= ? AND a.date < ?
+        GROUP BY z.kind, week, j.key
+    ''', (first, end))
+
+
+def update_zones(activity_ids=None, since=None, garmin_client=None, ftp=None, lthr=None):
+    """Compute zones for the given activities (or all with streams) and refresh their weeks
+
+    `garmin_client` is only needed with HR_ZONES=garmin. Returns the number of
+    activities with at least one histogram.
+    """
+    env_ftp, env_lthr = thresholds()
+    ftp, lthr = ftp or env_ftp, lthr or env_lthr
+    edges = {kind: boundaries(kind, ftp, lthr) for kind in KINDS}
+    use_garmin = zone_config('hr') == 'garmin' and garmin_client is not None
+    channels = ['time'] + [CHANNELS[kind] for kind in KINDS if edges[kind]]
+
+    conn = get_db()
+    computed, dates = 0, []
+    try:
+        with metrics.timer('sync_stage', stage='zones'):
+            if activity_ids is None:
+                items = ((aid, day, views) for aid, day, _, views in
+                         streams.iter_streams(channels, since=since, conn=conn))
+            else:
+                items = ((aid, None, streams.load_streams(aid, channels, conn=conn)) for aid in activity_ids)
+            for activity_id, day, views in items:
+                views = views or {}
+                saved = False
+                for kind in KINDS:
+                    channel = CHANNELS[kind]
+                    if edges[kind] and channel in views:
+                        series = resample_1hz(views.get('time'), views[channel])
+                        if series is None:
+                            continue
+                        if kind == 'hr':
+                            # 0 bpm is a dropped strap, not an easy second
+                            series = series[series > 0]
+                        _save_zones(conn, activity_id, kind, histogram(series, edges[kind]), edges[kind], 'streams')
+                        saved = True
+                    elif kind == 'hr' and use_garmin:
+                        result = garmin_hr_zones(garmin_client, activity_id)
+                        if result:
+                            _save_zones(conn, activity_id, kind, result[0], result[1], 'garmin')
+                            saved = True
+                if saved:
+                    computed += 1
+                    dates.append(day)
+
+            if activity_ids:
+                placeholders = ','.join('?' * len(activity_ids))
+                dates = [d for (d,) in conn.execute(
+                    f'SELECT date FROM activities WHERE id IN ({placeholders})', [str(a) for a in activity_ids]
+                )]
+            dates = [d for d in dates if d]
+            if activity_ids is None and since is None:
+                update_weeks(conn)
+            elif dates:
+                update_weeks(conn, min(dates), max(dates))
+            conn.commit()
+    finally:
+        conn.close()
+    logger.info(f"Zones: {computed} activities binned", extra={
+        'computed': computed, 'power_zones': edges['power'], 'hr_zones': edges['hr'] or zone_config('hr'),
+    })
+    return computed
+
+
+def get_activity_zones(activity_id, conn=None):
+    """{kind: {'seconds': [...], 'boundaries': [...], 'source': ...}} for one activity"""
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        rows = conn.execute(
+            'SELECT kind, seconds, boundaries, source FROM activity_zones WHERE activity_id = ?', (str(activity_id),)
+        ).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+    return {
+        kind: {'seconds': json.loads(seconds), 'boundaries': json.loads(boundaries), 'source': source}
+        for kind, seconds, boundaries, source in rows
+    }
+
+
+def zone_status(kind):
+    """(absolute lower edges or 'garmin', status) for the current configuration
+
+    status is 'ok', 'thresholds_not_configured' (relative zones without
+    FTP/LTHR) or 'zones_not_configured' (empty POWER_ZONES/HR_ZONES).
+    """
+    config = zone_config(kind)
+    if config == 'garmin':
+        return config, 'ok'
+    if not config:
+        return None, 'zones_not_configured'
+    edges = boundaries(kind, *thresholds())
+    return edges, 'ok' if edges else 'thresholds_not_configured'
+
+
+def season_zones(kind='hr', since=None, until=None, weekly=False, conn=None):
+    """Time per zone summed over a date range from weekly_zones
+
+    Returns {'kind', 'since', 'until', 'boundaries', 'status', 'zones':
+    [{'zone', 'seconds', 'share'}]} plus 'weeks' ({week_start: [seconds per
+    zone]}) when `weekly` is set. 'boundaries' are the absolute watt/bpm
+    edges the histograms are binned with (see zone_status()).
+    """
+    query = 'SELECT week_start, zone, seconds FROM weekly_zones WHERE kind = ?'
+    params = [kind]
+    if since:
+        query += ' AND week_start >= ?'
+        params.append(week_start(since).isoformat())
+    if until:
+        query += ' AND week_start <= ?'
+        params.append(str(until)[:10])
+    own_conn = conn is None
+    conn = conn or get_db()
+    try:
+        rows = conn.execute(query + ' ORDER BY week_start, zone', params).fetchall()
+    finally:
+        if own_conn:
+            conn.close()
+
+    totals, weeks = {}, {}
+    for week, zone, seconds in rows:
+        totals[zone] = totals.get(zone, 0) + seconds
+        if weekly:
+            week_zones = weeks.setdefault(week, [])
+            week_zones.extend([0] * (zone - len(week_zones)))
+            week_zones[zone - 1] = seconds
+    total = sum(totals.values())
+    edges, status = zone_status(kind)
+    result = {
+        'kind': kind,
+        'since': since,
+        'until': until,
+        'boundaries': edges,
+        'status': status,
+        'zones': [
+            {'zone': zone, 'seconds': seconds, 'share': round(seconds / total, 4) if total else 0.0}
+            for zone, seconds in sorted(totals.items())
+        ],
+    }
+    if weekly:
+        result['weeks'] = weeks
+    return result
+
+
+if __name__ == '__main__':
+    import argparse
+    from logging_config import configure_logging
+
+    parser = argparse.ArgumentParser(description='HR and power time-in-zone')
+    parser.add_argument('command', choices=['rebuild', 'season'])
+    parser.add_argument('--since', help='first day (YYYY-MM-DD)')
+    parser.add_argument('--kind', choices=KINDS, default='hr')
+    args = parser.parse_args()
+
+    configure_logging()
+    if args.command == 'rebuild':
+        client = None
+        if zone_config('hr') == 'garmin':
+            from main import connect_to_garmin
+            client = connect_to_garmin()
+        update_zones(since=args.since, garmin_client=client)
+    print(json.dumps(season_zones(args.kind, args.since), indent=2))